@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'LittleLemonAPI.middleware.QueryBudgetMiddleware',
+    'LittleLemonAPI.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,10 +83,58 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts so concurrent
+            # checkouts queue on the busy timeout instead of failing to upgrade.
+            'transaction_mode': 'IMMEDIATE',
+            # Run on every new connection. WAL lets readers carry on while a
+            # writer commits; synchronous=NORMAL is durable across app crashes
+            # in WAL mode and only fsyncs at checkpoints.
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=5000;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA mmap_size=134217728;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+        # Keep connections (and their warm page cache) between requests.
+        # Dropped to 0 when served over ASGI, see ASGI below.
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {
+            # A file rather than :memory: so threaded tests get real locking.
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# A read-only copy of db.sqlite3 (kept current by litestream, sqlite3 .backup,
+# ...). Only used once listed in DATABASE_REPLICAS; if it cannot be opened,
+# reads fall back to default.
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': f'file:{BASE_DIR / "replica.sqlite3"}?mode=ro',
+    'OPTIONS': {
+        'uri': True,
+        'init_command': (
+            'PRAGMA busy_timeout=5000;'
+            'PRAGMA cache_size=-20000;'
+            'PRAGMA mmap_size=134217728;'
+        ),
+    },
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'TEST': {
+        'NAME': BASE_DIR / 'test_replica.sqlite3',
+    },
+}
+
+DATABASE_ROUTERS = ['LittleLemonAPI.routers.ReplicaRouter']
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -124,13 +175,75 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'LittleLemonAPI.renderers.FastJSONRenderer',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'LittleLemonAPI.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'LittleLemonAPI.throttling.TokenBucketThrottle',
     ],
 }
 
 DJOSER = {
     "USER_ID_FIELD": "username",
-}
\ No newline at end of file
+}
+
+# Seconds a user's group membership is cached in-process (see LittleLemonAPI.roles)
+ROLE_CACHE_TTL = 60
+
+# Seconds a rendered menu/category page stays cached (see LittleLemonAPI.catalog)
+CATALOG_CACHE_TIMEOUT = 300
+
+# Token -> user lookups kept in-process (see LittleLemonAPI.authentication).
+# Logout, token deletion and user changes bump a per-user version in the
+# default cache; other workers only see it when that cache is shared.
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 300
+
+# Serve GET on categories, menu-items and orders from LittleLemonAPI.async_views
+ASYNC_READ_VIEWS = True
+
+# Set ASGI=1 (LittleLemon/asgi.py does) when serving over ASGI. There each
+# request's queries run on a thread of their own, so a persistent connection
+# would never be reused or closed: open one per request. Under WSGI the async
+# views' ORM calls run on the request thread and reuse is safe.
+ASGI = os.environ.get('ASGI') == '1'
+if ASGI:
+    for database in DATABASES.values():
+        database['CONN_MAX_AGE'] = 0
+
+# Aliases in DATABASES that serve safe-method requests (see LittleLemonAPI.routers),
+# e.g. ['replica']. A client that wrote reads from default for the next
+# READ_YOUR_WRITES_SECONDS; a replica that fails to connect is skipped for
+# REPLICA_RETRY_SECONDS.
+DATABASE_REPLICAS = []
+READ_YOUR_WRITES_SECONDS = 5
+REPLICA_RETRY_SECONDS = 30
+
+# Token buckets per throttle scope and client kind: (burst, tokens refilled per
+# second). GETs use "browse"; views name the scope of their writes. Set
+# THROTTLE_STORE to LittleLemonAPI.throttling.CacheBucketStore to share the
+# buckets between workers through the default cache.
+THROTTLE_BUCKETS = {
+    'browse': {'user': (120, 20), 'ip': (300, 50)},
+    'cart': {'user': (20, 2), 'ip': (60, 6)},
+    'checkout': {'user': (5, 0.2), 'ip': (20, 1)},
+}
+THROTTLE_STORE = 'LittleLemonAPI.throttling.LocalBucketStore'
+
+# How long a stored response answers retries with the same Idempotency-Key,
+# how long a retry waits for the first request to finish, and after how long an
+# unfinished first request is presumed dead and a retry runs the view instead
+# (see LittleLemonAPI.idempotency). Keep the lease above the slowest request.
+# Expired keys are deleted by the purge_idempotency_keys command.
+IDEMPOTENCY_KEY_TTL = 86400
+IDEMPOTENCY_WAIT = 10
+IDEMPOTENCY_LEASE = 60
+
+# Outbox worker retries (manage.py run_outbox): a failed event waits
+# OUTBOX_BACKOFF_SECONDS * 2**(attempts - 1), capped at OUTBOX_BACKOFF_MAX,
+# and is parked as dead after OUTBOX_MAX_ATTEMPTS
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF_SECONDS = 5
+OUTBOX_BACKOFF_MAX = 3600
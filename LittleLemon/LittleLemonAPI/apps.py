@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class LittlelemonapiConfig(AppConfig):
     name = 'LittleLemonAPI'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,131 @@
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator, EmptyPage
+from django.http import HttpResponse
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from . import views
+from .authentication import aauthenticate, CachedTokenAuthentication
+from .catalog import acached_catalog_data
+from .fastpath import plan_for
+from .models import Category, MenuItem, Order
+from .pagination import KeysetPagination
+from .renderers import FastJSONRenderer
+from .roles import aget_roles
+from .serializers import CategorySerializer, MenuItemSerializer, OrderSerializer
+from .throttling import TokenBucketThrottle
+
+# Native async GET handlers for the read-heavy endpoints. Under ASGI they run
+# on the event loop and only touch a thread for the ORM calls themselves;
+# every other method on the same URL still goes to the sync DRF view.
+
+renderer = FastJSONRenderer()
+
+def render(data, status_code=status.HTTP_200_OK, headers=None):
+     content = b'' if data is None else renderer.render(data)
+     response = HttpResponse(content, status=status_code, content_type='application/json', headers=headers)
+     # Same attribute a DRF Response carries, for callers that inspect the payload
+     response.data = data
+     return response
+
+def exception_response(exc):
+     data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+     headers = None
+     if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+          headers = {'WWW-Authenticate': CachedTokenAuthentication().authenticate_header(None)}
+     if isinstance(exc, exceptions.Throttled) and exc.wait:
+          headers = {'Retry-After': '%d' % exc.wait}
+     return render(data, exc.status_code, headers)
+
+def async_api_view(handler):
+     # Token authentication, IsAuthenticated and browse throttling, as the sync views get from APIView
+     @wraps(handler)
+     async def view(request, *args, **kwargs):
+          try:
+               auth = await aauthenticate(request)
+               if auth is None:
+                    raise exceptions.NotAuthenticated()
+               api_request = Request(request)
+               api_request.user, api_request.auth = auth
+               wait = TokenBucketThrottle().check(api_request, 'browse')
+               if wait:
+                    raise exceptions.Throttled(wait)
+               return await handler(api_request, *args, **kwargs)
+          except exceptions.APIException as exc:
+               return exception_response(exc)
+     return view
+
+def read_async(async_get, sync_view_class):
+     sync_view = sync_to_async(sync_view_class.as_view())
+
+     async def view(request, *args, **kwargs):
+          if request.method in ('GET', 'HEAD'):
+               return await async_get(request, *args, **kwargs)
+          return await sync_view(request, *args, **kwargs)
+
+     # Keep route naming (QueryBudgetMiddleware) and CSRF handling as for the sync view
+     view.view_class = sync_view_class
+     view.csrf_exempt = True
+     return view
+
+async def catalog_response(request, name, build):
+     status_code, data, etag = await acached_catalog_data(request, name, build)
+     return render(data, status_code, {'ETag': etag})
+
+@async_api_view
+async def category_list(request):
+     async def build():
+          plan = plan_for(CategorySerializer)
+          return await plan.adata([row async for row in plan.values(Category.objects.all())])
+     return await catalog_response(request, 'categories', build)
+
+@async_api_view
+async def menu_item_list(request):
+     async def build():
+          params = request.query_params
+          plan = plan_for(MenuItemSerializer, params)
+          items = views.filter_menu_items(params)
+          perpage = params.get("perpage", default=2)
+          page = params.get("page", default=1)
+          if "cursor" in params:
+               paginator = views.menu_item_keyset(params, perpage)
+               items = plan.values(items, *paginator.cursor_columns(request, MenuItem))
+               rows = await paginator.apaginate_queryset(items, request)
+               return paginator.get_paginated_data(await plan.adata(rows))
+          items = plan.values(views.order_menu_items(items, params))
+          paginator = Paginator(items, per_page=perpage)
+          # Count up front so Paginator validates the page without touching the ORM itself
+          paginator.count = await items.acount()
+          try:
+               rows = [item async for item in paginator.page(number=page).object_list]
+          except EmptyPage:
+               rows = []
+          return await plan.adata(rows)
+     return await catalog_response(request, 'menu-items', build)
+
+@async_api_view
+async def order_list(request):
+     roles = await aget_roles(request.user)
+     orders = views.orders_visible_to(request.user, roles)
+     orders = views.filter_orders(orders, request.query_params)
+     plan = plan_for(OrderSerializer, request.query_params)
+     paginator = KeysetPagination(page_size=views.ORDER_PAGE_SIZE)
+     orders = plan.values(orders, *paginator.cursor_columns(request, Order))
+     rows = await paginator.apaginate_queryset(orders, request)
+     return render(paginator.get_paginated_data(await plan.adata(rows)))
+
+@async_api_view
+async def order_detail(request, pk):
+     plan = plan_for(OrderSerializer, request.query_params)
+     try:
+          row = await plan.values(Order.objects.all(), 'user_id').aget(pk=pk)
+     except Order.DoesNotExist:
+          raise exceptions.NotFound('No Order matches the given query.')
+     if row['user_id'] != request.user.id:
+          return render('You do not have permission to view this order.', status.HTTP_403_FORBIDDEN)
+     return render((await plan.adata([row]))[0])
+
+CategoryView = read_async(category_list, views.CategoryView)
+MenuItemView = read_async(menu_item_list, views.MenuItemView)
+OrderView = read_async(order_list, views.OrderView)
+SingleOrderView = read_async(order_detail, views.SingleOrderView)
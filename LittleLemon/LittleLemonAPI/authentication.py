@@ -0,0 +1,146 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from .routers import aapply_user_pin, apply_user_pin, primary_reads
+from .versions import aget_or_seed_version, get_or_seed_version, reset_version
+
+class TokenCache:
+     # Bounded LRU of token key -> (expires_at, user, token, version) with hit/miss counters
+     def __init__(self, maxsize, ttl):
+          self.maxsize = maxsize
+          self.ttl = ttl
+          self.entries = OrderedDict()
+          self.lock = threading.Lock()
+          self.hits = 0
+          self.misses = 0
+          self.evictions = 0
+
+     def get(self, key):
+          with self.lock:
+               entry = self.entries.get(key)
+               if entry is None or entry[0] <= time.monotonic():
+                    if entry is not None:
+                         del self.entries[key]
+                         self.evictions += 1
+                    self.misses += 1
+                    return None
+               self.entries.move_to_end(key)
+               self.hits += 1
+               return entry[1], entry[2], entry[3]
+
+     def set(self, key, user, token, version=None):
+          with self.lock:
+               self.entries[key] = (time.monotonic() + self.ttl, user, token, version)
+               self.entries.move_to_end(key)
+               while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+
+     def evict_key(self, key):
+          with self.lock:
+               if self.entries.pop(key, None) is not None:
+                    self.evictions += 1
+
+     def evict_user(self, user_id):
+          with self.lock:
+               keys = [key for key, entry in self.entries.items() if entry[1].pk == user_id]
+               for key in keys:
+                    del self.entries[key]
+               self.evictions += len(keys)
+
+     def clear(self):
+          with self.lock:
+               self.entries.clear()
+               self.hits = self.misses = self.evictions = 0
+
+     def stats(self):
+          with self.lock:
+               return {
+                    'size': len(self.entries),
+                    'maxsize': self.maxsize,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+               }
+
+token_cache = TokenCache(
+     maxsize=getattr(settings, 'TOKEN_CACHE_SIZE', 10000),
+     ttl=getattr(settings, 'TOKEN_CACHE_TTL', 300),
+)
+
+# Each worker keeps its own token cache, so changes are announced through the
+# shared cache: a per-user version that cached entries must still match.
+def _version_key(user_id):
+     return f'auth:user:{user_id}'
+
+def user_version(user_id):
+     return get_or_seed_version(_version_key(user_id))
+
+async def auser_version(user_id):
+     return await aget_or_seed_version(_version_key(user_id))
+
+def invalidate_user(user_id):
+     # Logout, token deletion or any change to the user, in every worker
+     token_cache.evict_user(user_id)
+     reset_version(_version_key(user_id))
+
+class CachedTokenAuthentication(TokenAuthentication):
+     def authenticate_credentials(self, key):
+          cached = token_cache.get(key)
+          if cached is not None and cached[2] != user_version(cached[0].pk):
+               token_cache.evict_key(key)
+               cached = None
+          if cached is None:
+               # Tokens are used the moment they are issued, before a replica may have them
+               with primary_reads():
+                    user, token = super().authenticate_credentials(key)
+               version = user_version(user.pk)
+               token_cache.set(key, user, token, version)
+               cached = user, token, version
+          # Hand each request its own copy so per-request state never leaks between requests
+          user, token, _ = cached
+          apply_user_pin(user)
+          return copy.copy(user), token
+
+async def aauthenticate(request):
+     # Async counterpart of CachedTokenAuthentication.authenticate for plain
+     # Django async views; returns (user, token) or None when no token is sent.
+     force_user = getattr(request, '_force_auth_user', None)
+     if force_user is not None:
+          # Honour APIClient.force_authenticate, as rest_framework.request.Request does
+          return force_user, getattr(request, '_force_auth_token', None)
+
+     auth = get_authorization_header(request).split()
+     keyword = CachedTokenAuthentication.keyword
+     if not auth or auth[0].lower() != keyword.lower().encode():
+          return None
+     if len(auth) != 2:
+          raise exceptions.AuthenticationFailed('Invalid token header.')
+     try:
+          key = auth[1].decode()
+     except UnicodeError:
+          raise exceptions.AuthenticationFailed('Invalid token header. Token string should not contain invalid characters.')
+
+     cached = token_cache.get(key)
+     if cached is not None and cached[2] != await auser_version(cached[0].pk):
+          token_cache.evict_key(key)
+          cached = None
+     if cached is None:
+          model = CachedTokenAuthentication().get_model()
+          try:
+               with primary_reads():
+                    token = await model.objects.select_related('user').aget(key=key)
+          except model.DoesNotExist:
+               raise exceptions.AuthenticationFailed('Invalid token.')
+          if not token.user.is_active:
+               raise exceptions.AuthenticationFailed('User inactive or deleted.')
+          version = await auser_version(token.user.pk)
+          token_cache.set(key, token.user, token, version)
+          cached = token.user, token, version
+     user, token, _ = cached
+     await aapply_user_pin(user)
+     return copy.copy(user), token
@@ -0,0 +1,41 @@
+# Most SQL queries one request may run, keyed by "ViewClass.method".
+# QueryBudgetMiddleware logs requests that go over; tests.py enforces them
+# against seeded data on each view's costliest path with cold token, role
+# and catalog caches. Every budget includes the token lookup, which the
+# middleware sees because DRF authenticates inside the view; savepoints
+# count too. Streamed exports are counted until their body is exhausted, on
+# seed data that fits in one chunk.
+QUERY_BUDGETS = {
+     'CategoryView.get': 2,
+     'CategoryView.post': 2,
+     'MenuItemView.get': 3,
+     'MenuItemView.post': 5,
+     'MenuImportView.post': 11,
+     'MenuExportView.get': 3,
+     'SingleMenuItemView.get': 3,
+     'SingleMenuItemView.put': 11,
+     'SingleMenuItemView.patch': 10,
+     'SingleMenuItemView.delete': 8,
+     'ManagerGroupView.get': 2,
+     'ManagerGroupView.post': 4,
+     'SingleManagerGroupView.delete': 4,
+     'DeliveryCrewGroupView.get': 3,
+     'DeliveryCrewGroupView.post': 5,
+     'SingleDeliveryCrewGroupView.delete': 5,
+     'BulkManagerGroupView.post': 4,
+     'BulkManagerGroupView.delete': 4,
+     'BulkDeliveryCrewGroupView.post': 5,
+     'BulkDeliveryCrewGroupView.delete': 5,
+     'CartMenuItemView.get': 2,
+     'CartMenuItemView.post': 12,
+     'CartMenuItemView.delete': 2,
+     'OrderView.get': 4,
+     'OrderView.post': 17,
+     'OrderDispatchView.post': 7,
+     'OrderExportView.get': 4,
+     'SingleOrderView.get': 3,
+     'SingleOrderView.patch': 10,
+     'SingleOrderView.delete': 9,
+     'SalesReportView.get': 3,
+     'StatsView.get': 1,
+}
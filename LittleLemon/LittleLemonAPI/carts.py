@@ -0,0 +1,114 @@
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, FloatField, Max, OuterRef, Subquery, Sum, Window
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from .models import Cart, MenuItem
+
+MAX_QUANTITY = 32767
+# Largest value Cart.price (max_digits=6, decimal_places=2) can hold
+MAX_LINE_PRICE = Decimal('9999.99')
+
+def parse_cart_lines(data):
+     # Accept one {id, quantity} line, a list of them, or {"items": [...]}
+     if isinstance(data, list):
+          lines = data
+     elif hasattr(data, 'get') and isinstance(data.get('items'), list):
+          lines = data.get('items')
+     else:
+          lines = [data]
+     if not lines:
+          raise ValidationError('Menu item id required')
+
+     quantities = {}
+     for line in lines:
+          if not hasattr(line, 'get') or not line.get('id'):
+               raise ValidationError('Menu item id required')
+          try:
+               item_id = int(line.get('id'))
+               quantity = int(line.get('quantity') or 1)
+          except (TypeError, ValueError):
+               raise ValidationError('Menu item id and quantity must be numbers')
+          if quantity < 1:
+               raise ValidationError('Quantity must be at least 1')
+          # Repeated ids in one basket add up, like repeated requests would
+          quantities[item_id] = quantities.get(item_id, 0) + quantity
+          if quantities[item_id] > MAX_QUANTITY:
+               raise ValidationError('Quantity is too large')
+     return quantities
+
+def add_to_cart(user, quantities):
+     items = MenuItem.objects.only('id', 'title', 'price').in_bulk(list(quantities))
+     missing = sorted(set(quantities) - set(items))
+     if missing:
+          return items, missing
+
+     # One INSERT ... ON CONFLICT for the whole basket: new lines are inserted,
+     # existing lines get their quantity raised and price recomputed. A merge
+     # that would overflow the quantity or price columns is skipped by the
+     # WHERE guard, which shows up as a short rowcount and undoes the basket.
+     table = connection.ops.quote_name(Cart._meta.db_table)
+     rows = []
+     params = []
+     for item_id, quantity in quantities.items():
+          price = items[item_id].price
+          if price * quantity > MAX_LINE_PRICE:
+               raise ValidationError('Quantity is too large')
+          rows.append('(%s, %s, %s, %s, %s)')
+          params += [user.id, item_id, quantity, price, price * quantity]
+     sql = (
+          f'INSERT INTO {table} (user_id, menuitem_id, quantity, unit_price, price) '
+          f'VALUES {", ".join(rows)} '
+          f'ON CONFLICT (menuitem_id, user_id) DO UPDATE SET '
+          f'quantity = {table}.quantity + excluded.quantity, '
+          f'unit_price = excluded.unit_price, '
+          f'price = ({table}.quantity + excluded.quantity) * excluded.unit_price '
+          f'WHERE {table}.quantity + excluded.quantity <= %s '
+          f'AND ({table}.quantity + excluded.quantity) * excluded.unit_price <= %s'
+     )
+     # As a float: SQLite binds Decimal as text, which compares above any number
+     params += [MAX_QUANTITY, float(MAX_LINE_PRICE)]
+     with transaction.atomic():
+          with connection.cursor() as cursor:
+               cursor.execute(sql, params)
+               if cursor.rowcount != len(rows):
+                    raise ValidationError('Quantity is too large')
+     return items, missing
+
+def cart_lines(user):
+     # The subtotal rides along on every row as a window SUM, so the lines and
+     # their total come back in the one query
+     lines = list(Cart.objects.filter(user=user.id).annotate(subtotal=Window(Sum('price'))).order_by('id'))
+     subtotal = lines[0].subtotal if lines else Decimal('0')
+     return lines, serializers.DecimalField(max_digits=8, decimal_places=2).to_representation(subtotal)
+
+def overflowing_items(prices):
+     # Ids from {menuitem id: new price} that would push some cart line past MAX_LINE_PRICE
+     if not prices:
+          return set()
+     largest = Cart.objects.filter(menuitem_id__in=list(prices)).values('menuitem_id').annotate(quantity=Max('quantity'))
+     return {row['menuitem_id'] for row in largest if prices[row['menuitem_id']] * row['quantity'] > MAX_LINE_PRICE}
+
+def reprice_carts(menuitem_ids):
+     # One UPDATE for every open cart line of the given items, to be run in the
+     # transaction that changes their prices. Lines the new price would overflow
+     # are skipped by the guard; the short rowcount undoes the whole change.
+     if not menuitem_ids:
+          return 0
+     current = Subquery(MenuItem.objects.filter(pk=OuterRef('menuitem_id')).values('price')[:1])
+     lines = Cart.objects.filter(menuitem_id__in=menuitem_ids).exclude(unit_price=current)
+     pending = lines.count()
+     if not pending:
+          return 0
+     # As a float: SQLite binds Decimal as text, which compares above any number
+     repriced = (
+          lines.alias(line_price=ExpressionWrapper(F('quantity') * current, output_field=FloatField()))
+          .filter(line_price__lte=float(MAX_LINE_PRICE))
+          .update(
+               unit_price=current,
+               price=ExpressionWrapper(F('quantity') * current, output_field=DecimalField(max_digits=6, decimal_places=2)),
+          )
+     )
+     if repriced != pending:
+          raise ValidationError('The new price would exceed the cart line limit for an open cart.')
+     return repriced
@@ -0,0 +1,78 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+from .routers import primary_reads, reading_replica
+from .versions import acache, aget_or_seed_version, get_or_seed_version
+
+CATALOG_VERSION_KEY = 'catalog:version'
+# Set for the replica lag window after each bump
+CATALOG_CHANGED_KEY = 'catalog:changed'
+CATALOG_PARAMS = ('category', 'ordering', 'search', 'page', 'perpage', 'cursor', 'fields', 'expand')
+
+def _timeout():
+     return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+def get_catalog_version():
+     return get_or_seed_version(CATALOG_VERSION_KEY)
+
+def bump_catalog_version():
+     cache.set(CATALOG_CHANGED_KEY, True, getattr(settings, 'READ_YOUR_WRITES_SECONDS', 5))
+     try:
+          return cache.incr(CATALOG_VERSION_KEY)
+     except ValueError:
+          return get_catalog_version()
+
+def catalog_key(version, name, query_params):
+     params = sorted(
+          (param, query_params.get(param).strip())
+          for param in CATALOG_PARAMS
+          if param in query_params
+     )
+     digest = hashlib.md5(repr(params).encode()).hexdigest()
+     return f'catalog:{version}:{name}:{digest}'
+
+def catalog_etag(version):
+     return f'"catalog-{version}"'
+
+def not_modified(request, etag):
+     if_none_match = request.headers.get('If-None-Match', '')
+     return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+def cached_catalog_response(request, name, build):
+     version = get_catalog_version()
+     etag = catalog_etag(version)
+     if not_modified(request, etag):
+          return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+     key = catalog_key(version, name, request.query_params)
+     data = cache.get(key)
+     if data is None:
+          # Pages cached under a new version outlive the replica's lag: right
+          # after a change, build them from the primary
+          if reading_replica() and cache.get(CATALOG_CHANGED_KEY):
+               with primary_reads():
+                    data = build()
+          else:
+               data = build()
+          cache.set(key, data, _timeout())
+     return Response(data, status.HTTP_200_OK, headers={'ETag': etag})
+
+async def acached_catalog_data(request, name, abuild):
+     # Async twin of cached_catalog_response; returns (status, data, etag)
+     version = await aget_or_seed_version(CATALOG_VERSION_KEY)
+     etag = catalog_etag(version)
+     if not_modified(request, etag):
+          return status.HTTP_304_NOT_MODIFIED, None, etag
+
+     key = catalog_key(version, name, request.query_params)
+     data = await acache('get', key)
+     if data is None:
+          if reading_replica() and await acache('get', CATALOG_CHANGED_KEY):
+               with primary_reads():
+                    data = await abuild()
+          else:
+               data = await abuild()
+          await acache('set', key, data, _timeout())
+     return status.HTTP_200_OK, data, etag
@@ -0,0 +1,58 @@
+import heapq
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, Count, FilteredRelation, Q, When
+from rest_framework.exceptions import ValidationError
+from .models import Order
+from .roles import DELIVERY_CREW
+
+MAX_DISPATCH = 1000
+
+def parse_order_ids(value):
+     if not isinstance(value, list) or not value:
+          raise ValidationError('orders must be a non-empty list of order ids')
+     if len(value) > MAX_DISPATCH:
+          raise ValidationError(f'At most {MAX_DISPATCH} orders per dispatch')
+     try:
+          ids = {int(order_id) for order_id in value}
+     except (TypeError, ValueError):
+          raise ValidationError('Order ids must be numbers')
+     return sorted(ids)
+
+def undelivered():
+     return Order.objects.filter(status=False)
+
+def dispatch_orders(order_ids, crew_id):
+     # One UPDATE for the whole list; delivered orders are left alone
+     return undelivered().filter(id__in=order_ids).update(delivery_crew=crew_id)
+
+def crew_loads():
+     # Undelivered orders held by each active crew member, in one grouped query
+     crew = User.objects.filter(groups__name=DELIVERY_CREW, is_active=True)
+     # The status condition sits in the join so it can use order_crew_pending_idx
+     return list(crew.annotate(
+          pending=FilteredRelation('delivery_crew', condition=Q(delivery_crew__status=False)),
+          load=Count('pending'),
+     ).values_list('load', 'id'))
+
+def auto_dispatch(limit=MAX_DISPATCH):
+     # Hand unassigned orders, oldest first, to whoever has the least on their
+     # plate at that moment. Returns {crew id: [order ids]}.
+     with transaction.atomic():
+          loads = crew_loads()
+          if not loads:
+               return {}
+          pending = list(
+               undelivered().filter(delivery_crew__isnull=True).order_by('id').values_list('id', flat=True)[:limit]
+          )
+          heapq.heapify(loads)
+          assignments = {}
+          for order_id in pending:
+               load, crew_id = heapq.heappop(loads)
+               assignments.setdefault(crew_id, []).append(order_id)
+               heapq.heappush(loads, (load + 1, crew_id))
+          if pending:
+               undelivered().filter(id__in=pending, delivery_crew__isnull=True).update(delivery_crew=Case(
+                    *(When(id__in=order_ids, then=crew_id) for crew_id, order_ids in assignments.items())
+               ))
+     return assignments
@@ -0,0 +1,177 @@
+from rest_framework import ISO_8601, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from . import models
+from .serializers import CategorySerializer, MenuItemSerializer
+
+# Read-only output built straight from .values() rows. A plan is compiled
+# once per serializer class (and ?fields= / ?expand= choice) and produces
+# exactly what serializer.data would, without building model instances or
+# running each field's to_representation.
+
+PASSTHROUGH = (serializers.BooleanField, serializers.CharField, serializers.IntegerField)
+
+# Foreign keys to these models can be embedded with ?expand=
+EXPANDABLE = {
+     models.Category: CategorySerializer,
+     models.MenuItem: MenuItemSerializer,
+}
+
+def decimal_converter(field):
+     coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+     if not coerce_to_string or field.localize or field.normalize_output:
+          return field.to_representation
+     exponent = -field.decimal_places
+
+     def convert(value):
+          # The database backend already quantized it, so just format it
+          if value.as_tuple().exponent == exponent:
+               return format(value, 'f')
+          return field.to_representation(value)
+     return convert
+
+def date_converter(field):
+     output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+     if output_format is None or output_format.lower() != ISO_8601:
+          return field.to_representation
+     return lambda value: value.isoformat()
+
+def converter(field):
+     if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+          return None
+     if isinstance(field, serializers.DecimalField):
+          return decimal_converter(field)
+     if isinstance(field, serializers.DateField):
+          return date_converter(field)
+     if isinstance(field, PASSTHROUGH):
+          return None
+     return field.to_representation
+
+def related_object(model, accessor):
+     for relation in model._meta.related_objects:
+          if relation.get_accessor_name() == accessor:
+               return relation
+     raise ValueError(f'{model.__name__} has no reverse relation {accessor}')
+
+def split_expansions(expand):
+     # ('orderitem_set.menuitem', 'category') -> {'orderitem_set': ('menuitem',), 'category': ()}
+     heads = {}
+     for path in expand:
+          head, _, rest = path.partition('.')
+          heads.setdefault(head, [])
+          if rest:
+               heads[head].append(rest)
+     return {head: tuple(rest) for head, rest in heads.items()}
+
+class FieldPlan:
+     # self.fields holds (name, kind, column, extra): kind is 'column' (extra is
+     # the converter), 'join' (extra is the plan of an expanded foreign key,
+     # read from the same row) or 'nested' (filled from a second query).
+     def __init__(self, serializer_class, fields=None, expand=(), prefix=''):
+          self.model = serializer_class.Meta.model
+          self.pk = prefix + self.model._meta.pk.attname
+          self.fields = []
+          self.nested = []
+          declared = serializer_class().fields
+          if fields is not None:
+               unknown = [name for name in fields if name not in declared]
+               if unknown:
+                    raise ValidationError({'fields': f'Unknown field {unknown[0]}. Use {", ".join(declared)}.'})
+          expansions = split_expansions(expand)
+          for name, field in declared.items():
+               if fields is not None and name not in fields:
+                    continue
+               if isinstance(field, serializers.ListSerializer):
+                    relation = related_object(self.model, field.source)
+                    child = FieldPlan(type(field.child), expand=expansions.pop(name, ()))
+                    self.nested.append((name, child, relation.field.attname))
+                    self.fields.append((name, 'nested', None, None))
+                    continue
+               model_field = self.model._meta.get_field(field.source)
+               if name in expansions and model_field.related_model in EXPANDABLE:
+                    joined = FieldPlan(
+                         EXPANDABLE[model_field.related_model],
+                         expand=expansions.pop(name),
+                         prefix=f'{prefix}{model_field.name}__',
+                    )
+                    self.fields.append((name, 'join', joined.pk, joined))
+                    continue
+               self.fields.append((name, 'column', prefix + model_field.attname, converter(field)))
+          if expansions:
+               raise ValidationError({'expand': f'Can not expand {next(iter(expansions))}.'})
+
+     @property
+     def columns(self):
+          columns = [self.pk]
+          for name, kind, column, extra in self.fields:
+               if kind == 'column':
+                    columns.append(column)
+               elif kind == 'join':
+                    columns += extra.columns
+          return columns
+
+     def values(self, queryset, *extra):
+          # Only the columns the output needs, plus whatever the caller reads off
+          # the rows itself (cursor fields, permission checks) and annotations
+          columns = dict.fromkeys([*self.columns, *extra, *queryset.query.annotations])
+          return queryset.prefetch_related(None).values(*columns)
+
+     def child_querysets(self, rows):
+          ids = [row[self.pk] for row in rows]
+          for name, plan, parent in self.nested:
+               children = plan.model.objects.filter(**{f'{parent}__in': ids}).order_by(parent, plan.pk)
+               yield name, plan, parent, plan.values(children, parent)
+
+     def data(self, rows):
+          nested = {}
+          if rows:
+               for name, plan, parent, children in self.child_querysets(rows):
+                    nested[name] = plan.group(list(children), parent)
+          return self.build(rows, nested)
+
+     async def adata(self, rows):
+          nested = {}
+          if rows:
+               for name, plan, parent, children in self.child_querysets(rows):
+                    nested[name] = plan.group([child async for child in children], parent)
+          return self.build(rows, nested)
+
+     def group(self, rows, parent):
+          groups = {}
+          for row, data in zip(rows, self.build(rows, {})):
+               groups.setdefault(row[parent], []).append(data)
+          return groups
+
+     def build_row(self, row, nested):
+          data = {}
+          for name, kind, column, extra in self.fields:
+               if kind == 'nested':
+                    data[name] = nested[name].get(row[self.pk], [])
+               elif kind == 'join':
+                    data[name] = None if row[column] is None else extra.build_row(row, nested)
+               else:
+                    value = row[column]
+                    data[name] = value if extra is None or value is None else extra(value)
+          return data
+
+     def build(self, rows, nested):
+          return [self.build_row(row, nested) for row in rows]
+
+def sparse_params(query_params):
+     # ?fields=title,id&expand=category -> (('id', 'title'), ('category',)). Both
+     # come back deduplicated and sorted: responses follow the serializer's field
+     # order anyway, and it keeps _plans down to one entry per distinct request.
+     fields = tuple(sorted({name.strip() for name in query_params.get('fields', '').split(',') if name.strip()})) or None
+     expand = tuple(sorted({path.strip() for path in query_params.get('expand', '').split(',') if path.strip()}))
+     return fields, expand
+
+# Plans are only stored once they validate, so this holds at most one entry per
+# subset of declared fields and expansions
+_plans = {}
+
+def plan_for(serializer_class, query_params=None):
+     fields, expand = sparse_params(query_params) if query_params is not None else (None, ())
+     key = (serializer_class, fields, expand)
+     if key not in _plans:
+          _plans[key] = FieldPlan(serializer_class, fields, expand)
+     return _plans[key]
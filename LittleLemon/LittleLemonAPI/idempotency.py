@@ -0,0 +1,126 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+POLL_INTERVAL = 0.05
+
+def _ttl():
+     return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400))
+
+def _wait():
+     return getattr(settings, 'IDEMPOTENCY_WAIT', 10)
+
+def _lease_end():
+     return now() + timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LEASE', 60))
+
+def lease_expired(record):
+     return record.locked_until is None or record.locked_until <= now()
+
+def fingerprint(request):
+     digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+     digest.update(request.body)
+     return digest.hexdigest()
+
+def claim(user, key, request_fingerprint):
+     # Returns (record, True) when this request should run the view: the first
+     # request with this key, or a retry taking over a claim whose worker died.
+     # Otherwise the existing record. Expired records are cleared and claimed afresh.
+     for _ in range(3):
+          try:
+               with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                         user_id=user.id, key=key, fingerprint=request_fingerprint, created=now(), locked_until=_lease_end(),
+                    )
+               return record, True
+          except IntegrityError:
+               record = IdempotencyKey.objects.filter(user=user.id, key=key).first()
+               if record is None:
+                    continue
+               if record.created < now() - _ttl():
+                    IdempotencyKey.objects.filter(pk=record.pk, created=record.created).delete()
+                    continue
+               if record.fingerprint == request_fingerprint and take_over(record):
+                    return record, True
+               return record, False
+     return record, False
+
+def take_over(record):
+     # Only one retry wins the conditional UPDATE on an abandoned claim
+     if record.status_code is not None or not lease_expired(record):
+          return False
+     locked_until = _lease_end()
+     taken = IdempotencyKey.objects.filter(
+          Q(locked_until__isnull=True) | Q(locked_until__lte=now()), pk=record.pk, status_code__isnull=True,
+     ).update(locked_until=locked_until)
+     if taken:
+          record.locked_until = locked_until
+     return bool(taken)
+
+def wait_for(record):
+     # A duplicate that arrives while the first request runs waits for its
+     # answer, or until the first request's lease runs out
+     deadline = time.monotonic() + _wait()
+     while record.status_code is None and not lease_expired(record) and time.monotonic() < deadline:
+          time.sleep(POLL_INTERVAL)
+          record = IdempotencyKey.objects.filter(pk=record.pk).first()
+          if record is None:
+               return None
+     return record
+
+def purge_expired():
+     # Keys past their TTL would only be cleared on reuse; run from purge_idempotency_keys
+     return IdempotencyKey.objects.filter(created__lt=now() - _ttl()).delete()[0]
+
+def replay(record):
+     return Response(json.loads(record.body), record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+def idempotent(method):
+     # Store the first response to a request carrying an Idempotency-Key and
+     # send it back for every retry with that key, without running the view.
+     @wraps(method)
+     def view_method(view, request, *args, **kwargs):
+          key = request.headers.get(HEADER)
+          if not key:
+               return method(view, request, *args, **kwargs)
+          if len(key) > 255:
+               return Response(f'{HEADER} must be at most 255 characters.', status.HTTP_400_BAD_REQUEST)
+
+          request_fingerprint = fingerprint(request)
+          record, created = claim(request.user, key, request_fingerprint)
+          if not created:
+               if record.fingerprint != request_fingerprint:
+                    return Response(f'{HEADER} was already used for a different request.', status.HTTP_422_UNPROCESSABLE_ENTITY)
+               record = wait_for(record)
+               if record is None:
+                    return Response(f'The first request with this {HEADER} failed; retry it.', status.HTTP_409_CONFLICT)
+               if record.status_code is not None:
+                    return replay(record)
+               if not take_over(record):
+                    return Response(f'A request with this {HEADER} is still in progress.', status.HTTP_409_CONFLICT)
+
+          # Writes are conditional on the lease, so a worker that lost its
+          # claim to a retry can't overwrite or drop the retry's record
+          owned = IdempotencyKey.objects.filter(pk=record.pk, locked_until=record.locked_until)
+          try:
+               response = method(view, request, *args, **kwargs)
+          except Exception:
+               # Nothing to replay: let the next retry run the view again
+               owned.delete()
+               raise
+          if response.status_code >= 500:
+               owned.delete()
+               return response
+          owned.update(status_code=response.status_code, body=json.dumps(response.data, cls=JSONEncoder))
+          return response
+     return view_method
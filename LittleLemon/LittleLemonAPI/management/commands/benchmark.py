@@ -0,0 +1,224 @@
+import json
+import platform
+import time
+import tracemalloc
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.utils.timezone import now
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from LittleLemonAPI.membership import add_members
+from LittleLemonAPI.models import Cart, MenuItem, Order
+from LittleLemonAPI.roles import MANAGER, DELIVERY_CREW
+from .seed import SEED_PREFIX, seed_database
+
+SIZES = {
+     'small': {'users': 100, 'categories': 5, 'items': 200, 'carts': 50, 'orders': 500},
+     'medium': {'users': 1000, 'categories': 20, 'items': 2000, 'carts': 500, 'orders': 5000},
+     'large': {'users': 10000, 'categories': 50, 'items': 20000, 'carts': 5000, 'orders': 50000},
+}
+
+def percentile(samples, percent):
+     # Nearest-rank percentile over already sorted samples
+     index = max(0, min(len(samples) - 1, round(percent / 100 * len(samples) + 0.5) - 1))
+     return samples[index]
+
+class Context:
+     def __init__(self):
+          self.admin = User.objects.get(username=f'{SEED_PREFIX}admin')
+          self.manager = User.objects.filter(groups__name=MANAGER, username__startswith=SEED_PREFIX).first()
+          self.crew = User.objects.filter(groups__name=DELIVERY_CREW, username__startswith=SEED_PREFIX).first()
+          # Re-adding the existing crew keeps the bulk scenario repeatable
+          self.crew_ids = list(User.objects.filter(groups__name=DELIVERY_CREW, username__startswith=SEED_PREFIX).values_list('id', flat=True)[:50])
+          self.manager_ids = list(User.objects.filter(groups__name=MANAGER, username__startswith=SEED_PREFIX).values_list('id', flat=True)[:50])
+          order = Order.objects.filter(user__username__startswith=SEED_PREFIX).order_by('id').first()
+          self.customer = order.user
+          self.order = order
+          self.item = MenuItem.objects.order_by('id').first()
+          # Put back into a group before every removal so the remove scenarios repeat
+          self.members = list(
+               User.objects.filter(username__startswith=SEED_PREFIX, groups__isnull=True, is_superuser=False)
+               .exclude(pk=self.customer.pk).order_by('id').values_list('id', flat=True)[:50]
+          )
+          self.clients = {}
+
+     def client(self, role):
+          if role not in self.clients:
+               user = getattr(self, role)
+               token, _ = Token.objects.get_or_create(user=user)
+               client = APIClient()
+               client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+               self.clients[role] = client
+          return self.clients[role]
+
+def refill_cart(ctx):
+     Cart.objects.get_or_create(
+          user=ctx.customer, menuitem=ctx.item,
+          defaults={'quantity': 1, 'unit_price': ctx.item.price, 'price': ctx.item.price},
+     )
+
+def rejoin(group_name):
+     return lambda ctx: add_members(group_name, ctx.members)
+
+# (name, role, method, path, data, setup) for every route in LittleLemonAPI/urls.py
+SCENARIOS = [
+     ('categories list', 'customer', 'get', lambda ctx: '/api/categories', None, None),
+     ('menu-items list', 'customer', 'get', lambda ctx: '/api/menu-items?perpage=20', None, None),
+     ('menu-items deep page', 'customer', 'get', lambda ctx: '/api/menu-items?perpage=20&page=50', None, None),
+     ('menu-items cursor', 'customer', 'get', lambda ctx: '/api/menu-items?perpage=20&cursor=', None, None),
+     ('menu-items search', 'customer', 'get', lambda ctx: '/api/menu-items?perpage=20&search=item 1', None, None),
+     ('menu-items sparse', 'customer', 'get', lambda ctx: '/api/menu-items?perpage=20&fields=id,title,price', None, None),
+     ('menu-items expanded', 'customer', 'get', lambda ctx: '/api/menu-items?perpage=20&expand=category', None, None),
+     ('menu-item detail', 'manager', 'get', lambda ctx: f'/api/menu-items/{ctx.item.id}', None, None),
+     ('menu-item patch', 'manager', 'patch', lambda ctx: f'/api/menu-items/{ctx.item.id}', {'featured': True}, None),
+     ('menu export', 'manager', 'get', lambda ctx: '/api/menu-items/export.csv', None, None),
+     ('menu import (update)', 'admin', 'post', lambda ctx: '/api/menu-items/import.ndjson', lambda ctx: {'id': ctx.item.id, 'title': ctx.item.title, 'price': str(ctx.item.price), 'category': ctx.item.category_id}, None),
+     ('manager group list', 'admin', 'get', lambda ctx: '/api/groups/manager/users', None, None),
+     ('manager group add', 'admin', 'post', lambda ctx: '/api/groups/manager/users', lambda ctx: {'id': ctx.manager.id}, None),
+     ('manager group remove', 'admin', 'delete', lambda ctx: f'/api/groups/manager/users/{ctx.members[0]}', None, rejoin(MANAGER)),
+     ('manager group bulk add', 'admin', 'post', lambda ctx: '/api/groups/manager/users/bulk', lambda ctx: {'ids': ctx.manager_ids}, None),
+     ('manager group bulk remove', 'admin', 'delete', lambda ctx: '/api/groups/manager/users/bulk', lambda ctx: {'ids': ctx.members}, rejoin(MANAGER)),
+     ('delivery crew list', 'manager', 'get', lambda ctx: '/api/groups/delivery-crew/users', None, None),
+     ('delivery crew add', 'manager', 'post', lambda ctx: '/api/groups/delivery-crew/users', lambda ctx: {'id': ctx.crew.id}, None),
+     ('delivery crew remove', 'manager', 'delete', lambda ctx: f'/api/groups/delivery-crew/users/{ctx.members[0]}', None, rejoin(DELIVERY_CREW)),
+     ('delivery crew bulk add', 'manager', 'post', lambda ctx: '/api/groups/delivery-crew/users/bulk', lambda ctx: {'ids': ctx.crew_ids}, None),
+     ('delivery crew bulk remove', 'manager', 'delete', lambda ctx: '/api/groups/delivery-crew/users/bulk', lambda ctx: {'ids': ctx.members}, rejoin(DELIVERY_CREW)),
+     ('cart list', 'customer', 'get', lambda ctx: '/api/carts/menu-items', None, None),
+     ('cart add', 'customer', 'post', lambda ctx: '/api/carts/menu-items', lambda ctx: {'id': ctx.item.id, 'quantity': 1}, None),
+     ('orders list (manager)', 'manager', 'get', lambda ctx: '/api/orders', None, None),
+     ('orders list (delivery crew)', 'crew', 'get', lambda ctx: '/api/orders', None, None),
+     ('orders list (customer)', 'customer', 'get', lambda ctx: '/api/orders', None, None),
+     ('orders list expanded', 'manager', 'get', lambda ctx: '/api/orders?expand=orderitem_set.menuitem', None, None),
+     ('order place', 'customer', 'post', lambda ctx: '/api/orders', None, refill_cart),
+     ('orders export', 'manager', 'get', lambda ctx: '/api/orders/export.csv', None, None),
+     ('order detail', 'customer', 'get', lambda ctx: f'/api/orders/{ctx.order.id}', None, None),
+     ('sales report', 'manager', 'get', lambda ctx: '/api/reports/sales?group_by=menuitem', None, None),
+     ('stats', 'admin', 'get', lambda ctx: '/api/stats', None, None),
+     ('orders bulk dispatch', 'manager', 'post', lambda ctx: '/api/orders/dispatch', lambda ctx: {'orders': [ctx.order.id], 'delivery_crew': ctx.crew.id}, None),
+     ('orders auto dispatch', 'manager', 'post', lambda ctx: '/api/orders/dispatch', {'auto': True, 'limit': 100}, None),
+     ('order assign', 'manager', 'patch', lambda ctx: f'/api/orders/{ctx.order.id}', lambda ctx: {'id': ctx.crew.id, 'status': 1}, None),
+]
+
+def read(response):
+     if response.streaming:
+          # Exports do their work while the body is read
+          b''.join(response.streaming_content)
+     return response
+
+def run_scenario(ctx, scenario, iterations, cold):
+     name, role, method, path, data, setup = scenario
+     client = ctx.client(role)
+     url = path(ctx)
+     payload = data(ctx) if callable(data) else data
+
+     def request():
+          if setup:
+               setup(ctx)
+          if cold:
+               cache.clear()
+          return read(getattr(client, method)(url, payload, format='json'))
+
+     request()  # warm up imports, caches and the token lookup
+     timings = []
+     queries = []
+     statuses = set()
+     for _ in range(iterations):
+          if setup:
+               setup(ctx)
+          if cold:
+               cache.clear()
+          with CaptureQueriesContext(connection) as captured:
+               started = time.perf_counter()
+               response = read(getattr(client, method)(url, payload, format='json'))
+               timings.append((time.perf_counter() - started) * 1000)
+          queries.append(len(captured))
+          statuses.add(response.status_code)
+
+     # Memory is traced on a separate request so tracing does not skew the timings
+     tracemalloc.start()
+     request()
+     _, peak = tracemalloc.get_traced_memory()
+     tracemalloc.stop()
+
+     timings.sort()
+     return {
+          'endpoint': name,
+          'method': method.upper(),
+          'path': url,
+          'role': role,
+          'status': sorted(statuses),
+          'iterations': iterations,
+          'p50_ms': round(percentile(timings, 50), 3),
+          'p95_ms': round(percentile(timings, 95), 3),
+          'p99_ms': round(percentile(timings, 99), 3),
+          'mean_ms': round(sum(timings) / len(timings), 3),
+          'queries': max(queries),
+          'peak_memory_kb': round(peak / 1024, 1),
+     }
+
+class Command(BaseCommand):
+     help = (
+          'Seed a throwaway test database at several sizes and time every API route through '
+          'the Django test client. Prints JSON with p50/p95/p99 latency, query counts and peak memory.'
+     )
+
+     def add_arguments(self, parser):
+          parser.add_argument('--sizes', default='small,medium', help=f'Comma separated, from {", ".join(SIZES)}.')
+          parser.add_argument('--iterations', type=int, default=50)
+          parser.add_argument('--only', help='Run only endpoints whose name contains this text.')
+          parser.add_argument('--cold', action='store_true', help='Clear the Django cache before every request.')
+          parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+     def handle(self, *args, **options):
+          sizes = [size.strip() for size in options['sizes'].split(',') if size.strip()]
+          unknown = [size for size in sizes if size not in SIZES]
+          if unknown:
+               raise CommandError(f'Unknown size: {", ".join(unknown)}')
+          if options['iterations'] < 1:
+               raise CommandError('--iterations must be at least 1')
+          scenarios = [s for s in SCENARIOS if not options['only'] or options['only'] in s[0]]
+
+          report = {
+               'meta': {
+                    'started': now().isoformat(),
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                    'iterations': options['iterations'],
+                    'cold_cache': options['cold'],
+               },
+               'results': [],
+          }
+
+          # Never touch the configured database: run against a fresh test database
+          setup_test_environment()
+          old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+          # Repeated requests from one client would otherwise drain its token buckets
+          throttling = override_settings(THROTTLE_BUCKETS={})
+          throttling.enable()
+          try:
+               for size in sizes:
+                    counts = seed_database(**SIZES[size], flush=True)
+                    cache.clear()
+                    ctx = Context()
+                    for scenario in scenarios:
+                         result = run_scenario(ctx, scenario, options['iterations'], options['cold'])
+                         result['size'] = size
+                         result['data'] = counts
+                         report['results'].append(result)
+                         self.stderr.write(f"{size:>6} {result['endpoint']:<28} p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  {result['queries']:>3} queries")
+          finally:
+               throttling.disable()
+               connection.creation.destroy_test_db(old_name, verbosity=0)
+               teardown_test_environment()
+
+          output = json.dumps(report, indent=2)
+          if options['output']:
+               with open(options['output'], 'w') as report_file:
+                    report_file.write(output + '\n')
+          else:
+               self.stdout.write(output)
@@ -0,0 +1,68 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+from LittleLemonAPI.fastpath import plan_for
+from LittleLemonAPI.models import Category, MenuItem, Order
+from LittleLemonAPI.renderers import FastJSONRenderer
+from LittleLemonAPI.serializers import CategorySerializer, MenuItemSerializer, OrderSerializer
+from .benchmark import percentile
+from .seed import seed_database
+
+LISTS = [
+     ('categories', CategorySerializer, lambda: Category.objects.order_by('id')),
+     ('menu-items', MenuItemSerializer, lambda: MenuItem.objects.order_by('id')),
+     ('orders', OrderSerializer, lambda: Order.objects.order_by('id').prefetch_related('orderitem_set')),
+]
+
+def serializer_path(serializer_class, queryset):
+     return JSONRenderer().render(serializer_class(queryset(), many=True).data)
+
+def fast_path(serializer_class, queryset):
+     plan = plan_for(serializer_class)
+     return FastJSONRenderer().render(plan.data(list(plan.values(queryset()))))
+
+def time_path(path, serializer_class, queryset, iterations):
+     timings = []
+     for _ in range(iterations):
+          started = time.perf_counter()
+          content = path(serializer_class, queryset)
+          timings.append((time.perf_counter() - started) * 1000)
+     timings.sort()
+     return content, {'p50_ms': round(percentile(timings, 50), 2), 'p95_ms': round(percentile(timings, 95), 2)}
+
+class Command(BaseCommand):
+     help = (
+          'Seed a throwaway test database and time full list serialization (ModelSerializer + '
+          'JSONRenderer) against the .values() fast path. Fails if their output differs.'
+     )
+
+     def add_arguments(self, parser):
+          parser.add_argument('--rows', type=int, default=10000, help='Rows in each list.')
+          parser.add_argument('--iterations', type=int, default=5)
+
+     def handle(self, *args, **options):
+          if options['rows'] < 1 or options['iterations'] < 1:
+               raise CommandError('--rows and --iterations must be at least 1')
+          rows = options['rows']
+          report = {'rows': rows, 'iterations': options['iterations'], 'results': []}
+
+          setup_test_environment()
+          old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+          try:
+               seed_database(users=100, categories=rows, items=rows, carts=0, orders=rows, lines=3, flush=True)
+               for name, serializer_class, queryset in LISTS:
+                    expected, slow = time_path(serializer_path, serializer_class, queryset, options['iterations'])
+                    content, fast = time_path(fast_path, serializer_class, queryset, options['iterations'])
+                    if content != expected:
+                         raise CommandError(f'{name}: fast path output differs from {serializer_class.__name__}')
+                    speedup = round(slow['p50_ms'] / fast['p50_ms'], 1) if fast['p50_ms'] else None
+                    report['results'].append({'list': name, 'bytes': len(content), 'serializer': slow, 'fast_path': fast, 'speedup': speedup})
+                    self.stderr.write(f"{name:<12} serializer p50 {slow['p50_ms']:>9.2f} ms  fast path p50 {fast['p50_ms']:>8.2f} ms  x{speedup}")
+          finally:
+               connection.creation.destroy_test_db(old_name, verbosity=0)
+               teardown_test_environment()
+
+          self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from LittleLemonAPI.menu_io import FORMATS, export_menu
+
+class Command(BaseCommand):
+     help = 'Write every menu item to a CSV or NDJSON file that import_menu can read back.'
+
+     def add_arguments(self, parser):
+          parser.add_argument('path', help='File to write, or - for stdout.')
+          parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+          parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip.')
+
+     def handle(self, *args, **options):
+          path = options['path']
+          fmt = options['format'] or path.rsplit('.', 1)[-1]
+          if fmt not in FORMATS:
+               raise CommandError(f'--format must be one of {", ".join(FORMATS)}')
+          if options['chunk_size'] < 1:
+               raise CommandError('--chunk-size must be at least 1')
+
+          if path == '-':
+               self.stdout.writelines(export_menu(fmt, options['chunk_size']))
+               return
+          with open(path, 'w', encoding='utf-8', newline='') as out:
+               out.writelines(export_menu(fmt, options['chunk_size']))
@@ -0,0 +1,32 @@
+import json
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from LittleLemonAPI.menu_io import BATCH_SIZE, FORMATS, import_menu
+
+class Command(BaseCommand):
+     help = 'Create or update menu items from a CSV or NDJSON file. Rows with an id update that item.'
+
+     def add_arguments(self, parser):
+          parser.add_argument('path', help='File to read, or - for stdin.')
+          parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+          parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows written per bulk statement.')
+
+     def handle(self, *args, **options):
+          path = options['path']
+          fmt = options['format'] or path.rsplit('.', 1)[-1]
+          if fmt not in FORMATS:
+               raise CommandError(f'--format must be one of {", ".join(FORMATS)}')
+          if options['batch_size'] < 1:
+               raise CommandError('--batch-size must be at least 1')
+
+          if path == '-':
+               summary = import_menu(sys.stdin, fmt, options['batch_size'])
+          else:
+               with open(path, encoding='utf-8', newline='') as lines:
+                    summary = import_menu(lines, fmt, options['batch_size'])
+
+          for error in summary['errors']:
+               self.stderr.write(f'line {error["line"]}: {json.dumps(error["errors"])}')
+          self.stdout.write(self.style.SUCCESS(
+               f'Created {summary["created"]}, updated {summary["updated"]}, rejected {summary["error_count"]} rows.'
+          ))
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import time
+import types
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import include, path
+from rest_framework.authtoken.models import Token
+from LittleLemonAPI.models import Order
+from LittleLemonAPI.roles import MANAGER
+from LittleLemonAPI.urls import build_urlpatterns
+from .benchmark import SIZES, percentile
+from .seed import SEED_PREFIX, seed_database
+
+def urlconf(async_reads):
+     module = types.ModuleType(f'loadtest_urls_{"async" if async_reads else "sync"}')
+     module.urlpatterns = [path('api/', include(build_urlpatterns(async_reads)))]
+     return module
+
+async def asgi_get(app, url, token):
+     # One GET straight through the ASGI application, no server or sockets
+     path_part, _, query = url.partition('?')
+     scope = {
+          'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+          'method': 'GET', 'scheme': 'http', 'path': path_part, 'raw_path': path_part.encode(),
+          'query_string': query.encode(), 'root_path': '',
+          'headers': [(b'host', b'testserver'), (b'authorization', f'Token {token}'.encode())],
+          'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+     }
+     sent = False
+     never = asyncio.Event()
+     status = []
+
+     async def receive():
+          nonlocal sent
+          if not sent:
+               sent = True
+               return {'type': 'http.request', 'body': b'', 'more_body': False}
+          await never.wait()
+
+     async def send(message):
+          if message['type'] == 'http.response.start':
+               status.append(message['status'])
+
+     await app(scope, receive, send)
+     return status[0]
+
+async def drive(app, url, token, total, concurrency):
+     timings = []
+     statuses = {}
+     queue = iter(range(total))
+
+     async def worker():
+          for _ in queue:
+               started = time.perf_counter()
+               status = await asgi_get(app, url, token)
+               timings.append((time.perf_counter() - started) * 1000)
+               statuses[status] = statuses.get(status, 0) + 1
+
+     started = time.perf_counter()
+     await asyncio.gather(*(worker() for _ in range(concurrency)))
+     elapsed = time.perf_counter() - started
+     timings.sort()
+     return {
+          'requests': total,
+          'concurrency': concurrency,
+          'status': statuses,
+          'throughput_rps': round(total / elapsed, 1),
+          'p50_ms': round(percentile(timings, 50), 3),
+          'p95_ms': round(percentile(timings, 95), 3),
+          'p99_ms': round(percentile(timings, 99), 3),
+     }
+
+class Command(BaseCommand):
+     help = (
+          'Compare the async read views with their sync DRF versions under concurrent load, '
+          'calling the ASGI application in-process. Prints JSON with throughput and latency.'
+     )
+
+     def add_arguments(self, parser):
+          parser.add_argument('--size', default='small', help=f'Seed size, one of {", ".join(SIZES)}.')
+          parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint and mode.')
+          parser.add_argument('--concurrency', type=int, default=200)
+          parser.add_argument('--cold', action='store_true', help='Clear the catalog cache before each endpoint run.')
+          parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+     def handle(self, *args, **options):
+          if options['size'] not in SIZES:
+               raise CommandError(f'Unknown size: {options["size"]}')
+          if options['requests'] < 1 or options['concurrency'] < 1:
+               raise CommandError('--requests and --concurrency must be at least 1')
+
+          setup_test_environment()
+          old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+          try:
+               report = self.run(options)
+          finally:
+               connection.creation.destroy_test_db(old_name, verbosity=0)
+               teardown_test_environment()
+
+          output = json.dumps(report, indent=2)
+          if options['output']:
+               with open(options['output'], 'w') as report_file:
+                    report_file.write(output + '\n')
+          else:
+               self.stdout.write(output)
+
+     def run(self, options):
+          counts = seed_database(**SIZES[options['size']], flush=True)
+          manager = User.objects.filter(groups__name=MANAGER, username__startswith=SEED_PREFIX).first()
+          order = Order.objects.order_by('id').first()
+          tokens = {
+               'manager': Token.objects.get_or_create(user=manager)[0].key,
+               'customer': Token.objects.get_or_create(user=order.user)[0].key,
+          }
+          endpoints = [
+               ('categories', 'customer', '/api/categories'),
+               ('menu-items', 'customer', '/api/menu-items?perpage=20'),
+               ('menu-items cursor', 'customer', '/api/menu-items?perpage=20&cursor='),
+               ('orders (manager)', 'manager', '/api/orders'),
+               ('orders (customer)', 'customer', '/api/orders'),
+               ('order detail', 'customer', f'/api/orders/{order.id}'),
+          ]
+          # The test database lives in a file, so closing here lets worker threads open their own
+          connection.close()
+
+          app = get_asgi_application()
+          results = []
+          for async_reads in (False, True):
+               mode = 'async' if async_reads else 'sync'
+               # Measure the handlers, not the rate limiter turning requests away
+               with override_settings(ROOT_URLCONF=urlconf(async_reads), THROTTLE_BUCKETS={}):
+                    for name, role, url in endpoints:
+                         if options['cold']:
+                              cache.clear()
+                         asyncio.run(drive(app, url, tokens[role], min(20, options['requests']), options['concurrency']))
+                         result = asyncio.run(drive(app, url, tokens[role], options['requests'], options['concurrency']))
+                         result.update({'endpoint': name, 'path': url, 'mode': mode})
+                         results.append(result)
+                         self.stderr.write(f"{mode:>5} {name:<20} {result['throughput_rps']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms")
+          return {'size': options['size'], 'data': counts, 'results': results}
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.idempotency import purge_expired
+
+class Command(BaseCommand):
+     help = 'Delete Idempotency-Key records older than IDEMPOTENCY_KEY_TTL. Run it from cron.'
+
+     def handle(self, *args, **options):
+          purged = purge_expired()
+          self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired idempotency keys.'))
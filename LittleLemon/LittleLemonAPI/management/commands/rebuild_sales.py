@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from LittleLemonAPI.reports import rebuild_sales
+
+class Command(BaseCommand):
+     help = 'Rebuild the daily sales rollup from order history, in chunks of orders.'
+
+     def add_arguments(self, parser):
+          parser.add_argument('--date-from', help='First day to rebuild (YYYY-MM-DD). Defaults to all history.')
+          parser.add_argument('--date-to', help='Last day to rebuild (YYYY-MM-DD).')
+          parser.add_argument('--chunk-size', type=int, default=5000, help='Orders folded in per statement.')
+
+     def handle(self, *args, **options):
+          dates = {}
+          for option in ('date_from', 'date_to'):
+               value = options[option]
+               if value:
+                    dates[option] = parse_date(value)
+                    if dates[option] is None:
+                         raise CommandError(f'--{option.replace("_", "-")} must be YYYY-MM-DD')
+          if options['chunk_size'] < 1:
+               raise CommandError('--chunk-size must be at least 1')
+
+          total = rebuild_sales(
+               chunk_size=options['chunk_size'],
+               progress=lambda done: self.stdout.write(f'{done} orders folded in'),
+               **dates,
+          )
+          self.stdout.write(self.style.SUCCESS(f'Rebuilt daily sales from {total} orders.'))
@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from LittleLemonAPI.outbox import process_batch, purge_done, worker_name
+
+class Command(BaseCommand):
+     help = 'Deliver outbox events to their registered handlers, a batch at a time, retrying failures with backoff.'
+
+     def add_arguments(self, parser):
+          parser.add_argument('--batch-size', type=int, default=100, help='Events claimed per round trip.')
+          parser.add_argument('--lease', type=int, default=60, help='Seconds a claimed batch is reserved for this worker.')
+          parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when nothing is due.')
+          parser.add_argument('--keep-days', type=int, default=7, help='Delete delivered events older than this.')
+          parser.add_argument('--once', action='store_true', help='Exit once nothing is due instead of polling.')
+
+     def handle(self, *args, **options):
+          if options['batch_size'] < 1 or options['lease'] < 1:
+               raise CommandError('--batch-size and --lease must be at least 1')
+          worker = worker_name()
+          keep = timedelta(days=options['keep_days'])
+          totals = [0, 0]
+          try:
+               while True:
+                    delivered, failed = process_batch(worker, options['batch_size'], options['lease'])
+                    totals[0] += delivered
+                    totals[1] += failed
+                    if delivered or failed:
+                         self.stdout.write(f'{delivered} delivered, {failed} failed')
+                         continue
+                    purge_done(keep)
+                    if options['once']:
+                         break
+                    time.sleep(options['poll_interval'])
+          except KeyboardInterrupt:
+               pass
+          self.stdout.write(self.style.SUCCESS(f'Outbox worker {worker} delivered {totals[0]} events, {totals[1]} failures.'))
@@ -0,0 +1,148 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+from LittleLemonAPI.catalog import bump_catalog_version
+from LittleLemonAPI.models import Category, MenuItem, Cart, Order, OrderItem
+from LittleLemonAPI.reports import apply_order_sales
+from LittleLemonAPI.roles import MANAGER, DELIVERY_CREW, clear_roles
+from LittleLemonAPI.search import index_menu_items
+
+SEED_PREFIX = 'seed-'
+SEED_PASSWORD = 'API@2026'
+BATCH_SIZE = 1000
+
+def flush_seed_data():
+     Order.objects.all().delete()
+     Cart.objects.all().delete()
+     MenuItem.objects.all().delete()
+     Category.objects.all().delete()
+     User.objects.filter(username__startswith=SEED_PREFIX).delete()
+     index_menu_items()
+
+def seed_database(users=100, categories=5, items=200, carts=50, orders=500, lines=3, seed=0, flush=False):
+     rng = random.Random(seed)
+     with transaction.atomic():
+          if flush:
+               flush_seed_data()
+
+          manager_group, _ = Group.objects.get_or_create(name=MANAGER)
+          crew_group, _ = Group.objects.get_or_create(name=DELIVERY_CREW)
+
+          # Hash once; every seeded user shares the documented test password
+          password = make_password(SEED_PASSWORD)
+          start = User.objects.filter(username__startswith=SEED_PREFIX).count()
+          new_users = User.objects.bulk_create(
+               [User(username=f'{SEED_PREFIX}{start + n}', password=password) for n in range(users)],
+               batch_size=BATCH_SIZE,
+          )
+          if not User.objects.filter(username=f'{SEED_PREFIX}admin').exists():
+               User.objects.create(username=f'{SEED_PREFIX}admin', password=password, is_staff=True, is_superuser=True)
+          manager_count = max(1, users // 100) if users else 0
+          crew_count = max(1, users // 20) if users > 1 else 0
+          managers = new_users[:manager_count]
+          crew = new_users[manager_count:manager_count + crew_count]
+          customers = new_users[manager_count + crew_count:] or new_users
+          manager_group.user_set.add(*managers)
+          crew_group.user_set.add(*crew)
+          clear_roles()
+
+          new_categories = Category.objects.bulk_create(
+               [Category(slug=f'category-{n}', title=f'Category {n}') for n in range(categories)],
+               batch_size=BATCH_SIZE,
+          )
+          new_items = []
+          if new_categories:
+               new_items = MenuItem.objects.bulk_create(
+                    [
+                         MenuItem(
+                              title=f'Menu item {n}',
+                              price=Decimal(rng.randint(100, 5000)) / 100,
+                              featured=rng.random() < 0.1,
+                              category=rng.choice(new_categories),
+                         )
+                         for n in range(items)
+                    ],
+                    batch_size=BATCH_SIZE,
+               )
+               index_menu_items(item.id for item in new_items)
+          bump_catalog_version()
+
+          line_count = min(lines, len(new_items))
+          cart_rows = []
+          if line_count:
+               for user in customers[:carts]:
+                    for item in rng.sample(new_items, line_count):
+                         quantity = rng.randint(1, 3)
+                         cart_rows.append(Cart(user=user, menuitem=item, quantity=quantity, unit_price=item.price, price=item.price * quantity))
+          Cart.objects.bulk_create(cart_rows, batch_size=BATCH_SIZE)
+
+          order_lines = []
+          new_orders = []
+          if line_count and customers:
+               today = now().date()
+               for _ in range(orders):
+                    picked = [(item, rng.randint(1, 3)) for item in rng.sample(new_items, line_count)]
+                    order_lines.append(picked)
+                    delivered = rng.random() < 0.5
+                    new_orders.append(Order(
+                         user=rng.choice(customers),
+                         delivery_crew=rng.choice(crew) if crew and (delivered or rng.random() < 0.5) else None,
+                         status=delivered,
+                         total=sum(item.price * quantity for item, quantity in picked),
+                         date=today - timedelta(days=rng.randint(0, 89)),
+                    ))
+               new_orders = Order.objects.bulk_create(new_orders, batch_size=BATCH_SIZE)
+          OrderItem.objects.bulk_create(
+               [
+                    OrderItem(order=order, menuitem=item, category_id=item.category_id, quantity=quantity, unit_price=item.price, price=item.price * quantity)
+                    for order, picked in zip(new_orders, order_lines)
+                    for item, quantity in picked
+               ],
+               batch_size=BATCH_SIZE,
+          )
+          if new_orders:
+               apply_order_sales('o.id >= %s AND o.id <= %s', [new_orders[0].id, new_orders[-1].id])
+
+     return {
+          'users': len(new_users),
+          'managers': len(managers),
+          'delivery_crew': len(crew),
+          'categories': len(new_categories),
+          'menu_items': len(new_items),
+          'cart_lines': len(cart_rows),
+          'orders': len(new_orders),
+          'order_items': sum(len(picked) for picked in order_lines),
+     }
+
+class Command(BaseCommand):
+     help = 'Seed the database with generated users, categories, menu items, carts and orders.'
+
+     def add_arguments(self, parser):
+          parser.add_argument('--users', type=int, default=100)
+          parser.add_argument('--categories', type=int, default=5)
+          parser.add_argument('--items', type=int, default=200)
+          parser.add_argument('--carts', type=int, default=50, help='Number of customers given a filled cart.')
+          parser.add_argument('--orders', type=int, default=500)
+          parser.add_argument('--lines', type=int, default=3, help='Menu items per cart and per order.')
+          parser.add_argument('--seed', type=int, default=0, help='Random seed, so runs are repeatable.')
+          parser.add_argument('--flush', action='store_true', help='Remove menu, carts, orders and seeded users first.')
+
+     def handle(self, *args, **options):
+          counts = seed_database(
+               users=options['users'],
+               categories=options['categories'],
+               items=options['items'],
+               carts=options['carts'],
+               orders=options['orders'],
+               lines=options['lines'],
+               seed=options['seed'],
+               flush=options['flush'],
+          )
+          for name, count in counts.items():
+               self.stdout.write(f'{name}: {count}')
+          self.stdout.write(self.style.SUCCESS('Seeding complete.'))
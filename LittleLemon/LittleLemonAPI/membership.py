@@ -0,0 +1,49 @@
+from django.contrib.auth.models import User
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from .roles import get_group, invalidate_roles
+
+MAX_MEMBERS = 1000
+
+Membership = User.groups.through
+
+def parse_members(data):
+     # {"ids": [...], "usernames": [...]}, either list may be left out
+     ids = data.get('ids') or []
+     usernames = data.get('usernames') or []
+     if not isinstance(ids, list) or not isinstance(usernames, list):
+          raise ValidationError('ids and usernames must be lists')
+     if not ids and not usernames:
+          raise ValidationError('ids or usernames is required.')
+     if len(ids) + len(usernames) > MAX_MEMBERS:
+          raise ValidationError(f'At most {MAX_MEMBERS} users per request')
+     try:
+          ids = {int(user_id) for user_id in ids}
+     except (TypeError, ValueError):
+          raise ValidationError('User ids must be numbers')
+     return ids, {str(username) for username in usernames}
+
+def resolve_users(ids, usernames):
+     # One query for both lists; whatever did not match is reported back
+     users = dict(User.objects.filter(Q(id__in=ids) | Q(username__in=usernames)).values_list('id', 'username'))
+     missing = {
+          'ids': sorted(ids - set(users)),
+          'usernames': sorted(usernames - set(users.values())),
+     }
+     return sorted(users), missing
+
+def add_members(group_name, user_ids):
+     group = get_group(group_name)
+     # A single INSERT; rows that already exist are skipped by the unique constraint
+     Membership.objects.bulk_create(
+          [Membership(user_id=user_id, group_id=group.id) for user_id in user_ids], ignore_conflicts=True,
+     )
+     for user_id in user_ids:
+          invalidate_roles(user_id)
+
+def remove_members(group_name, user_ids):
+     group = get_group(group_name)
+     removed = Membership.objects.filter(group_id=group.id, user_id__in=user_ids).delete()[0]
+     for user_id in user_ids:
+          invalidate_roles(user_id)
+     return removed
@@ -0,0 +1,177 @@
+import csv
+import json
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework import serializers
+from .carts import overflowing_items, reprice_carts
+from .catalog import bump_catalog_version
+from .models import Category, MenuItem
+from .search import index_menu_items
+
+FORMATS = ('csv', 'ndjson')
+EXPORT_FIELDS = ['id', 'title', 'price', 'featured', 'category', 'category_slug']
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+class MenuItemRowSerializer(serializers.Serializer):
+     # Field-level checks only: categories and ids are resolved in bulk, not per row
+     id = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+     title = serializers.CharField(max_length=255)
+     price = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=0)
+     featured = serializers.BooleanField(default=False)
+     category = serializers.IntegerField(required=False, allow_null=True)
+     category_slug = serializers.CharField(required=False, allow_blank=True)
+
+def read_rows(lines, fmt):
+     # Yield (line number, row dict or error message) from an iterable of text lines
+     if fmt == 'csv':
+          reader = csv.DictReader(lines)
+          for row in reader:
+               yield reader.line_num, {key: value for key, value in row.items() if key and value != ''}
+          return
+     for line_no, line in enumerate(lines, start=1):
+          line = line.strip()
+          if not line:
+               continue
+          try:
+               row = json.loads(line)
+          except ValueError as exc:
+               yield line_no, f'Invalid JSON: {exc}'
+               continue
+          yield line_no, row if isinstance(row, dict) else 'Each line must be a JSON object'
+
+class MenuImport:
+     def __init__(self, batch_size=BATCH_SIZE):
+          self.batch_size = batch_size
+          self.created = 0
+          self.updated = 0
+          self.error_count = 0
+          self.errors = []
+          # One query for every category, up front; menus have few of them
+          categories = list(Category.objects.only('id', 'slug'))
+          self.category_ids = {category.id for category in categories}
+          self.category_slugs = {category.slug: category.id for category in categories}
+
+     def error(self, line_no, detail):
+          self.error_count += 1
+          if len(self.errors) < MAX_REPORTED_ERRORS:
+               self.errors.append({'line': line_no, 'errors': detail})
+
+     def run(self, lines, fmt):
+          batch = []
+          for line_no, row in read_rows(lines, fmt):
+               if isinstance(row, str):
+                    self.error(line_no, row)
+                    continue
+               batch.append((line_no, row))
+               if len(batch) >= self.batch_size:
+                    self.apply(batch)
+                    batch = []
+          if batch:
+               self.apply(batch)
+          if self.created or self.updated:
+               bump_catalog_version()
+          return self.summary()
+
+     def resolve_category(self, data):
+          if data.get('category') is not None:
+               return data['category'] if data['category'] in self.category_ids else None
+          return self.category_slugs.get(data.get('category_slug'))
+
+     def apply(self, batch):
+          valid = []
+          for line_no, row in batch:
+               serializer = MenuItemRowSerializer(data=row)
+               if not serializer.is_valid():
+                    self.error(line_no, serializer.errors)
+                    continue
+               data = serializer.validated_data
+               category_id = self.resolve_category(data)
+               if category_id is None:
+                    self.error(line_no, {'category': ['Unknown category.']})
+                    continue
+               valid.append((line_no, data, category_id))
+
+          existing = MenuItem.objects.in_bulk([data['id'] for _, data, _ in valid if data.get('id')])
+          overflowing = overflowing_items({
+               item.id: data['price'] for _, data, _ in valid
+               if (item := existing.get(data.get('id'))) is not None and item.price != data['price']
+          })
+          to_create = []
+          to_update = []
+          repriced = []
+          for line_no, data, category_id in valid:
+               if data.get('id'):
+                    item = existing.get(data['id'])
+                    if item is None:
+                         self.error(line_no, {'id': ['Menu item not found.']})
+                         continue
+                    if item.id in overflowing:
+                         self.error(line_no, {'price': ['The new price would exceed the cart line limit for an open cart.']})
+                         continue
+                    to_update.append(item)
+                    if item.price != data['price']:
+                         repriced.append(item.id)
+               else:
+                    item = MenuItem()
+                    to_create.append(item)
+               item.title = data['title']
+               item.price = data['price']
+               item.featured = data['featured']
+               item.category_id = category_id
+
+          with transaction.atomic():
+               MenuItem.objects.bulk_create(to_create, batch_size=self.batch_size)
+               MenuItem.objects.bulk_update(to_update, ['title', 'price', 'featured', 'category'], batch_size=self.batch_size)
+               index_menu_items([item.id for item in to_create + to_update])
+               reprice_carts(repriced)
+          self.created += len(to_create)
+          self.updated += len(to_update)
+
+     def summary(self):
+          return {
+               'created': self.created,
+               'updated': self.updated,
+               'error_count': self.error_count,
+               'errors': self.errors,
+          }
+
+def import_menu(lines, fmt, batch_size=BATCH_SIZE):
+     return MenuImport(batch_size).run(lines, fmt)
+
+class Echo:
+     # csv.writer target that hands each formatted line straight back
+     def write(self, value):
+          return value
+
+async def aiterate(chunks):
+     # Async view of a sync export generator for ASGI, which would otherwise read
+     # a sync StreamingHttpResponse into memory in one go. Each chunk is pulled on
+     # the request's thread-sensitive worker, where its database connection lives.
+     chunks = iter(chunks)
+     done = object()
+     pull = sync_to_async(next, thread_sensitive=True)
+     while (chunk := await pull(chunks, done)) is not done:
+          yield chunk
+
+def export_rows(chunk_size=2000, using=DEFAULT_DB_ALIAS):
+     rows = (
+          MenuItem.objects.using(using).order_by('id')
+          .values_list('id', 'title', 'price', 'featured', 'category_id', 'category__slug')
+          .iterator(chunk_size=chunk_size)
+     )
+     for row in rows:
+          yield dict(zip(EXPORT_FIELDS, row))
+
+def export_menu(fmt, chunk_size=2000, using=DEFAULT_DB_ALIAS):
+     # The body is read after the view returns and the routing middleware has
+     # reset, so callers pass the database to read from
+     if fmt == 'csv':
+          writer = csv.writer(Echo())
+          yield writer.writerow(EXPORT_FIELDS)
+          for row in export_rows(chunk_size, using):
+               yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+          return
+     for row in export_rows(chunk_size, using):
+          row['price'] = str(row['price'])
+          yield json.dumps(row) + '\n'
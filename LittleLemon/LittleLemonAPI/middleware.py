@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from .budgets import QUERY_BUDGETS
+
+logger = logging.getLogger(__name__)
+
+# "ViewClass.method" -> running totals, for every request this process has served
+_route_stats = {}
+_lock = threading.Lock()
+
+class QueryRecorder:
+     def __init__(self):
+          self.count = 0
+          self.duration = 0.0
+
+     def __call__(self, execute, sql, params, many, context):
+          started = time.perf_counter()
+          try:
+               return execute(sql, params, many, context)
+          finally:
+               self.duration += time.perf_counter() - started
+               self.count += 1
+
+def route_name(request):
+     match = getattr(request, 'resolver_match', None)
+     if match is None:
+          return None
+     view = getattr(match.func, 'view_class', match.func)
+     return f'{view.__name__}.{request.method.lower()}'
+
+def record_route(route, queries, sql_ms, total_ms):
+     with _lock:
+          stats = _route_stats.setdefault(route, {
+               'requests': 0, 'queries': 0, 'max_queries': 0, 'sql_ms': 0.0, 'total_ms': 0.0,
+          })
+          stats['requests'] += 1
+          stats['queries'] += queries
+          stats['max_queries'] = max(stats['max_queries'], queries)
+          stats['sql_ms'] += sql_ms
+          stats['total_ms'] += total_ms
+
+def route_stats():
+     with _lock:
+          return {route: dict(stats) for route, stats in _route_stats.items()}
+
+def reset_route_stats():
+     with _lock:
+          _route_stats.clear()
+
+def install_recorder(recorder):
+     for connection in connections.all():
+          connection.execute_wrappers.append(recorder)
+
+def remove_recorder(recorder):
+     for connection in connections.all():
+          if recorder in connection.execute_wrappers:
+               connection.execute_wrappers.remove(recorder)
+
+class QueryBudgetMiddleware:
+     sync_capable = True
+     async_capable = True
+
+     def __init__(self, get_response):
+          self.get_response = get_response
+          if iscoroutinefunction(get_response):
+               markcoroutinefunction(self)
+
+     def __call__(self, request):
+          if iscoroutinefunction(self):
+               return self.__acall__(request)
+          recorder = QueryRecorder()
+          started = time.perf_counter()
+          with ExitStack() as stack:
+               for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+               response = self.get_response(request)
+          return self.finish(request, response, recorder, started)
+
+     async def __acall__(self, request):
+          # Async ORM calls run on the request's thread-sensitive worker thread,
+          # whose connections are not this thread's, so hook them up over there.
+          recorder = QueryRecorder()
+          started = time.perf_counter()
+          await sync_to_async(install_recorder)(recorder)
+          try:
+               response = await self.get_response(request)
+          finally:
+               await sync_to_async(remove_recorder)(recorder)
+          return self.finish(request, response, recorder, started)
+
+     def finish(self, request, response, recorder, started):
+          total_ms = (time.perf_counter() - started) * 1000
+          sql_ms = recorder.duration * 1000
+
+          response['Server-Timing'] = (
+               f'db;dur={sql_ms:.2f};desc="{recorder.count} queries", total;dur={total_ms:.2f}'
+          )
+          if response.streaming:
+               # A streamed body runs its queries while it is sent: keep counting
+               # until it is exhausted and record the request then
+               if response.is_async:
+                    response.streaming_content = self.arecorded(request, response.streaming_content, recorder, started)
+               else:
+                    response.streaming_content = self.recorded(request, response.streaming_content, recorder, started)
+               return response
+          self.record(request, recorder, started)
+          return response
+
+     def recorded(self, request, content, recorder, started):
+          try:
+               install_recorder(recorder)
+               yield from content
+          finally:
+               remove_recorder(recorder)
+               self.record(request, recorder, started)
+
+     async def arecorded(self, request, content, recorder, started):
+          try:
+               await sync_to_async(install_recorder)(recorder)
+               async for chunk in content:
+                    yield chunk
+          finally:
+               await sync_to_async(remove_recorder)(recorder)
+               self.record(request, recorder, started)
+
+     def record(self, request, recorder, started):
+          route = route_name(request)
+          if route:
+               record_route(route, recorder.count, recorder.duration * 1000, (time.perf_counter() - started) * 1000)
+               budget = QUERY_BUDGETS.get(route)
+               if budget is not None and recorder.count > budget:
+                    logger.warning('%s ran %d queries, over its budget of %d', route, recorder.count, budget)
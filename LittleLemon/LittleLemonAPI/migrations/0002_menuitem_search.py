@@ -0,0 +1,37 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'LittleLemonAPI_menuitem_search'
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; other backends fall back to LIKE search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        "title, category, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    # Rank title matches well above category matches
+    schema_editor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')")
+    schema_editor.execute(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, title, category) "
+        'SELECT m.id, m.title, c.title FROM "LittleLemonAPI_menuitem" m '
+        'JOIN "LittleLemonAPI_category" c ON c.id = m.category_id'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
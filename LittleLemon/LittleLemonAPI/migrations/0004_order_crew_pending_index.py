@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0003_dailysales'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', False)), fields=['delivery_crew'], name='order_crew_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def snapshot_categories(apps, schema_editor):
+    OrderItem = apps.get_model('LittleLemonAPI', 'OrderItem')
+    MenuItem = apps.get_model('LittleLemonAPI', 'MenuItem')
+    OrderItem.objects.update(
+        category=Subquery(MenuItem.objects.filter(pk=OuterRef('menuitem_id')).values('category_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0007_idempotencykey_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='category',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='LittleLemonAPI.category'),
+        ),
+        migrations.RunPython(snapshot_categories, migrations.RunPython.noop),
+    ]
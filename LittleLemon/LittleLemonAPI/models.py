@@ -29,12 +29,68 @@ class Order(models.Model):
      total = models.DecimalField(max_digits=6, decimal_places=2)
      date = models.DateField(db_index=True)
 
+     class Meta:
+          indexes = [
+               # Undelivered orders only: crew work lists and dispatch never look at the rest
+               models.Index(fields=['delivery_crew'], condition=models.Q(status=False), name='order_crew_pending_idx'),
+          ]
+
 class OrderItem(models.Model):
      order = models.ForeignKey(Order, on_delete=models.CASCADE)
      menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+     # The item's category when ordered, so the sales rollup can take the line
+     # back out of the same bucket after the item moves category
+     category = models.ForeignKey(Category, on_delete=models.PROTECT, null=True)
      quantity = models.SmallIntegerField()
      unit_price = models.DecimalField(max_digits=6, decimal_places=2)
      price = models.DecimalField(max_digits=6, decimal_places=2)
 
      class Meta:
           unique_together = ('order', 'menuitem')
+
+class DailySales(models.Model):
+     day = models.DateField(db_index=True)
+     category = models.ForeignKey(Category, on_delete=models.CASCADE)
+     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+     orders = models.IntegerField(default=0)
+     quantity = models.IntegerField(default=0)
+     revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+     class Meta:
+          unique_together = ('day', 'category', 'menuitem')
+
+class IdempotencyKey(models.Model):
+     user = models.ForeignKey(User, on_delete=models.CASCADE)
+     key = models.CharField(max_length=255)
+     # sha256 of method, path and body, so a reused key can't replay another request's answer
+     fingerprint = models.CharField(max_length=64)
+     # Both empty while the first request is still running
+     status_code = models.PositiveSmallIntegerField(null=True)
+     body = models.TextField(blank=True)
+     created = models.DateTimeField(db_index=True)
+     # A retry may take over an unfinished claim once this has passed
+     locked_until = models.DateTimeField(null=True)
+
+     class Meta:
+          unique_together = ('user', 'key')
+
+class OutboxEvent(models.Model):
+     PENDING = 'pending'
+     DONE = 'done'
+     DEAD = 'dead'
+
+     topic = models.CharField(max_length=100)
+     payload = models.JSONField()
+     state = models.CharField(max_length=10, default=PENDING)
+     created = models.DateTimeField()
+     # Not handed to a worker before this; pushed back after each failure
+     available_at = models.DateTimeField()
+     attempts = models.PositiveSmallIntegerField(default=0)
+     locked_by = models.CharField(max_length=100, blank=True)
+     locked_until = models.DateTimeField(null=True)
+     last_error = models.TextField(blank=True)
+
+     class Meta:
+          indexes = [
+               models.Index(fields=['available_at'], condition=models.Q(state='pending'), name='outbox_pending_idx'),
+          ]
@@ -0,0 +1,57 @@
+import csv
+import json
+from .menu_io import Echo
+from .models import OrderItem
+
+ORDER_FIELDS = ['id', 'user', 'delivery_crew', 'status', 'total', 'date']
+ITEM_FIELDS = ['id', 'order', 'menuitem', 'quantity', 'unit_price', 'price']
+CSV_HEADER = ['order_id', 'user', 'delivery_crew', 'status', 'total', 'date', 'item_id', 'menuitem', 'quantity', 'unit_price', 'price']
+CHUNK_SIZE = 500
+
+def order_chunks(orders, chunk_size=CHUNK_SIZE):
+     # Keyset walk on id: each chunk is its own short query, so nothing holds a
+     # cursor open between chunks and deep ranges cost the same as shallow ones.
+     orders = orders.order_by('id').values_list('id', 'user_id', 'delivery_crew_id', 'status', 'total', 'date')
+     last_id = 0
+     while True:
+          chunk = list(orders.filter(id__gt=last_id)[:chunk_size])
+          if not chunk:
+               return
+          last_id = chunk[-1][0]
+          items = {}
+          lines = (
+               OrderItem.objects.using(orders.db).filter(order_id__in=[row[0] for row in chunk])
+               .order_by('order_id', 'id')
+               .values_list('id', 'order_id', 'menuitem_id', 'quantity', 'unit_price', 'price')
+          )
+          for line in lines:
+               items.setdefault(line[1], []).append(line)
+          yield [(row, items.get(row[0], [])) for row in chunk]
+          if len(chunk) < chunk_size:
+               return
+
+def order_json(row, lines):
+     # Same shape and value formatting as OrderSerializer
+     order = dict(zip(ORDER_FIELDS, row))
+     order['total'] = str(order['total'])
+     order['date'] = order['date'].isoformat()
+     order['orderitem_set'] = [
+          {**dict(zip(ITEM_FIELDS, line)), 'unit_price': str(line[4]), 'price': str(line[5])}
+          for line in lines
+     ]
+     return json.dumps(order) + '\n'
+
+def export_orders(orders, fmt, chunk_size=CHUNK_SIZE):
+     if fmt == 'csv':
+          writer = csv.writer(Echo())
+          yield writer.writerow(CSV_HEADER)
+          for chunk in order_chunks(orders, chunk_size):
+               # One row per order line; orders without lines still get a row
+               yield ''.join(
+                    writer.writerow([*row, *(line[:1] + line[2:])])
+                    for row, lines in chunk
+                    for line in lines or [(None,) * len(ITEM_FIELDS)]
+               )
+          return
+     for chunk in order_chunks(orders, chunk_size):
+          yield ''.join(order_json(row, lines) for row, lines in chunk)
@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models import Sum
+from django.utils.timezone import now
+from .models import Cart, Order, OrderItem
+from .reports import record_order
+from .outbox import publish
+
+def place_order(user):
+     # A fixed number of queries whatever the cart size: lock the cart, total it,
+     # insert the order, bulk insert its lines, queue its event and empty the cart.
+     with transaction.atomic():
+          cart = Cart.objects.select_for_update().filter(user=user.id)
+          lines = list(cart.values_list('menuitem_id', 'quantity', 'unit_price', 'price', 'menuitem__category_id'))
+          if not lines:
+               return None
+
+          total = cart.aggregate(total=Sum('price'))['total']
+          order = Order.objects.create(user_id=user.id, total=total, date=now().date())
+          OrderItem.objects.bulk_create(
+               OrderItem(order=order, menuitem_id=menuitem_id, quantity=quantity, unit_price=unit_price, price=price, category_id=category_id)
+               for menuitem_id, quantity, unit_price, price, category_id in lines
+          )
+          record_order(order)
+          publish('order.placed', {
+               'order': order.id,
+               'user': user.id,
+               'total': str(total),
+               'date': order.date.isoformat(),
+               'items': [{'menuitem': line[0], 'quantity': line[1]} for line in lines],
+          })
+          cart.delete()
+     return order
+
+def publish_delivered(order):
+     publish('order.delivered', {'order': order.id, 'user': order.user_id, 'delivery_crew': order.delivery_crew_id})
@@ -0,0 +1,92 @@
+import logging
+import os
+import socket
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# topic -> callable(payload, event); run by the outbox worker, never in a request
+handlers = {}
+
+def register(topic):
+     def decorator(handler):
+          handlers[topic] = handler
+          return handler
+     return decorator
+
+def publish(topic, payload):
+     # Call inside the transaction that makes the change: the event commits or
+     # rolls back with it, and the request does no more than one INSERT.
+     return OutboxEvent.objects.create(topic=topic, payload=payload, created=now(), available_at=now())
+
+def worker_name():
+     return f'{socket.gethostname()}:{os.getpid()}'
+
+def backoff(attempts):
+     base = getattr(settings, 'OUTBOX_BACKOFF_SECONDS', 5)
+     return timedelta(seconds=min(base * 2 ** (attempts - 1), getattr(settings, 'OUTBOX_BACKOFF_MAX', 3600)))
+
+def claim_batch(worker, batch_size=100, lease=60):
+     # Lease due events to this worker. skip_locked keeps workers off each
+     # other's rows where the database supports it; on SQLite the claiming
+     # transaction takes the write lock, so claims simply queue.
+     started = now()
+     with transaction.atomic():
+          due = (
+               OutboxEvent.objects.select_for_update(skip_locked=True)
+               .filter(state=OutboxEvent.PENDING, available_at__lte=started)
+               .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=started))
+               .order_by('available_at', 'id')
+               .values_list('id', flat=True)[:batch_size]
+          )
+          ids = list(due)
+          if not ids:
+               return []
+          OutboxEvent.objects.filter(id__in=ids).update(
+               locked_by=worker, locked_until=started + timedelta(seconds=lease), attempts=F('attempts') + 1,
+          )
+     return list(OutboxEvent.objects.filter(id__in=ids, locked_by=worker).order_by('available_at', 'id'))
+
+def process_batch(worker=None, batch_size=100, lease=60):
+     # Returns (delivered, failed) counts for one claimed batch
+     worker = worker or worker_name()
+     events = claim_batch(worker, batch_size, lease)
+     delivered = []
+     failed = 0
+     max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+     for event in events:
+          handler = handlers.get(event.topic)
+          try:
+               if handler is None:
+                    raise LookupError(f'No handler registered for {event.topic}')
+               handler(event.payload, event)
+          except Exception as exc:
+               failed += 1
+               dead = event.attempts >= max_attempts
+               logger.warning('Outbox event %s (%s) failed on attempt %d: %r', event.id, event.topic, event.attempts, exc)
+               OutboxEvent.objects.filter(id=event.id, locked_by=worker).update(
+                    state=OutboxEvent.DEAD if dead else OutboxEvent.PENDING,
+                    available_at=now() + backoff(event.attempts),
+                    locked_by='', locked_until=None, last_error=repr(exc),
+               )
+          else:
+               delivered.append(event.id)
+     if delivered:
+          OutboxEvent.objects.filter(id__in=delivered, locked_by=worker).update(
+               state=OutboxEvent.DONE, locked_by='', locked_until=None, last_error='',
+          )
+     return len(delivered), failed
+
+def purge_done(older_than):
+     return OutboxEvent.objects.filter(state=OutboxEvent.DONE, created__lt=now() - older_than).delete()[0]
+
+@register('order.placed')
+@register('order.delivered')
+def log_order_event(payload, event):
+     # Stand-in until kitchen tickets, receipts and analytics have handlers of their own
+     logger.info('%s %s', event.topic, payload)
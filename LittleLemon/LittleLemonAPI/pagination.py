@@ -0,0 +1,171 @@
+import base64
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+class GroupMemberPagination(CursorPagination):
+     page_size = 20
+     page_size_query_param = 'perpage'
+     max_page_size = 100
+     ordering = 'id'
+
+class KeysetPagination:
+     # Opt-in ?cursor= paging that seeks past the last row seen instead of
+     # counting and offsetting, so every page costs the same at any depth.
+     cursor_query_param = 'cursor'
+     page_size_query_param = 'perpage'
+     ordering_query_param = 'ordering'
+     max_page_size = 100
+     invalid_cursor_message = 'Invalid cursor'
+
+     def __init__(self, page_size=20, default_ordering=None):
+          self.page_size = page_size
+          # Used when the client sends no ?ordering=; may name annotations
+          self.default_ordering = default_ordering or []
+
+     def get_page_size(self, request):
+          try:
+               page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+          except (TypeError, ValueError):
+               page_size = self.page_size
+          return max(1, min(page_size, self.max_page_size))
+
+     def get_ordering(self, request, model):
+          if not request.query_params.get(self.ordering_query_param) and self.default_ordering:
+               return [*self.default_ordering, 'id']
+          ordering = []
+          for param in request.query_params.get(self.ordering_query_param, '').split(','):
+               param = param.strip()
+               name = param.lstrip('-')
+               if not name:
+                    continue
+               try:
+                    field = model._meta.get_field(name)
+               except FieldDoesNotExist:
+                    raise ValidationError({'ordering': f'Unknown field {name}.'})
+               if not field.concrete or field.many_to_many or field.null:
+                    raise ValidationError({'ordering': f'Can not order by {name}.'})
+               ordering.append(param)
+               if field.primary_key:
+                    # The primary key is unique, so nothing after it changes the order
+                    return ordering
+          ordering.append('id')
+          return ordering
+
+     def get_attname(self, model, name):
+          try:
+               return model._meta.get_field(name).attname
+          except FieldDoesNotExist:
+               return name
+
+     def cursor_columns(self, request, model):
+          # What each row has to carry for next/previous links to be built from it
+          return [self.get_attname(model, field.lstrip('-')) for field in self.get_ordering(request, model)]
+
+     def paginate_queryset(self, queryset, request):
+          return self.finish_page(list(self.page_queryset(queryset, request)))
+
+     async def apaginate_queryset(self, queryset, request):
+          return self.finish_page([row async for row in self.page_queryset(queryset, request)])
+
+     def page_queryset(self, queryset, request):
+          self.request = request
+          self.page_size = self.get_page_size(request)
+          self.ordering = self.get_ordering(request, queryset.model)
+          self.attnames = [self.get_attname(queryset.model, field.lstrip('-')) for field in self.ordering]
+          self.position, self.reverse = self.decode_cursor(request, queryset.model)
+
+          ordering = self.ordering
+          if self.reverse:
+               ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+          if self.position is not None:
+               queryset = queryset.filter(keyset_filter(ordering, self.position))
+          return queryset.order_by(*ordering)[:self.page_size + 1]
+
+     def finish_page(self, rows):
+          has_more = len(rows) > self.page_size
+          rows = rows[:self.page_size]
+          if self.reverse:
+               rows.reverse()
+               self.has_next = self.position is not None
+               self.has_previous = has_more
+          else:
+               self.has_next = has_more
+               self.has_previous = self.position is not None
+          self.page = rows
+          return rows
+
+     def decode_cursor(self, request, model):
+          encoded = request.query_params.get(self.cursor_query_param)
+          if not encoded:
+               return None, False
+          try:
+               cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+               position, reverse = cursor['p'], bool(cursor['r'])
+               if not isinstance(position, list) or len(position) != len(self.ordering):
+                    raise ValueError
+               # A cursor is client input: check every value against its column
+               # here rather than let the filter fail on it
+               position = [self.cursor_value(model, field.lstrip('-'), value) for field, value in zip(self.ordering, position)]
+          except (TypeError, ValueError, KeyError, DjangoValidationError):
+               raise NotFound(self.invalid_cursor_message)
+          return position, reverse
+
+     def cursor_value(self, model, name, value):
+          if value is None or isinstance(value, (list, dict)):
+               raise ValueError(name)
+          try:
+               field = model._meta.get_field(name)
+          except FieldDoesNotExist:
+               # An annotation such as a search rank
+               if not isinstance(value, (int, float)):
+                    raise ValueError(name)
+               return value
+          value = field.to_python(value)
+          field.run_validators(value)
+          return value
+
+     def encode_cursor(self, row, reverse):
+          if isinstance(row, dict):
+               position = [row[attname] for attname in self.attnames]
+          else:
+               position = [getattr(row, attname) for attname in self.attnames]
+          cursor = json.dumps({'p': position, 'r': int(reverse)}, default=str, separators=(',', ':'))
+          encoded = base64.urlsafe_b64encode(cursor.encode('ascii')).decode('ascii')
+          return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+     def get_next_link(self):
+          if not self.has_next or not self.page:
+               return None
+          return self.encode_cursor(self.page[-1], reverse=False)
+
+     def get_previous_link(self):
+          if not self.has_previous or not self.page:
+               return None
+          return self.encode_cursor(self.page[0], reverse=True)
+
+     def get_paginated_data(self, data):
+          return {
+               'next': self.get_next_link(),
+               'previous': self.get_previous_link(),
+               'results': data,
+          }
+
+     def get_paginated_response(self, data):
+          return Response(self.get_paginated_data(data))
+
+def keyset_filter(ordering, position):
+     # (a > x) OR (a = x AND b > y) OR ... for an ordering of (a, b, ...)
+     condition = Q()
+     for index, field in enumerate(ordering):
+          name = field.lstrip('-')
+          lookup = 'lt' if field.startswith('-') else 'gt'
+          step = Q(**{f'{name}__{lookup}': position[index]})
+          for previous, value in zip(ordering[:index], position[:index]):
+               step &= Q(**{previous.lstrip('-'): value})
+          condition |= step
+     return condition
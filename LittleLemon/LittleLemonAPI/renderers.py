@@ -0,0 +1,28 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+     import orjson
+except ImportError:
+     orjson = None
+
+# Dates, times and dataclasses go through DRF's encoder rather than orjson's own
+# formatting, which differs (e.g. "+00:00" where DRF writes "Z")
+PASSTHROUGH = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS if orjson else 0
+
+class FastJSONRenderer(JSONRenderer):
+     # Same bytes as JSONRenderer with the default compact, unicode settings,
+     # encoded by orjson when it is installed.
+     def render(self, data, accepted_media_type=None, renderer_context=None):
+          if (
+               orjson is None or data is None or self.ensure_ascii or not self.compact
+               or self.get_indent(accepted_media_type, renderer_context or {})
+          ):
+               return super().render(data, accepted_media_type, renderer_context)
+          try:
+               content = orjson.dumps(data, default=self.encoder_class().default, option=PASSTHROUGH)
+          except TypeError:
+               # Non-string keys, huge ints and whatever DRF's encoder rejects too:
+               # leave the answer (or the error) to JSONRenderer
+               return super().render(data, accepted_media_type, renderer_context)
+          # JSONRenderer escapes these so the output is also valid JavaScript
+          return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,103 @@
+from django.db import connection
+from django.db.models import Sum
+from .models import DailySales, MenuItem, Order, OrderItem
+
+# DailySales keeps one row per day x category x menu item. "orders" counts the
+# orders that included that item, so it is exact per item; summed over a day
+# or a category it counts order lines, and is reported as order_lines there.
+
+REPORT_GROUPS = {
+     'day': ['day'],
+     'category': ['category', 'category__title'],
+     'menuitem': ['menuitem', 'menuitem__title'],
+}
+
+def _tables():
+     quote = connection.ops.quote_name
+     return {
+          'sales': quote(DailySales._meta.db_table),
+          'order': quote(Order._meta.db_table),
+          'orderitem': quote(OrderItem._meta.db_table),
+          'menuitem': quote(MenuItem._meta.db_table),
+     }
+
+def apply_order_sales(where, params, sign=1):
+     # Fold the selected orders' lines into the rollup with one upsert.
+     # sign=-1 takes them back out again, e.g. before an order is deleted.
+     # Lines are bucketed by the category recorded when they were ordered;
+     # older lines without one fall back to the item's current category.
+     tables = _tables()
+     sales = tables['sales']
+     lines = (
+          f'FROM {tables["orderitem"]} oi '
+          f'JOIN {tables["order"]} o ON o.id = oi.order_id '
+          f'JOIN {tables["menuitem"]} m ON m.id = oi.menuitem_id '
+          f'WHERE {where} '
+     )
+     category = 'COALESCE(oi.category_id, m.category_id)'
+     sql = (
+          f'INSERT INTO {sales} (day, category_id, menuitem_id, orders, quantity, revenue) '
+          f'SELECT o.date, {category}, oi.menuitem_id, %s * COUNT(*), %s * SUM(oi.quantity), %s * SUM(oi.price) '
+          f'{lines}'
+          f'GROUP BY o.date, {category}, oi.menuitem_id '
+          f'ON CONFLICT (day, category_id, menuitem_id) DO UPDATE SET '
+          f'orders = {sales}.orders + excluded.orders, '
+          f'quantity = {sales}.quantity + excluded.quantity, '
+          f'revenue = {sales}.revenue + excluded.revenue'
+     )
+     with connection.cursor() as cursor:
+          cursor.execute(sql, [sign, sign, sign, *params])
+          if sign < 0:
+               # Only the buckets just touched can have dropped to zero
+               cursor.execute(
+                    f'DELETE FROM {sales} WHERE orders <= 0 AND (day, category_id, menuitem_id) IN '
+                    f'(SELECT o.date, {category}, oi.menuitem_id {lines})',
+                    params,
+               )
+
+def record_order(order, sign=1):
+     apply_order_sales('o.id = %s', [order.id], sign)
+
+def rebuild_sales(date_from=None, date_to=None, chunk_size=5000, progress=None):
+     # Rebuild the rollup (or one date range of it) from Order/OrderItem, walking
+     # orders by id so each chunk is a bounded range scan in its own statement.
+     rows = DailySales.objects.all()
+     orders = Order.objects.all()
+     if date_from:
+          rows = rows.filter(day__gte=date_from)
+          orders = orders.filter(date__gte=date_from)
+     if date_to:
+          rows = rows.filter(day__lte=date_to)
+          orders = orders.filter(date__lte=date_to)
+     rows.delete()
+
+     date_where = ''
+     date_params = []
+     if date_from:
+          date_where += ' AND o.date >= %s'
+          date_params.append(date_from)
+     if date_to:
+          date_where += ' AND o.date <= %s'
+          date_params.append(date_to)
+
+     last_id = 0
+     done = 0
+     while True:
+          ids = list(orders.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+          if not ids:
+               return done
+          apply_order_sales(f'o.id >= %s AND o.id <= %s{date_where}', [ids[0], ids[-1], *date_params])
+          last_id = ids[-1]
+          done += len(ids)
+          if progress:
+               progress(done)
+
+def sales_report(date_from, date_to, group_by='day'):
+     rows = DailySales.objects.filter(day__gte=date_from, day__lte=date_to)
+     fields = REPORT_GROUPS[group_by]
+     count = 'total_orders' if group_by == 'menuitem' else 'total_order_lines'
+     return (
+          rows.values(*fields)
+          .annotate(**{count: Sum('orders')}, total_quantity=Sum('quantity'), total_revenue=Sum('revenue'))
+          .order_by(*fields)
+     )
@@ -0,0 +1,88 @@
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth.models import Group
+
+MANAGER = "Manager"
+DELIVERY_CREW = "Delivery crew"
+
+# user id -> (expires_at, frozenset of group names), shared by every request in this process
+_roles = {}
+# group name -> Group row, resolved once per process
+_groups = {}
+_lock = threading.Lock()
+
+def _ttl():
+     return getattr(settings, "ROLE_CACHE_TTL", 60)
+
+def get_roles(user):
+     if not user or not user.is_authenticated:
+          return frozenset()
+
+     # request.user is the same object for the whole request, so keep the answer on it
+     roles = getattr(user, "_cached_roles", None)
+     if roles is not None:
+          return roles
+
+     with _lock:
+          entry = _roles.get(user.id)
+     if entry and entry[0] > time.monotonic():
+          roles = entry[1]
+     else:
+          roles = frozenset(user.groups.values_list("name", flat=True))
+          with _lock:
+               _roles[user.id] = (time.monotonic() + _ttl(), roles)
+
+     user._cached_roles = roles
+     return roles
+
+async def aget_roles(user):
+     if not user or not user.is_authenticated:
+          return frozenset()
+
+     roles = getattr(user, "_cached_roles", None)
+     if roles is not None:
+          return roles
+
+     with _lock:
+          entry = _roles.get(user.id)
+     if entry and entry[0] > time.monotonic():
+          roles = entry[1]
+     else:
+          roles = frozenset([name async for name in user.groups.values_list("name", flat=True)])
+          with _lock:
+               _roles[user.id] = (time.monotonic() + _ttl(), roles)
+
+     user._cached_roles = roles
+     return roles
+
+def invalidate_roles(user):
+     user_id = getattr(user, "id", user)
+     with _lock:
+          _roles.pop(user_id, None)
+     if hasattr(user, "_cached_roles"):
+          del user._cached_roles
+
+def clear_roles():
+     with _lock:
+          _roles.clear()
+          _groups.clear()
+
+def get_group(name):
+     with _lock:
+          group = _groups.get(name)
+     if group is None:
+          group, _ = Group.objects.get_or_create(name=name)
+          with _lock:
+               _groups[name] = group
+     return group
+
+def forget_group(name):
+     with _lock:
+          _groups.pop(name, None)
+
+def is_manager(user):
+     return MANAGER in get_roles(user)
+
+def is_delivery_crew(user):
+     return DELIVERY_CREW in get_roles(user)
@@ -0,0 +1,146 @@
+import contextvars
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Alias this request may read from; None means the primary
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+# alias -> monotonic time it may be tried again after failing to connect
+_down = {}
+_lock = threading.Lock()
+
+def _pin_seconds():
+     return getattr(settings, 'READ_YOUR_WRITES_SECONDS', 5)
+
+def _retry_seconds():
+     return getattr(settings, 'REPLICA_RETRY_SECONDS', 30)
+
+def replica_aliases():
+     now = time.monotonic()
+     with _lock:
+          return [
+               alias for alias in getattr(settings, 'DATABASE_REPLICAS', [])
+               if alias in settings.DATABASES and _down.get(alias, 0) <= now
+          ]
+
+def mark_down(alias):
+     with _lock:
+          _down[alias] = time.monotonic() + _retry_seconds()
+
+def reset_replicas():
+     with _lock:
+          _down.clear()
+
+def replica_ready(alias):
+     try:
+          connections[alias].ensure_connection()
+     except OperationalError:
+          mark_down(alias)
+          return False
+     return True
+
+def pin_key(request):
+     # Whoever sent the write: their token, else their session, else their address
+     client = (
+          request.META.get('HTTP_AUTHORIZATION')
+          or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+          or request.META.get('REMOTE_ADDR', '')
+     )
+     return 'primary-pin:' + hashlib.sha256(client.encode()).hexdigest()
+
+def user_pin_key(user_id):
+     return f'primary-pin:user:{user_id}'
+
+def choose_read_alias(request):
+     if request.method not in SAFE_METHODS:
+          return None
+     aliases = replica_aliases()
+     if not aliases or cache.get(pin_key(request)):
+          return None
+     random.shuffle(aliases)
+     for alias in aliases:
+          if replica_ready(alias):
+               return alias
+     return None
+
+def pin_user(user_id):
+     cache.set(user_pin_key(user_id), True, _pin_seconds())
+
+def pin_primary(request):
+     if request.method not in SAFE_METHODS:
+          cache.set(pin_key(request), True, _pin_seconds())
+          user = getattr(request, 'user', None)
+          if user is not None and user.is_authenticated:
+               pin_user(user.pk)
+
+def apply_user_pin(user):
+     # The client key is all there is before authentication, and it changes when
+     # a client switches token; once the user is known, honour their pin too
+     if _read_alias.get() and cache.get(user_pin_key(user.pk)):
+          _read_alias.set(None)
+
+async def aapply_user_pin(user):
+     if _read_alias.get() and await cache.aget(user_pin_key(user.pk)):
+          _read_alias.set(None)
+
+def reading_replica():
+     return _read_alias.get() is not None
+
+@contextmanager
+def primary_reads():
+     token = _read_alias.set(None)
+     try:
+          yield
+     finally:
+          _read_alias.reset(token)
+
+class ReplicaRouter:
+     def db_for_read(self, model, **hints):
+          return _read_alias.get() or DEFAULT_DB_ALIAS
+
+     def db_for_write(self, model, **hints):
+          # Anything read after a write in the same request must see it
+          _read_alias.set(None)
+          return DEFAULT_DB_ALIAS
+
+     def allow_relation(self, obj1, obj2, **hints):
+          return True
+
+class ReplicaRoutingMiddleware:
+     sync_capable = True
+     async_capable = True
+
+     def __init__(self, get_response):
+          self.get_response = get_response
+          if iscoroutinefunction(get_response):
+               markcoroutinefunction(self)
+
+     def __call__(self, request):
+          if iscoroutinefunction(self):
+               return self.__acall__(request)
+          token = _read_alias.set(choose_read_alias(request))
+          try:
+               response = self.get_response(request)
+          finally:
+               _read_alias.reset(token)
+          pin_primary(request)
+          return response
+
+     async def __acall__(self, request):
+          # Connecting has to happen on the thread the async ORM calls will use
+          token = _read_alias.set(await sync_to_async(choose_read_alias)(request))
+          try:
+               response = await self.get_response(request)
+          finally:
+               _read_alias.reset(token)
+          pin_primary(request)
+          return response
@@ -0,0 +1,65 @@
+import re
+from django.db import connection
+from django.db.models import Q, Value
+from django.db.models.expressions import RawSQL
+from .models import MenuItem
+
+SEARCH_TABLE = 'LittleLemonAPI_menuitem_search'
+SEARCH_TERM = re.compile(r'\w+')
+
+def search_index_available():
+     return connection.vendor == 'sqlite'
+
+def match_expression(search):
+     # Every word must match as a prefix; quoting keeps FTS5 operators out of user input
+     terms = SEARCH_TERM.findall(search)
+     return ' '.join(f'"{term}"*' for term in terms)
+
+def search_menu_items(items, search):
+     if not search_index_available():
+          return items.filter(Q(title__icontains=search) | Q(category__title__icontains=search))
+
+     match = match_expression(search)
+     if not match:
+          return items.annotate(search_rank=Value(0.0)).none()
+     item_table = connection.ops.quote_name(MenuItem._meta.db_table)
+     return items.filter(
+          id__in=RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [match])
+     ).annotate(
+          search_rank=RawSQL(
+               f'SELECT rank FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND rowid = {item_table}.id',
+               [match],
+          )
+     )
+
+def index_menu_items(ids=None):
+     # Rewrite the index rows for the given menu items, or for the whole catalog
+     if not search_index_available():
+          return
+     item_table = connection.ops.quote_name(MenuItem._meta.db_table)
+     category_table = connection.ops.quote_name(MenuItem._meta.get_field('category').related_model._meta.db_table)
+     select = (
+          f'SELECT m.id, m.title, c.title FROM {item_table} m '
+          f'JOIN {category_table} c ON c.id = m.category_id'
+     )
+     with connection.cursor() as cursor:
+          if ids is None:
+               cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+               cursor.execute(f'INSERT INTO {SEARCH_TABLE} (rowid, title, category) {select}')
+               return
+          ids = list(ids)
+          for start in range(0, len(ids), 500):
+               chunk = ids[start:start + 500]
+               placeholders = ', '.join(['%s'] * len(chunk))
+               cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', chunk)
+               cursor.execute(f'INSERT INTO {SEARCH_TABLE} (rowid, title, category) {select} WHERE m.id IN ({placeholders})', chunk)
+
+def unindex_menu_items(ids):
+     if not search_index_available():
+          return
+     ids = list(ids)
+     with connection.cursor() as cursor:
+          for start in range(0, len(ids), 500):
+               chunk = ids[start:start + 500]
+               placeholders = ', '.join(['%s'] * len(chunk))
+               cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', chunk)
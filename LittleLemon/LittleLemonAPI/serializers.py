@@ -32,3 +32,15 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Order
         fields = fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'date', 'orderitem_set']
+
+class SalesReportSerializer(serializers.Serializer):
+    day = serializers.DateField(required=False)
+    category = serializers.IntegerField(required=False)
+    category_title = serializers.CharField(source='category__title', required=False)
+    menuitem = serializers.IntegerField(required=False)
+    menuitem_title = serializers.CharField(source='menuitem__title', required=False)
+    # Per menu item only; summed over days or categories it counts lines
+    orders = serializers.IntegerField(source='total_orders', required=False)
+    order_lines = serializers.IntegerField(source='total_order_lines', required=False)
+    quantity = serializers.IntegerField(source='total_quantity')
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2, source='total_revenue')
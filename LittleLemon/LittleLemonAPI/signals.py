@@ -0,0 +1,49 @@
+from django.contrib.auth.models import Group, User
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import invalidate_user, token_cache
+from .models import Category, MenuItem
+from .roles import forget_group
+from .routers import pin_user
+from .search import index_menu_items, unindex_menu_items
+
+@receiver(user_logged_out)
+def evict_logged_out_user(sender, user, **kwargs):
+     if user is not None:
+          invalidate_user(user.pk)
+
+@receiver(post_save, sender=Token)
+def pin_new_token_user(sender, instance, created, **kwargs):
+     # The token's first requests must not authenticate against a lagging replica
+     if created:
+          pin_user(instance.user_id)
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+     token_cache.evict_key(instance.key)
+     invalidate_user(instance.user_id)
+
+@receiver(post_save, sender=User)
+def evict_changed_user(sender, instance, **kwargs):
+     # Covers deactivation as well as any other change to the cached user row
+     invalidate_user(instance.pk)
+
+@receiver(post_save, sender=MenuItem)
+def index_saved_menu_item(sender, instance, **kwargs):
+     index_menu_items([instance.pk])
+
+@receiver(post_delete, sender=MenuItem)
+def unindex_deleted_menu_item(sender, instance, **kwargs):
+     unindex_menu_items([instance.pk])
+
+@receiver(post_save, sender=Category)
+def reindex_category_items(sender, instance, created, **kwargs):
+     if not created:
+          index_menu_items(MenuItem.objects.filter(category=instance).values_list('id', flat=True))
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def forget_changed_group(sender, instance, **kwargs):
+     forget_group(instance.name)
@@ -1,3 +1,1325 @@
-from django.test import TestCase
+import base64
+import datetime
+import json
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.models import Count, FilteredRelation, Q, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from django.contrib.auth.models import User, Group
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
+from . import fastpath, idempotency, order_export, outbox, roles, routers, search, views
+from .budgets import QUERY_BUDGETS
+from .management.commands.seed import seed_database
+from .middleware import reset_route_stats, route_stats
+from .authentication import _version_key, token_cache
+from .models import Cart, Category, DailySales, IdempotencyKey, MenuItem, Order, OrderItem, OutboxEvent
+from .renderers import FastJSONRenderer
+from .serializers import CategorySerializer, MenuItemSerializer, OrderSerializer
+from .throttling import LocalBucketStore, reset_throttles, throttle_stats
 
 # Create your tests here.
+class RoleCacheTest(TestCase):
+     def setUp(self):
+          roles.clear_roles()
+          self.manager_group = Group.objects.create(name="Manager")
+          self.crew_group = Group.objects.create(name="Delivery crew")
+          self.admin = User.objects.create_superuser("admin", password="admin")
+          self.customer = User.objects.create_user("Tom", password="API@2026")
+
+     def test_roles_loaded_once_per_request(self):
+          with self.assertNumQueries(1):
+               self.assertFalse(roles.is_manager(self.customer))
+               self.assertFalse(roles.is_delivery_crew(self.customer))
+
+     def test_warm_cache_runs_no_role_queries(self):
+          roles.get_roles(User.objects.get(pk=self.customer.pk))
+          user = User.objects.get(pk=self.customer.pk)
+          with self.assertNumQueries(0):
+               self.assertFalse(roles.is_manager(user))
+               self.assertFalse(roles.is_delivery_crew(user))
+
+     def test_group_views_invalidate_cache(self):
+          self.assertFalse(roles.is_manager(User.objects.get(pk=self.customer.pk)))
+          client = APIClient()
+          client.force_authenticate(self.admin)
+          response = client.post('/api/groups/manager/users', {'id': self.customer.id}, format='json')
+          self.assertEqual(response.status_code, 201)
+          self.assertTrue(roles.is_manager(User.objects.get(pk=self.customer.pk)))
+          response = client.delete(f'/api/groups/manager/users/{self.customer.id}')
+          self.assertEqual(response.status_code, 200)
+          self.assertFalse(roles.is_manager(User.objects.get(pk=self.customer.pk)))
+
+class GroupMemberListTest(TestCase):
+     def setUp(self):
+          roles.clear_roles()
+          manager_group = Group.objects.create(name="Manager")
+          self.admin = User.objects.create_superuser("admin", password="admin")
+          for i in range(5):
+               manager_group.user_set.add(User.objects.create(username=f"manager{i}"))
+          User.objects.bulk_create(User(username=f"customer{i}") for i in range(20))
+          self.client = APIClient()
+          self.client.force_authenticate(self.admin)
+
+     def test_members_listed_in_one_query(self):
+          with self.assertNumQueries(1):
+               response = self.client.get('/api/groups/manager/users', {'perpage': 2})
+          self.assertEqual([u['username'] for u in response.data['results']], ['manager0', 'manager1'])
+          response = self.client.get(response.data['next'])
+          self.assertEqual([u['username'] for u in response.data['results']], ['manager2', 'manager3'])
+
+     def test_search_on_username(self):
+          response = self.client.get('/api/groups/manager/users', {'search': 'ager4'})
+          self.assertEqual([u['username'] for u in response.data['results']], ['manager4'])
+
+class BulkGroupMembershipTest(TestCase):
+     def setUp(self):
+          roles.clear_roles()
+          self.manager = User.objects.create(username="Ann")
+          self.manager.groups.add(Group.objects.create(name="Manager"))
+          self.crew_group = Group.objects.create(name="Delivery crew")
+          self.users = User.objects.bulk_create(User(username=f"rider{i}") for i in range(30))
+          self.client = APIClient()
+          self.client.force_authenticate(self.manager)
+
+     def post(self, data):
+          return self.client.post('/api/groups/delivery-crew/users/bulk', data, format='json')
+
+     def test_add_in_constant_queries(self):
+          self.users[0].groups.add(self.crew_group)
+          data = {'ids': [user.id for user in self.users[:20]] + [99999], 'usernames': ['rider25', 'ghost']}
+          # Warm role and group caches: what is left is one lookup and one INSERT
+          roles.is_manager(self.manager)
+          roles.get_group(roles.DELIVERY_CREW)
+          with self.assertNumQueries(2):
+               response = self.post(data)
+          self.assertEqual(response.status_code, 201)
+          self.assertEqual(response.data['missing'], {'ids': [99999], 'usernames': ['ghost']})
+          self.assertEqual(self.crew_group.user_set.count(), 21)
+
+     def test_remove_and_roles_invalidated(self):
+          rider = self.users[0]
+          self.post({'ids': [rider.id, self.users[1].id]})
+          self.assertTrue(roles.is_delivery_crew(rider))
+          response = self.client.delete('/api/groups/delivery-crew/users/bulk', {'usernames': [rider.username]}, format='json')
+          self.assertEqual((response.status_code, response.data['users']), (200, [rider.id]))
+          self.assertFalse(roles.is_delivery_crew(User.objects.get(pk=rider.pk)))
+          self.assertEqual(list(self.crew_group.user_set.all()), [self.users[1]])
+
+     def test_rejects_bad_requests(self):
+          self.assertEqual(self.post({}).status_code, 400)
+          self.assertEqual(self.post({'ids': ['x']}).status_code, 400)
+          self.assertEqual(self.post({'ids': [99999]}).status_code, 404)
+          self.client.force_authenticate(self.users[0])
+          self.assertEqual(self.post({'ids': [self.users[1].id]}).status_code, 403)
+          self.assertEqual(self.client.post('/api/groups/manager/users/bulk', {'ids': [self.users[1].id]}, format='json').status_code, 403)
+
+     def test_group_resolved_once(self):
+          with self.assertNumQueries(1):
+               roles.get_group(roles.DELIVERY_CREW)
+          with self.assertNumQueries(0):
+               self.assertEqual(roles.get_group(roles.DELIVERY_CREW), self.crew_group)
+          self.crew_group.delete()
+          self.assertNotEqual(roles.get_group(roles.DELIVERY_CREW).pk, self.crew_group.pk)
+
+class CatalogCacheTest(TestCase):
+     def setUp(self):
+          cache.clear()
+          self.admin = User.objects.create_superuser("admin", password="admin")
+          self.category = Category.objects.create(slug="mains", title="Mains")
+          MenuItem.objects.create(title="Pasta", price=10, featured=False, category=self.category)
+          self.client = APIClient()
+          self.client.force_authenticate(self.admin)
+
+     def test_repeat_browse_served_from_cache(self):
+          first = self.client.get('/api/menu-items', {'perpage': 10})
+          with self.assertNumQueries(0):
+               second = self.client.get('/api/menu-items', {'perpage': 10})
+          self.assertEqual(first.data, second.data)
+
+     def test_unchanged_catalog_not_modified(self):
+          etag = self.client.get('/api/categories')['ETag']
+          response = self.client.get('/api/categories', HTTP_IF_NONE_MATCH=etag)
+          self.assertEqual(response.status_code, 304)
+
+     def test_write_bumps_version(self):
+          etag = self.client.get('/api/menu-items')['ETag']
+          self.client.post('/api/menu-items', {'title': 'Soup', 'price': 5, 'featured': False, 'category': self.category.id}, format='json')
+          response = self.client.get('/api/menu-items', {'perpage': 10}, HTTP_IF_NONE_MATCH=etag)
+          self.assertEqual(response.status_code, 200)
+          self.assertEqual([item['title'] for item in response.data], ['Pasta', 'Soup'])
+
+class KeysetPaginationTest(TestCase):
+     def setUp(self):
+          cache.clear()
+          self.admin = User.objects.create_superuser("admin", password="admin")
+          category = Category.objects.create(slug="mains", title="Mains")
+          MenuItem.objects.bulk_create(
+               MenuItem(title=f"Item {i}", price=[5, 10, 5, 10, 7][i % 5], featured=False, category=category)
+               for i in range(12)
+          )
+          self.client = APIClient()
+          self.client.force_authenticate(self.admin)
+
+     def walk(self, url, params):
+          ids = []
+          response = self.client.get(url, params)
+          while True:
+               ids += [item['id'] for item in response.data['results']]
+               if not response.data['next']:
+                    return ids, response
+               response = self.client.get(response.data['next'])
+
+     def test_cursor_walk_matches_ordering(self):
+          ids, last = self.walk('/api/menu-items', {'cursor': '', 'perpage': 5, 'ordering': '-price'})
+          expected = list(MenuItem.objects.order_by('-price', 'id').values_list('id', flat=True))
+          self.assertEqual(ids, expected)
+          previous = self.client.get(last.data['previous'])
+          self.assertEqual([item['id'] for item in previous.data['results']], expected[5:10])
+
+     def test_deep_page_is_a_single_query(self):
+          first = self.client.get('/api/menu-items', {'cursor': '', 'perpage': 5})
+          cache.clear()
+          with self.assertNumQueries(1):
+               self.client.get(first.data['next'])
+
+     def test_invalid_cursor(self):
+          response = self.client.get('/api/menu-items', {'cursor': 'nonsense'})
+          self.assertEqual(response.status_code, 404)
+
+     def test_cursor_values_must_match_columns(self):
+          def cursor(position):
+               return base64.urlsafe_b64encode(json.dumps({'p': position, 'r': 0}).encode()).decode()
+          for ordering, position in (('', ['abc']), ('', [None]), ('', [[1]]), ('price', ['cheap', 1]), ('price', ['1.5', 'x'])):
+               response = self.client.get('/api/menu-items', {'cursor': cursor(position), 'ordering': ordering})
+               self.assertEqual(response.status_code, 404, position)
+          response = self.client.get('/api/menu-items', {'cursor': cursor(['1.5', '2']), 'ordering': 'price'})
+          self.assertEqual(response.status_code, 200)
+
+class OrderListTest(TestCase):
+     def setUp(self):
+          roles.clear_roles()
+          self.manager = User.objects.create_user("Benson", password="API@2026")
+          Group.objects.create(name="Manager").user_set.add(self.manager)
+          Group.objects.create(name="Delivery crew")
+          self.customer = User.objects.create_user("Tom", password="API@2026")
+          category = Category.objects.create(slug="mains", title="Mains")
+          items = MenuItem.objects.bulk_create(
+               MenuItem(title=f"Item {i}", price=5, featured=False, category=category) for i in range(3)
+          )
+          for day in range(1, 31):
+               order = Order.objects.create(user=self.customer, total=15, date=datetime.date(2026, 9, day), status=day % 2 == 0)
+               OrderItem.objects.bulk_create(
+                    OrderItem(order=order, menuitem=item, quantity=1, unit_price=5, price=5) for item in items
+               )
+          self.client = APIClient()
+          self.client.force_authenticate(self.manager)
+
+     def test_page_is_bounded_query_count(self):
+          with self.assertNumQueries(3):
+               response = self.client.get('/api/orders')
+          self.assertEqual(len(response.data['results']), 20)
+          self.assertEqual(len(response.data['results'][0]['orderitem_set']), 3)
+          self.assertIsNotNone(response.data['next'])
+
+     def test_filters(self):
+          response = self.client.get('/api/orders', {'status': '1', 'date_from': '2026-09-10', 'date_to': '2026-09-19'})
+          self.assertEqual([order['date'] for order in response.data['results']], [f'2026-09-{day}' for day in range(10, 20, 2)])
+          response = self.client.get('/api/orders', {'date_from': 'yesterday'})
+          self.assertEqual(response.status_code, 400)
+
+     def test_export_matches_order_serializer(self):
+          response = self.client.get('/api/orders/export.ndjson', {'date_from': '2026-09-05', 'date_to': '2026-09-24'})
+          self.assertEqual(response.status_code, 200)
+          exported = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+          orders = Order.objects.filter(date__range=('2026-09-05', '2026-09-24')).order_by('id').prefetch_related('orderitem_set')
+          self.assertEqual(exported, json.loads(json.dumps(OrderSerializer(orders, many=True).data)))
+
+     def test_export_reads_two_queries_per_chunk(self):
+          chunks = order_export.order_chunks(Order.objects.all(), chunk_size=7)
+          with self.assertNumQueries(10):
+               rows = [row for chunk in chunks for row in chunk]
+          self.assertEqual(len(rows), 30)
+          response = self.client.get('/api/orders/export.csv', {'date_to': '2026-09-02'})
+          self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 1 + 2 * 3)
+          self.assertEqual(self.client.get('/api/orders/export.csv', {'date_to': 'soon'}).status_code, 400)
+
+def fill_cart(user, count):
+     category = Category.objects.create(slug="mains", title="Mains")
+     items = MenuItem.objects.bulk_create(
+          MenuItem(title=f"Item {i}", price=i + 1, featured=False, category=category) for i in range(count)
+     )
+     Cart.objects.bulk_create(
+          Cart(user=user, menuitem=item, quantity=2, unit_price=item.price, price=item.price * 2) for item in items
+     )
+
+class PlaceOrderTest(TestCase):
+     def setUp(self):
+          reset_throttles()
+          roles.clear_roles()
+          self.customer = User.objects.create(username="Tom")
+          self.client = APIClient()
+          self.client.force_authenticate(self.customer)
+
+     def checkout_queries(self):
+          with CaptureQueriesContext(connection) as queries:
+               response = self.client.post('/api/orders')
+          self.assertEqual(response.status_code, 201)
+          return len(queries)
+
+     def test_query_count_independent_of_cart_size(self):
+          fill_cart(self.customer, 2)
+          small = self.checkout_queries()
+          Cart.objects.bulk_create(
+               Cart(user=self.customer, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+               for item in MenuItem.objects.bulk_create(
+                    MenuItem(title=f"Extra {i}", price=3, featured=False, category=Category.objects.get()) for i in range(50)
+               )
+          )
+          self.assertEqual(self.checkout_queries(), small)
+
+     def test_order_total_and_lines(self):
+          fill_cart(self.customer, 3)
+          self.client.post('/api/orders')
+          order = Order.objects.get()
+          self.assertEqual(order.total, 12)
+          self.assertEqual(order.orderitem_set.count(), 3)
+          self.assertFalse(Cart.objects.exists())
+
+class OutboxTest(TestCase):
+     def setUp(self):
+          reset_throttles()
+          roles.clear_roles()
+          self.customer = User.objects.create(username="Tom")
+          self.crew = User.objects.create(username="Bob")
+          self.crew.groups.add(Group.objects.create(name="Delivery crew"))
+          self.client = APIClient()
+          self.client.force_authenticate(self.customer)
+
+     def test_checkout_publishes_with_order(self):
+          self.assertEqual(self.client.post('/api/orders').status_code, 400)
+          self.assertFalse(OutboxEvent.objects.exists())
+          fill_cart(self.customer, 2)
+          self.client.post('/api/orders')
+          event = OutboxEvent.objects.get()
+          self.assertEqual((event.topic, event.state), ('order.placed', OutboxEvent.PENDING))
+          self.assertEqual(event.payload['order'], Order.objects.get().id)
+          self.assertEqual(len(event.payload['items']), 2)
+
+     def test_failed_checkout_rolls_back_event(self):
+          fill_cart(self.customer, 1)
+          with mock.patch('LittleLemonAPI.orders.record_order', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+               self.client.post('/api/orders')
+          self.assertFalse(OutboxEvent.objects.exists())
+
+     def test_delivery_publishes_event(self):
+          order = Order.objects.create(user=self.customer, delivery_crew=self.crew, total=4, date=datetime.date.today())
+          self.client.force_authenticate(self.crew)
+          self.client.patch(f'/api/orders/{order.id}')
+          self.client.patch(f'/api/orders/{order.id}')
+          self.assertEqual(list(OutboxEvent.objects.values_list('topic', 'payload')), [
+               ('order.delivered', {'order': order.id, 'user': self.customer.id, 'delivery_crew': self.crew.id}),
+          ])
+
+     def test_worker_delivers_in_batches(self):
+          for i in range(5):
+               outbox.publish('test.event', {'n': i})
+          seen = []
+          with mock.patch.dict(outbox.handlers, {'test.event': lambda payload, event: seen.append(payload['n'])}):
+               with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(outbox.process_batch('w1', batch_size=3), (3, 0))
+               self.assertEqual(outbox.process_batch('w1', batch_size=3), (2, 0))
+               self.assertEqual(outbox.process_batch('w1'), (0, 0))
+          self.assertEqual(seen, [0, 1, 2, 3, 4])
+          self.assertLessEqual(len(queries), 6)
+          self.assertEqual(OutboxEvent.objects.filter(state=OutboxEvent.DONE).count(), 5)
+
+     def test_claimed_events_are_leased(self):
+          outbox.publish('test.event', {})
+          self.assertEqual(len(outbox.claim_batch('w1')), 1)
+          self.assertEqual(outbox.claim_batch('w2'), [])
+          OutboxEvent.objects.update(locked_until=now() - datetime.timedelta(seconds=1))
+          self.assertEqual(len(outbox.claim_batch('w2')), 1)
+
+     @override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_BACKOFF_SECONDS=10)
+     def test_failures_back_off_then_die(self):
+          event = outbox.publish('test.event', {})
+          with mock.patch.dict(outbox.handlers, {'test.event': mock.Mock(side_effect=ValueError('boom'))}):
+               self.assertEqual(outbox.process_batch('w1'), (0, 1))
+               event.refresh_from_db()
+               self.assertEqual((event.state, event.attempts, event.last_error), (OutboxEvent.PENDING, 1, "ValueError('boom')"))
+               self.assertGreater(event.available_at, now() + datetime.timedelta(seconds=9))
+               self.assertEqual(outbox.process_batch('w1'), (0, 0))
+               OutboxEvent.objects.update(available_at=now())
+               self.assertEqual(outbox.process_batch('w1'), (0, 1))
+          event.refresh_from_db()
+          self.assertEqual((event.state, event.attempts), (OutboxEvent.DEAD, 2))
+
+     def test_worker_command_drains_once(self):
+          fill_cart(self.customer, 1)
+          self.client.post('/api/orders')
+          out = StringIO()
+          call_command('run_outbox', '--once', stdout=out)
+          self.assertIn('delivered 1 events, 0 failures', out.getvalue())
+          self.assertEqual(OutboxEvent.objects.get().state, OutboxEvent.DONE)
+
+@override_settings(THROTTLE_BUCKETS={})
+class ConcurrentCheckoutTest(TransactionTestCase):
+     def test_concurrent_checkouts_place_one_order(self):
+          roles.clear_roles()
+          customer = User.objects.create(username="Tom")
+          fill_cart(customer, 20)
+          barrier = threading.Barrier(8)
+          codes = []
+
+          def checkout():
+               client = APIClient()
+               client.force_authenticate(User.objects.get(pk=customer.pk))
+               try:
+                    barrier.wait()
+                    codes.append(client.post('/api/orders').status_code)
+               finally:
+                    connection.close()
+
+          threads = [threading.Thread(target=checkout) for _ in range(8)]
+          for thread in threads:
+               thread.start()
+          for thread in threads:
+               thread.join()
+
+          self.assertEqual(sorted(codes), [201] + [400] * 7)
+          order = Order.objects.get()
+          self.assertEqual(order.orderitem_set.count(), 20)
+          self.assertEqual(order.total, sum(2 * (i + 1) for i in range(20)))
+          self.assertFalse(Cart.objects.exists())
+
+class IdempotencyTest(TestCase):
+     def setUp(self):
+          reset_throttles()
+          roles.clear_roles()
+          self.customer = User.objects.create(username="Tom")
+          fill_cart(self.customer, 3)
+          self.client = APIClient()
+          self.client.force_authenticate(self.customer)
+
+     def test_retried_checkout_is_replayed(self):
+          first = self.client.post('/api/orders', headers={'Idempotency-Key': 'checkout-1'})
+          self.assertEqual(first.status_code, 201)
+          with CaptureQueriesContext(connection) as captured:
+               retry = self.client.post('/api/orders', headers={'Idempotency-Key': 'checkout-1'})
+          self.assertEqual((retry.status_code, retry.data, retry['Idempotent-Replayed']), (201, first.data, 'true'))
+          self.assertFalse([query for query in captured if 'cart' in query['sql'] or '_order' in query['sql']])
+          self.assertEqual(Order.objects.count(), 1)
+          # Without a key the retry runs again and finds the cart empty
+          self.assertEqual(self.client.post('/api/orders').status_code, 400)
+
+     def test_key_is_scoped_to_request(self):
+          item = MenuItem.objects.first()
+          headers = {'Idempotency-Key': 'cart-1'}
+          self.assertEqual(self.client.post('/api/carts/menu-items', {'id': item.id}, format='json', headers=headers).status_code, 201)
+          response = self.client.post('/api/carts/menu-items', {'id': item.id, 'quantity': 5}, format='json', headers=headers)
+          self.assertEqual(response.status_code, 422)
+          other = User.objects.create(username="Ann")
+          self.client.force_authenticate(other)
+          response = self.client.post('/api/carts/menu-items', {'id': item.id}, format='json', headers=headers)
+          self.assertEqual((response.status_code, response.has_header('Idempotent-Replayed')), (201, False))
+
+     def test_failed_request_releases_key(self):
+          headers = {'Idempotency-Key': 'cart-2'}
+          self.assertEqual(self.client.post('/api/carts/menu-items', {}, format='json', headers=headers).status_code, 400)
+          self.assertFalse(IdempotencyKey.objects.exists())
+
+     @override_settings(IDEMPOTENCY_KEY_TTL=0)
+     def test_expired_key_runs_again(self):
+          self.client.post('/api/orders', headers={'Idempotency-Key': 'checkout-2'})
+          response = self.client.post('/api/orders', headers={'Idempotency-Key': 'checkout-2'})
+          self.assertEqual((response.status_code, response.has_header('Idempotent-Replayed')), (400, False))
+
+     def test_expired_keys_are_purged(self):
+          self.client.post('/api/orders', headers={'Idempotency-Key': 'checkout-3'})
+          self.client.post('/api/orders', headers={'Idempotency-Key': 'checkout-4'})
+          IdempotencyKey.objects.filter(key='checkout-3').update(created=now() - datetime.timedelta(days=2))
+          out = StringIO()
+          call_command('purge_idempotency_keys', stdout=out)
+          self.assertIn('Purged 1 expired', out.getvalue())
+          self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['checkout-4'])
+
+     @override_settings(IDEMPOTENCY_WAIT=0)
+     def test_abandoned_claim_is_taken_over(self):
+          # A worker that died mid-request leaves its claim unfinished
+          def abandoned(locked_until):
+               IdempotencyKey.objects.all().delete()
+               IdempotencyKey.objects.create(
+                    user=self.customer, key='checkout-3', fingerprint=idempotency.fingerprint(request), created=now(), locked_until=locked_until,
+               )
+          request = APIRequestFactory().post('/api/orders')
+          abandoned(now() + datetime.timedelta(seconds=60))
+          self.assertEqual(self.client.post('/api/orders', headers={'Idempotency-Key': 'checkout-3'}).status_code, 409)
+          abandoned(now() - datetime.timedelta(seconds=1))
+          with CaptureQueriesContext(connection) as queries:
+               response = self.client.post('/api/orders', headers={'Idempotency-Key': 'checkout-3'})
+          self.assertEqual(response.status_code, 201)
+          # Taking over is the costliest checkout; the budget also covers a token lookup
+          self.assertLessEqual(len(queries) + 1, QUERY_BUDGETS['OrderView.post'])
+          self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+          replay = self.client.post('/api/orders', headers={'Idempotency-Key': 'checkout-3'})
+          self.assertEqual((replay.status_code, replay['Idempotent-Replayed']), (201, 'true'))
+
+     def test_lost_claim_does_not_overwrite(self):
+          record, _ = idempotency.claim(self.customer, 'k', 'f')
+          IdempotencyKey.objects.update(locked_until=now() - datetime.timedelta(seconds=1))
+          retry, created = idempotency.claim(self.customer, 'k', 'f')
+          self.assertTrue(created)
+          self.assertEqual(IdempotencyKey.objects.filter(pk=record.pk, locked_until=record.locked_until).update(status_code=500), 0)
+
+class ConcurrentIdempotencyTest(TransactionTestCase):
+     def test_concurrent_duplicates_wait_for_first(self):
+          reset_throttles()
+          roles.clear_roles()
+          customer = User.objects.create(username="Tom")
+          fill_cart(customer, 5)
+          barrier = threading.Barrier(4)
+          responses = []
+
+          def checkout():
+               client = APIClient()
+               client.force_authenticate(User.objects.get(pk=customer.pk))
+               try:
+                    barrier.wait()
+                    response = client.post('/api/orders', headers={'Idempotency-Key': 'same'})
+                    responses.append((response.status_code, response.data))
+               finally:
+                    connection.close()
+
+          threads = [threading.Thread(target=checkout) for _ in range(4)]
+          for thread in threads:
+               thread.start()
+          for thread in threads:
+               thread.join()
+
+          self.assertEqual(responses, [(201, 'Order created successfully')] * 4)
+          self.assertEqual(Order.objects.count(), 1)
+
+class CartUpsertTest(TestCase):
+     def setUp(self):
+          reset_throttles()
+          self.customer = User.objects.create(username="Tom")
+          category = Category.objects.create(slug="mains", title="Mains")
+          self.items = MenuItem.objects.bulk_create(
+               MenuItem(title=f"Item {i}", price=i + 1, featured=False, category=category) for i in range(20)
+          )
+          self.client = APIClient()
+          self.client.force_authenticate(self.customer)
+
+     def test_basket_added_in_constant_queries(self):
+          basket = [{'id': item.id, 'quantity': 2} for item in self.items]
+          # Menu lookup and the upsert, plus the savepoint around it
+          with self.assertNumQueries(4):
+               response = self.client.post('/api/carts/menu-items', basket, format='json')
+          self.assertEqual(response.status_code, 201)
+          self.assertEqual(Cart.objects.filter(user=self.customer).count(), 20)
+
+     def test_repeat_add_raises_quantity(self):
+          item = self.items[4]
+          self.client.post('/api/carts/menu-items', {'id': item.id, 'quantity': 1}, format='json')
+          response = self.client.post('/api/carts/menu-items', {'id': item.id, 'quantity': 2}, format='json')
+          self.assertEqual(response.status_code, 201)
+          line = Cart.objects.get(user=self.customer, menuitem=item)
+          self.assertEqual((line.quantity, line.unit_price, line.price), (3, 5, 15))
+
+     def test_line_price_overflow_rejected(self):
+          dear = MenuItem.objects.create(title="Lobster", price=99, featured=False, category=self.items[0].category)
+          response = self.client.post('/api/carts/menu-items', {'id': dear.id, 'quantity': 200}, format='json')
+          self.assertEqual(response.status_code, 400)
+          self.assertFalse(Cart.objects.exists())
+
+     def test_merge_overflow_rolls_back_basket(self):
+          dear = MenuItem.objects.create(title="Lobster", price=99, featured=False, category=self.items[0].category)
+          self.client.post('/api/carts/menu-items', {'id': dear.id, 'quantity': 60}, format='json')
+          basket = [{'id': self.items[0].id}, {'id': dear.id, 'quantity': 60}]
+          self.assertEqual(self.client.post('/api/carts/menu-items', basket, format='json').status_code, 400)
+          self.assertEqual(list(Cart.objects.values_list('menuitem_id', 'quantity')), [(dear.id, 60)])
+          self.assertEqual(self.client.get('/api/carts/menu-items').status_code, 200)
+          self.assertEqual(self.client.post('/api/orders').status_code, 201)
+
+     def test_missing_items_reported(self):
+          response = self.client.post('/api/carts/menu-items', [{'id': self.items[0].id}, {'id': 999}], format='json')
+          self.assertEqual(response.status_code, 404)
+          self.assertEqual(response.data['missing'], [999])
+          self.assertFalse(Cart.objects.exists())
+
+class CartRepriceTest(TestCase):
+     def setUp(self):
+          reset_throttles()
+          roles.clear_roles()
+          cache.clear()
+          self.manager = User.objects.create(username="Ann")
+          self.manager.groups.add(Group.objects.create(name="Manager"))
+          self.customers = [User.objects.create(username=f"Customer {i}") for i in range(3)]
+          category = Category.objects.create(slug="mains", title="Mains")
+          self.item, self.other = MenuItem.objects.bulk_create(
+               MenuItem(title=title, price=price, featured=False, category=category) for title, price in (("Soup", 4), ("Bread", 2))
+          )
+          for quantity, customer in enumerate(self.customers, 1):
+               Cart.objects.create(user=customer, menuitem=self.item, quantity=quantity, unit_price=4, price=4 * quantity)
+               Cart.objects.create(user=customer, menuitem=self.other, quantity=1, unit_price=2, price=2)
+          self.client = APIClient()
+          self.client.force_authenticate(self.manager)
+
+     def lines(self, item):
+          return list(Cart.objects.filter(menuitem=item).order_by('quantity').values_list('quantity', 'unit_price', 'price'))
+
+     def test_price_change_reprices_carts_in_one_update(self):
+          with CaptureQueriesContext(connection) as queries:
+               response = self.client.patch(f'/api/menu-items/{self.item.id}', {'price': '5.50'}, format='json')
+          self.assertEqual(response.status_code, 200)
+          self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "LittleLemonAPI_cart"')]), 1)
+          self.assertEqual(self.lines(self.item), [(1, Decimal('5.5'), Decimal('5.5')), (2, Decimal('5.5'), 11), (3, Decimal('5.5'), Decimal('16.5'))])
+          self.assertEqual(self.lines(self.other), [(1, 2, 2)] * 3)
+
+     def test_unchanged_price_skips_carts(self):
+          with CaptureQueriesContext(connection) as queries:
+               self.client.patch(f'/api/menu-items/{self.item.id}', {'title': 'Broth'}, format='json')
+          self.assertFalse([query for query in queries if 'LittleLemonAPI_cart' in query['sql']])
+
+     def test_import_reprices_carts(self):
+          self.client.force_authenticate(User.objects.create_superuser("admin", password="admin"))
+          body = f'id,title,price,featured,category,category_slug\n{self.other.id},Bread,3,false,,mains\n'
+          response = self.client.post('/api/menu-items/import.csv', body, content_type='text/csv')
+          self.assertEqual(response.data['updated'], 1)
+          self.assertEqual(self.lines(self.other), [(1, 3, 3)] * 3)
+
+     def test_price_change_past_line_limit_is_rejected(self):
+          Cart.objects.filter(user=self.customers[2], menuitem=self.item).update(quantity=900, unit_price=10, price=9000)
+          MenuItem.objects.filter(pk=self.item.pk).update(price=10)
+          response = self.client.patch(f'/api/menu-items/{self.item.id}', {'price': '50.00'}, format='json')
+          self.assertEqual(response.status_code, 400)
+          self.assertEqual(MenuItem.objects.get(pk=self.item.pk).price, 10)
+          self.assertEqual(self.lines(self.item)[-1], (900, 10, 9000))
+          self.client.force_authenticate(User.objects.create_superuser("admin", password="admin"))
+          body = f'id,title,price,featured,category,category_slug\n{self.item.id},Soup,50,false,,mains\n{self.other.id},Bread,3,false,,mains\n'
+          response = self.client.post('/api/menu-items/import.csv', body, content_type='text/csv')
+          self.assertEqual((response.data['updated'], response.data['errors'][0]['line']), (1, 2))
+          self.assertEqual(MenuItem.objects.get(pk=self.item.pk).price, 10)
+          self.client.force_authenticate(self.customers[2])
+          self.assertEqual(self.client.get('/api/carts/menu-items').status_code, 200)
+
+     def test_cart_subtotal_in_one_query(self):
+          self.client.force_authenticate(self.customers[2])
+          with self.assertNumQueries(1):
+               response = self.client.get('/api/carts/menu-items')
+          self.assertEqual(response['Cart-Subtotal'], '14.00')
+          self.assertEqual(len(response.data), 2)
+          self.client.force_authenticate(User.objects.create(username="Empty"))
+          response = self.client.get('/api/carts/menu-items')
+          self.assertEqual((response.data, response['Cart-Subtotal']), ([], '0.00'))
+
+     def test_price_change_stays_within_budget(self):
+          reset_route_stats()
+          self.client.patch(f'/api/menu-items/{self.item.id}', {'price': '6.00'}, format='json')
+          self.assertLessEqual(route_stats()['SingleMenuItemView.patch']['max_queries'], QUERY_BUDGETS['SingleMenuItemView.patch'])
+
+class CachedTokenAuthenticationTest(TestCase):
+     def setUp(self):
+          token_cache.clear()
+          self.customer = User.objects.create(username="Tom")
+          self.token = Token.objects.create(user=self.customer)
+          self.client = APIClient()
+          self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+     def test_warm_token_skips_lookup(self):
+          with self.assertNumQueries(2):
+               self.client.get('/api/carts/menu-items')
+          with self.assertNumQueries(1):
+               response = self.client.get('/api/carts/menu-items')
+          self.assertEqual(response.status_code, 200)
+          self.assertEqual(token_cache.stats()['hits'], 1)
+          self.assertEqual(token_cache.stats()['misses'], 1)
+
+     def test_logout_evicts_token(self):
+          self.client.get('/api/carts/menu-items')
+          self.assertEqual(self.client.post('/auth/token/logout/').status_code, 204)
+          self.assertEqual(self.client.get('/api/carts/menu-items').status_code, 401)
+
+     def test_deactivation_evicts_user(self):
+          self.client.get('/api/carts/menu-items')
+          self.customer.is_active = False
+          self.customer.save()
+          self.assertEqual(self.client.get('/api/carts/menu-items').status_code, 401)
+
+     def test_stats_are_exposed_to_superusers(self):
+          self.client.get('/api/carts/menu-items')
+          self.assertEqual(self.client.get('/api/stats').status_code, 403)
+          self.customer.is_superuser = True
+          self.customer.save()
+          response = self.client.get('/api/stats')
+          self.assertEqual(response.status_code, 200)
+          self.assertEqual((response.data['token_cache']['hits'], response.data['token_cache']['misses']), (1, 2))
+          self.assertIn('CartMenuItemView.get', response.data['routes'])
+          self.assertEqual(set(response.data), {'worker', 'token_cache', 'routes', 'throttles'})
+
+     def test_other_worker_invalidation_evicts_user(self):
+          self.client.get('/api/carts/menu-items')
+          # Another worker deactivated the user: only the shared version changed here
+          User.objects.filter(pk=self.customer.pk).update(is_active=False)
+          cache.set(_version_key(self.customer.pk), 0, None)
+          self.assertEqual(self.client.get('/api/carts/menu-items').status_code, 401)
+
+class MenuSearchTest(TestCase):
+     def setUp(self):
+          cache.clear()
+          self.admin = User.objects.create_superuser("admin", password="admin")
+          mains = Category.objects.create(slug="mains", title="Mains")
+          self.desserts = Category.objects.create(slug="desserts", title="Desserts")
+          for title, category in [("Pasta Carbonara", mains), ("Pastry Plate", self.desserts), ("Lemon Cake", self.desserts), ("Pesto Pasta", mains)]:
+               MenuItem.objects.create(title=title, price=10, featured=False, category=category)
+          self.client = APIClient()
+          self.client.force_authenticate(self.admin)
+
+     def titles(self, response):
+          results = response.data['results'] if 'results' in response.data else response.data
+          return [item['title'] for item in results]
+
+     def test_prefix_match(self):
+          response = self.client.get('/api/menu-items', {'search': 'past', 'perpage': 10})
+          self.assertEqual(sorted(self.titles(response)), ["Pasta Carbonara", "Pastry Plate", "Pesto Pasta"])
+
+     def test_title_ranks_above_category(self):
+          response = self.client.get('/api/menu-items', {'search': 'dessert', 'perpage': 10})
+          self.assertEqual(sorted(self.titles(response)), ["Lemon Cake", "Pastry Plate"])
+          MenuItem.objects.create(title="Dessert Wine", price=8, featured=False, category=Category.objects.get(slug="mains"))
+          cache.clear()
+          response = self.client.get('/api/menu-items', {'search': 'dessert', 'perpage': 10})
+          self.assertEqual(self.titles(response)[0], "Dessert Wine")
+
+     def test_index_follows_writes(self):
+          item = MenuItem.objects.get(title="Lemon Cake")
+          item.title = "Lime Cake"
+          item.save()
+          self.desserts.title = "Sweets"
+          self.desserts.save()
+          self.assertEqual(self.titles(self.client.get('/api/menu-items', {'search': 'lemon'})), [])
+          cache.clear()
+          self.assertEqual(sorted(self.titles(self.client.get('/api/menu-items', {'search': 'sweet', 'perpage': 10}))), ["Lime Cake", "Pastry Plate"])
+          item.delete()
+          cache.clear()
+          self.assertEqual(self.titles(self.client.get('/api/menu-items', {'search': 'lime'})), [])
+
+     def test_cursor_contract(self):
+          response = self.client.get('/api/menu-items', {'search': 'pas', 'cursor': '', 'perpage': 2})
+          titles = self.titles(response)
+          titles += self.titles(self.client.get(response.data['next']))
+          self.assertEqual(sorted(titles), ["Pasta Carbonara", "Pastry Plate", "Pesto Pasta"])
+
+     def test_operators_in_input_are_literal(self):
+          response = self.client.get('/api/menu-items', {'search': 'pasta OR "cake', 'perpage': 10})
+          self.assertEqual(response.status_code, 200)
+
+class SeedCommandTest(TestCase):
+     def test_seed_counts(self):
+          call_command('seed', users=40, categories=3, items=30, carts=10, orders=25, lines=2, stdout=StringIO())
+          self.assertEqual(User.objects.filter(username__startswith='seed-').count(), 41)
+          self.assertEqual(User.objects.filter(groups__name='Delivery crew').count(), 2)
+          self.assertEqual(MenuItem.objects.count(), 30)
+          self.assertEqual(Cart.objects.count(), 20)
+          self.assertEqual(Order.objects.count(), 25)
+          self.assertEqual(OrderItem.objects.count(), 50)
+          self.assertEqual(DailySales.objects.aggregate(lines=Sum('orders'))['lines'], 50)
+          self.assertEqual(MenuItem.objects.filter(id__in=search.search_menu_items(MenuItem.objects.all(), 'item')).count(), 30)
+
+class MenuImportExportTest(TestCase):
+     @classmethod
+     def setUpTestData(cls):
+          cls.admin = User.objects.create_superuser("admin", password="admin")
+          cls.mains = Category.objects.create(slug="mains", title="Mains")
+          cls.drinks = Category.objects.create(slug="drinks", title="Drinks")
+          cls.pasta = MenuItem.objects.create(title="Pasta", price=10, featured=False, category=cls.mains)
+
+     def setUp(self):
+          self.client = APIClient()
+          self.client.force_authenticate(self.admin)
+
+     def post_import(self, fmt, body):
+          content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+          return self.client.post(f'/api/menu-items/import.{fmt}', body, content_type=content_type)
+
+     def test_csv_import_creates_updates_and_reports_errors(self):
+          body = (
+               'id,title,price,featured,category,category_slug\n'
+               f'{self.pasta.id},Fresh Pasta,12.00,true,,mains\n'
+               ',Lemonade,3.50,false,,drinks\n'
+               ',Soup,abc,false,,mains\n'
+               ',Pie,4.00,false,,desserts\n'
+               '999999,Ghost,1.00,false,,mains\n'
+          )
+          response = self.post_import('csv', body)
+          self.assertEqual(response.status_code, 200)
+          self.assertEqual((response.data['created'], response.data['updated'], response.data['error_count']), (1, 1, 3))
+          self.assertEqual([error['line'] for error in response.data['errors']], [4, 5, 6])
+          self.pasta.refresh_from_db()
+          self.assertEqual((self.pasta.title, str(self.pasta.price), self.pasta.featured), ("Fresh Pasta", "12.00", True))
+          self.assertEqual(MenuItem.objects.get(title="Lemonade").category, self.drinks)
+          self.assertFalse(MenuItem.objects.filter(title__in=["Soup", "Pie", "Ghost"]).exists())
+          self.assertEqual(list(search.search_menu_items(MenuItem.objects.all(), 'lemon').values_list('title', flat=True)), ["Lemonade"])
+
+     def test_import_runs_constant_queries(self):
+          def body(count):
+               return ''.join(json.dumps({'title': f'Dish {n}', 'price': '5.00', 'category': self.mains.id}) + '\n' for n in range(count))
+          with CaptureQueriesContext(connection) as small:
+               self.post_import('ndjson', body(5))
+          with CaptureQueriesContext(connection) as large:
+               self.post_import('ndjson', body(200))
+          self.assertEqual(len(small), len(large))
+          self.assertEqual(MenuItem.objects.count(), 206)
+
+     def test_export_round_trips(self):
+          for fmt in ('csv', 'ndjson'):
+               with self.subTest(fmt):
+                    response = self.client.get(f'/api/menu-items/export.{fmt}')
+                    self.assertEqual(response.status_code, 200)
+                    body = b''.join(response.streaming_content).decode()
+                    response = self.post_import(fmt, body)
+                    self.assertEqual((response.data['created'], response.data['updated'], response.data['error_count']), (0, 1, 0))
+
+     async def test_export_streams_under_asgi(self):
+          token = await sync_to_async(Token.objects.create)(user=self.admin)
+          token_cache.clear()
+          response = await self.async_client.get('/api/menu-items/export.ndjson', headers={'Authorization': f'Token {token.key}'})
+          self.assertTrue(response.is_async)
+          chunks = [chunk async for chunk in response.streaming_content]
+          self.assertEqual(json.loads(b''.join(chunks))['title'], 'Pasta')
+
+     def test_commands_round_trip(self):
+          out = StringIO()
+          call_command('export_menu', '-', '--format', 'ndjson', stdout=out)
+          row = json.loads(out.getvalue())
+          self.assertEqual(row, {'id': self.pasta.id, 'title': 'Pasta', 'price': '10.00', 'featured': False, 'category': self.mains.id, 'category_slug': 'mains'})
+
+     def test_import_requires_superuser(self):
+          self.client.force_authenticate(User.objects.create_user("Tom"))
+          self.assertEqual(self.post_import('csv', 'title,price\nSoup,1\n').status_code, 403)
+          self.assertEqual(self.client.get('/api/menu-items/export.csv').status_code, 403)
+
+class DispatchTest(TestCase):
+     @classmethod
+     def setUpTestData(cls):
+          cls.manager = User.objects.create_user("Benson")
+          Group.objects.create(name="Manager").user_set.add(cls.manager)
+          crew_group = Group.objects.create(name="Delivery crew")
+          cls.crew = [User.objects.create_user(name) for name in ("Ann", "Bob", "Cid")]
+          crew_group.user_set.add(*cls.crew)
+          cls.customer = User.objects.create_user("Tom")
+          cls.orders = Order.objects.bulk_create(
+               Order(user=cls.customer, total=10, date=datetime.date(2026, 9, 1)) for _ in range(7)
+          )
+          # Ann already carries two undelivered orders and one delivered one
+          Order.objects.filter(id__in=[cls.orders[0].id, cls.orders[1].id]).update(delivery_crew=cls.crew[0])
+          Order.objects.create(user=cls.customer, total=10, date=datetime.date(2026, 9, 1), delivery_crew=cls.crew[2], status=True)
+
+     def setUp(self):
+          roles.clear_roles()
+          self.client = APIClient()
+          self.client.force_authenticate(self.manager)
+
+     def test_bulk_dispatch_is_one_update(self):
+          delivered = Order.objects.create(user=self.customer, total=10, date=datetime.date(2026, 9, 1), status=True)
+          ids = [order.id for order in self.orders[2:]] + [delivered.id]
+          self.client.get('/api/orders/export.csv')  # warm the manager's roles
+          with self.assertNumQueries(2):
+               response = self.client.post('/api/orders/dispatch', {'orders': ids, 'delivery_crew': self.crew[1].id}, format='json')
+          self.assertEqual(response.data, {'assigned': 5, 'skipped': 1})
+          self.assertEqual(Order.objects.filter(delivery_crew=self.crew[1]).count(), 5)
+          self.assertIsNone(Order.objects.get(pk=delivered.id).delivery_crew)
+          response = self.client.post('/api/orders/dispatch', {'orders': ids, 'delivery_crew': self.customer.id}, format='json')
+          self.assertEqual(response.status_code, 404)
+
+     def test_auto_dispatch_fills_least_loaded_crew(self):
+          ann, bob, cid = (member.id for member in self.crew)
+          pending = [order.id for order in self.orders[2:]]
+          response = self.client.post('/api/orders/dispatch', {'auto': True}, format='json')
+          self.assertEqual(response.data['assigned'], 5)
+          self.assertEqual(
+               {row['delivery_crew']: row['orders'] for row in response.data['dispatch']},
+               {bob: [pending[0], pending[2]], cid: [pending[1], pending[3]], ann: [pending[4]]},
+          )
+          self.assertFalse(Order.objects.filter(delivery_crew__isnull=True).exists())
+
+     def test_auto_false_does_not_dispatch(self):
+          response = self.client.post('/api/orders/dispatch', {'auto': 'false'})
+          self.assertEqual(response.status_code, 400)
+          self.assertEqual(Order.objects.filter(delivery_crew__isnull=True).count(), 5)
+          self.assertEqual(self.client.post('/api/orders/dispatch', {'auto': 'yes'}).status_code, 400)
+          self.assertEqual(self.client.post('/api/orders/dispatch', {'auto': '1'}).data['assigned'], 5)
+
+     def test_dispatch_requires_manager(self):
+          self.client.force_authenticate(self.crew[0])
+          self.assertEqual(self.client.post('/api/orders/dispatch', {'auto': True}, format='json').status_code, 403)
+
+class QueryPlanTest(TestCase):
+     # Each view's main query must be an index SEARCH: no full scan of the
+     # table it reads and no temp b-tree to sort or page it.
+     @classmethod
+     def setUpTestData(cls):
+          cls.user = User.objects.create_user("Tom")
+
+     def assertPlan(self, queryset, table, index):
+          plan = queryset.explain()
+          self.assertIn(f'SEARCH LittleLemonAPI_{table} USING ', plan)
+          self.assertIn(index, plan)
+          self.assertNotIn(f'SCAN LittleLemonAPI_{table}', plan)
+          self.assertNotIn('TEMP B-TREE', plan)
+
+     def test_connection_pragmas(self):
+          with connection.cursor() as cursor:
+               cursor.execute('PRAGMA journal_mode')
+               self.assertEqual(cursor.fetchone()[0], 'wal')
+               cursor.execute('PRAGMA synchronous')
+               self.assertEqual(cursor.fetchone()[0], 1)
+               cursor.execute('PRAGMA busy_timeout')
+               self.assertEqual(cursor.fetchone()[0], 5000)
+
+     def test_order_lists(self):
+          page = lambda orders: orders.order_by('id')[:21]
+          customer = views.orders_visible_to(self.user, frozenset())
+          self.assertPlan(page(customer), 'order', '(user_id=?)')
+          self.assertPlan(page(customer.filter(status=True)), 'order', '(user_id=?)')
+          crew = views.orders_visible_to(self.user, frozenset([roles.DELIVERY_CREW]))
+          self.assertPlan(page(crew.filter(status=False)), 'order', 'order_crew_pending_idx (delivery_crew_id=?)')
+
+     def test_dispatch(self):
+          pending = Order.objects.filter(status=False, delivery_crew__isnull=True)
+          self.assertPlan(pending.order_by('id')[:21], 'order', 'order_crew_pending_idx (delivery_crew_id=?)')
+          loads = User.objects.filter(id=self.user.id).annotate(
+               pending=FilteredRelation('delivery_crew', condition=Q(delivery_crew__status=False)),
+               load=Count('pending'),
+          )
+          self.assertIn('order_crew_pending_idx', loads.explain())
+
+     def test_order_lines(self):
+          lines = OrderItem.objects.filter(order_id__in=[1, 2, 3]).order_by('order_id', 'id')
+          self.assertPlan(lines, 'orderitem', 'order_id')
+
+     def test_cart(self):
+          self.assertPlan(Cart.objects.filter(user=self.user.id), 'cart', '(user_id=?)')
+
+     def test_menu_items_by_category(self):
+          items = views.filter_menu_items({'category': 'Mains'}).order_by('price', 'id')[:21]
+          self.assertIn('SEARCH LittleLemonAPI_category USING INDEX', items.explain())
+          self.assertIn('SEARCH LittleLemonAPI_menuitem USING INDEX', items.explain())
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TestCase):
+     # The replica is a second SQLite file that nothing copies into, so where a
+     # read was served from shows in what it returns.
+     databases = {'default', 'replica'}
+
+     @classmethod
+     def setUpTestData(cls):
+          cls.admin = User.objects.create_superuser("admin", password="admin")
+          Category.objects.create(slug="mains", title="Mains")
+          Category.objects.using('replica').create(slug="drinks", title="Drinks")
+
+     def setUp(self):
+          cache.clear()
+          routers.reset_replicas()
+          self.client = APIClient()
+          self.client.force_authenticate(self.admin)
+
+     def titles(self):
+          return [category['title'] for category in self.client.get('/api/categories').data]
+
+     def test_reads_go_to_replica(self):
+          self.assertEqual(self.titles(), ["Drinks"])
+          self.assertEqual(Category.objects.get().title, "Mains")
+
+     def test_writer_reads_own_writes(self):
+          self.client.post('/api/categories', {'slug': 'sides', 'title': 'Sides'}, format='json')
+          self.assertEqual(self.titles(), ["Mains", "Sides"])
+          cache.clear()
+          other = APIClient(REMOTE_ADDR='10.0.0.2')
+          other.force_authenticate(self.admin)
+          self.assertEqual([category['title'] for category in other.get('/api/categories').data], ["Drinks"])
+
+     def test_new_token_reads_primary(self):
+          User.objects.create_user("tom", password="pass1234")
+          client = APIClient(REMOTE_ADDR='10.0.0.3')
+          response = client.post('/auth/token/login/', {'username': 'tom', 'password': 'pass1234'}, format='json')
+          client.credentials(HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}')
+          response = client.get('/api/categories')
+          self.assertEqual(response.status_code, 200)
+          self.assertEqual([category['title'] for category in response.data], ["Mains"])
+
+     def test_catalog_not_cached_from_lagging_replica(self):
+          self.client.post('/api/categories', {'slug': 'sides', 'title': 'Sides'}, format='json')
+          other = APIClient(REMOTE_ADDR='10.0.0.2')
+          other.force_authenticate(self.admin)
+          self.assertEqual([category['title'] for category in other.get('/api/categories').data], ["Mains", "Sides"])
+
+     def test_streamed_export_reads_replica(self):
+          # The body is read after the routing middleware has reset
+          User.objects.using('replica').create(id=self.admin.id, username="admin")
+          group = Group.objects.using('replica').create(name="Manager")
+          User.groups.through.objects.using('replica').create(user_id=self.admin.id, group_id=group.id)
+          Order.objects.using('replica').create(user_id=self.admin.id, total=5, date=datetime.date(2026, 9, 1))
+          roles.clear_roles()
+          response = self.client.get('/api/orders/export.ndjson')
+          lines = b''.join(response.streaming_content).splitlines()
+          self.assertEqual([json.loads(line)['date'] for line in lines], ['2026-09-01'])
+          self.assertFalse(Order.objects.exists())
+
+     def test_falls_back_to_primary(self):
+          with override_settings(DATABASE_REPLICAS=['nowhere']):
+               self.assertEqual(self.titles(), ["Mains"])
+          cache.clear()
+          with mock.patch.object(connections['replica'], 'ensure_connection', side_effect=OperationalError):
+               self.assertEqual(self.titles(), ["Mains"])
+          self.assertEqual(routers.replica_aliases(), [])
+
+class FastPathTest(TestCase):
+     @classmethod
+     def setUpTestData(cls):
+          seed_database(users=20, categories=3, items=40, carts=0, orders=30, lines=3)
+          category = Category.objects.create(slug="odd", title="Caf\u00e9 \u2028 \"quoted\"")
+          MenuItem.objects.create(title="\u00bd price \u2029", price="0.50", featured=True, category=category)
+
+     def assertSameOutput(self, serializer_class, queryset):
+          plan = fastpath.plan_for(serializer_class)
+          expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+          self.assertEqual(FastJSONRenderer().render(plan.data(list(plan.values(queryset)))), expected)
+
+     def test_plan_cache_keyed_on_field_set(self):
+          plan = fastpath.plan_for(MenuItemSerializer, {'fields': 'id,title'})
+          size = len(fastpath._plans)
+          for fields in ('title,id', 'id,id,title', ' title , id ,id'):
+               self.assertIs(fastpath.plan_for(MenuItemSerializer, {'fields': fields}), plan)
+          with self.assertRaises(ValidationError):
+               fastpath.plan_for(MenuItemSerializer, {'fields': 'id,bogus'})
+          self.assertEqual(len(fastpath._plans), size)
+
+     def test_matches_serializers(self):
+          self.assertSameOutput(CategorySerializer, Category.objects.order_by('id'))
+          self.assertSameOutput(MenuItemSerializer, MenuItem.objects.order_by('-price', 'id'))
+          Order.objects.filter(id__in=Order.objects.order_by('id').values('id')[:5]).update(delivery_crew=User.objects.first())
+          self.assertSameOutput(OrderSerializer, Order.objects.order_by('id').prefetch_related('orderitem_set'))
+
+     def test_list_endpoints_match_serializers(self):
+          client = APIClient()
+          client.force_authenticate(User.objects.get(username='seed-admin'))
+          items = MenuItem.objects.order_by('price', 'id')[:10]
+          response = client.get('/api/menu-items', {'perpage': 10, 'ordering': 'price'})
+          self.assertEqual(response.content, JSONRenderer().render(MenuItemSerializer(items, many=True).data))
+          response = client.get('/api/menu-items', {'perpage': 10, 'ordering': 'price', 'cursor': ''})
+          self.assertEqual(response.data['results'], MenuItemSerializer(items, many=True).data)
+          next_page = client.get(response.data['next'])
+          self.assertEqual(next_page.data['results'], MenuItemSerializer(MenuItem.objects.order_by('price', 'id')[10:20], many=True).data)
+          Group.objects.get(name='Manager').user_set.add(User.objects.get(username='seed-admin'))
+          roles.clear_roles()
+          orders = Order.objects.order_by('id').prefetch_related('orderitem_set')[:views.ORDER_PAGE_SIZE]
+          self.assertEqual(client.get('/api/orders').data['results'], OrderSerializer(orders, many=True).data)
+
+     def test_sparse_fields_trim_the_select(self):
+          client = APIClient()
+          client.force_authenticate(User.objects.get(username='seed-admin'))
+          with CaptureQueriesContext(connection) as captured:
+               response = client.get('/api/menu-items', {'perpage': 5, 'ordering': 'price', 'fields': 'id,title', 'cursor': ''})
+          self.assertEqual(list(response.data['results'][0]), ['id', 'title'])
+          self.assertNotIn('featured', captured[-1]['sql'])
+          following = client.get(response.data['next'])
+          expected = MenuItem.objects.order_by('price', 'id').values('id', 'title')[5:10]
+          self.assertEqual(following.data['results'], list(expected))
+          self.assertEqual(client.get('/api/menu-items', {'fields': 'id,secret'}).status_code, 400)
+          self.assertEqual(client.get('/api/menu-items', {'expand': 'featured'}).status_code, 400)
+
+     def test_expand_joins_related_rows(self):
+          client = APIClient()
+          client.force_authenticate(User.objects.get(username='seed-admin'))
+          # The page count and one joined select, whatever the page size
+          with self.assertNumQueries(2):
+               response = client.get('/api/menu-items', {'perpage': 50, 'expand': 'category'})
+          self.assertEqual(len(response.data), 41)
+          for row in response.data:
+               category = Category.objects.get(pk=row['category']['id'])
+               self.assertEqual(row['category'], CategorySerializer(category).data)
+
+          Group.objects.get(name='Manager').user_set.add(User.objects.get(username='seed-admin'))
+          roles.clear_roles()
+          with self.assertNumQueries(3):
+               response = client.get('/api/orders', {'expand': 'orderitem_set.menuitem', 'fields': 'id,orderitem_set'})
+          line = response.data['results'][0]['orderitem_set'][0]
+          self.assertEqual(line['menuitem'], MenuItemSerializer(MenuItem.objects.get(pk=line['menuitem']['id'])).data)
+          self.assertEqual(set(response.data['results'][0]), {'id', 'orderitem_set'})
+
+     def test_renderer_matches_json_renderer(self):
+          data = {
+               'price': Decimal('1.50'), 'day': datetime.date(2026, 9, 1), 'at': datetime.time(12, 30, 5, 123456),
+               'placed': datetime.datetime(2026, 9, 1, 12, 30, 5, 123456, tzinfo=datetime.timezone.utc),
+               'naive': datetime.datetime(2026, 9, 1, 12, 30), 'title': 'Crème brûlée\u2028', 'items': [1, 2.5, None, True],
+          }
+          expected = JSONRenderer().render(data)
+          with mock.patch.object(JSONRenderer, 'render', side_effect=AssertionError('fell back to JSONRenderer')):
+               self.assertEqual(FastJSONRenderer().render(data), expected)
+
+     def test_renderer_falls_back_for_other_keys(self):
+          data = {1: 'one'}
+          self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+@override_settings(THROTTLE_BUCKETS={
+     'browse': {'user': (3, 1), 'ip': (100, 100)},
+     'checkout': {'user': (2, 0.5), 'ip': (4, 0.25)},
+})
+class ThrottleTest(TestCase):
+     @classmethod
+     def setUpTestData(cls):
+          cls.customers = [User.objects.create(username=name) for name in ("Tom", "Ann")]
+          cls.token = Token.objects.create(user=cls.customers[0])
+
+     def setUp(self):
+          reset_throttles()
+          self.client = APIClient()
+          self.client.force_authenticate(self.customers[0])
+
+     def test_checkout_bucket_per_user_then_per_ip(self):
+          responses = [self.client.post('/api/orders') for _ in range(3)]
+          self.assertEqual([response.status_code for response in responses], [400, 400, 429])
+          self.assertEqual(responses[-1]['Retry-After'], '2')
+          other = APIClient()
+          other.force_authenticate(self.customers[1])
+          # Ann has tokens of her own, but the shared address runs out
+          self.assertEqual(other.post('/api/orders').status_code, 400)
+          self.assertEqual(other.post('/api/orders').status_code, 429)
+          self.assertEqual(throttle_stats(), {'checkout': {'user': 1, 'ip': 1}})
+
+     def test_writes_without_scope_are_not_throttled(self):
+          codes = {self.client.delete('/api/orders/999').status_code for _ in range(5)}
+          self.assertEqual(codes, {404})
+
+     def test_async_reads_are_throttled(self):
+          async def browse():
+               headers = {'Authorization': f'Token {self.token.key}'}
+               return [await self.async_client.get('/api/categories', headers=headers) for _ in range(4)]
+          responses = async_to_sync(browse)()
+          self.assertEqual([response.status_code for response in responses], [200, 200, 200, 429])
+          self.assertEqual(responses[-1]['Retry-After'], '1')
+
+     @override_settings(THROTTLE_STORE='LittleLemonAPI.throttling.CacheBucketStore')
+     def test_shared_cache_store(self):
+          reset_throttles()
+          codes = [self.client.post('/api/orders').status_code for _ in range(3)]
+          self.assertEqual(codes, [400, 400, 429])
+          self.assertTrue(any(key.startswith(':1:throttle:') for key in cache._cache))
+          cache.set('unrelated', 1)
+          reset_throttles()
+          self.assertEqual(cache.get('unrelated'), 1)
+          self.assertEqual(self.client.post('/api/orders').status_code, 400)
+
+     def test_local_store_drops_idlest_bucket(self):
+          store = LocalBucketStore(max_keys=2)
+          for key in ('a', 'b', 'a', 'c'):
+               store.take(key, 1, 0.001)
+          self.assertEqual(list(store.buckets), ['a', 'c'])
+          self.assertTrue(store.take('a', 1, 0.001))
+
+class QueryBudgetTest(TestCase):
+     # (budget key, role, method, path, data[, headers]); write scenarios run after
+     # the reads. Where a view has several paths, the costliest one is here too.
+     scenarios = [
+          ('CategoryView.get', 'customer', 'get', lambda t: '/api/categories', None),
+          ('CategoryView.post', 'admin', 'post', lambda t: '/api/categories', lambda t: {'slug': 'specials', 'title': 'Specials'}),
+          ('MenuItemView.get', 'customer', 'get', lambda t: '/api/menu-items?perpage=20&page=3', None),
+          ('MenuItemView.get', 'customer', 'get', lambda t: '/api/menu-items?perpage=20&search=item&expand=category&cursor=', None),
+          ('MenuItemView.post', 'admin', 'post', lambda t: '/api/menu-items', lambda t: {'title': 'Soup', 'price': 5, 'featured': False, 'category': t.item.category_id}),
+          ('MenuExportView.get', 'manager', 'get', lambda t: '/api/menu-items/export.csv', None),
+          ('MenuImportView.post', 'admin', 'post', lambda t: '/api/menu-items/import.ndjson', lambda t: {'title': 'Bread', 'price': '2.50', 'category': t.item.category_id}),
+          ('MenuImportView.post', 'admin', 'post', lambda t: '/api/menu-items/import.ndjson', lambda t: {'id': t.item.id, 'title': t.item.title, 'price': '9.25', 'category': t.item.category_id}),
+          ('SingleMenuItemView.get', 'manager', 'get', lambda t: f'/api/menu-items/{t.item.id}', None),
+          ('SingleMenuItemView.put', 'manager', 'put', lambda t: f'/api/menu-items/{t.item.id}', lambda t: {'title': 'Stew', 'price': 7, 'featured': True, 'category': t.item.category_id}),
+          ('SingleMenuItemView.patch', 'manager', 'patch', lambda t: f'/api/menu-items/{t.item.id}', lambda t: {'featured': False}),
+          ('SingleMenuItemView.patch', 'manager', 'patch', lambda t: f'/api/menu-items/{t.item.id}', lambda t: {'price': '8.50'}),
+          ('ManagerGroupView.get', 'admin', 'get', lambda t: '/api/groups/manager/users', None),
+          ('ManagerGroupView.post', 'admin', 'post', lambda t: '/api/groups/manager/users', lambda t: {'id': t.customer.id}),
+          ('SingleManagerGroupView.delete', 'admin', 'delete', lambda t: f'/api/groups/manager/users/{t.customer.id}', None),
+          ('DeliveryCrewGroupView.get', 'manager', 'get', lambda t: '/api/groups/delivery-crew/users', None),
+          ('DeliveryCrewGroupView.post', 'manager', 'post', lambda t: '/api/groups/delivery-crew/users', lambda t: {'id': t.customer.id}),
+          ('SingleDeliveryCrewGroupView.delete', 'manager', 'delete', lambda t: f'/api/groups/delivery-crew/users/{t.customer.id}', None),
+          ('BulkManagerGroupView.post', 'admin', 'post', lambda t: '/api/groups/manager/users/bulk', lambda t: {'ids': [t.customer.id, t.crew.id], 'usernames': ['nobody']}),
+          ('BulkManagerGroupView.delete', 'admin', 'delete', lambda t: '/api/groups/manager/users/bulk', lambda t: {'ids': [t.customer.id, t.crew.id]}),
+          ('BulkDeliveryCrewGroupView.post', 'manager', 'post', lambda t: '/api/groups/delivery-crew/users/bulk', lambda t: {'ids': [t.customer.id], 'usernames': [t.admin.username]}),
+          ('BulkDeliveryCrewGroupView.delete', 'manager', 'delete', lambda t: '/api/groups/delivery-crew/users/bulk', lambda t: {'ids': [t.customer.id], 'usernames': [t.admin.username]}),
+          ('CartMenuItemView.get', 'customer', 'get', lambda t: '/api/carts/menu-items', None),
+          ('CartMenuItemView.post', 'customer', 'post', lambda t: '/api/carts/menu-items', lambda t: [{'id': t.item.id, 'quantity': 2}, {'id': t.other_item.id}]),
+          ('OrderView.get', 'manager', 'get', lambda t: '/api/orders', None),
+          ('OrderView.get', 'crew', 'get', lambda t: '/api/orders', None),
+          ('OrderView.get', 'customer', 'get', lambda t: '/api/orders', None),
+          ('OrderDispatchView.post', 'manager', 'post', lambda t: '/api/orders/dispatch', lambda t: {'orders': [t.order.id], 'delivery_crew': t.crew.id}),
+          ('OrderDispatchView.post', 'manager', 'post', lambda t: '/api/orders/dispatch', lambda t: {'auto': True, 'limit': 50}),
+          ('OrderExportView.get', 'manager', 'get', lambda t: '/api/orders/export.ndjson?date_from=2020-01-01', None),
+          ('SingleOrderView.get', 'customer', 'get', lambda t: f'/api/orders/{t.order.id}', None),
+          ('SingleOrderView.patch', 'manager', 'patch', lambda t: f'/api/orders/{t.order.id}', lambda t: {'id': t.crew.id, 'status': 1}),
+          ('SingleOrderView.patch', 'crew', 'patch', lambda t: f'/api/orders/{t.pending.id}', None),
+          ('CartMenuItemView.post', 'customer', 'post', lambda t: '/api/carts/menu-items', lambda t: {'id': t.item.id}, {'Idempotency-Key': 'cart'}),
+          ('OrderView.post', 'customer', 'post', lambda t: '/api/orders', None, {'Idempotency-Key': 'checkout'}),
+          ('OrderView.post', 'customer', 'post', lambda t: '/api/orders', None, {'Idempotency-Key': 'checkout'}),
+          ('CartMenuItemView.delete', 'customer', 'delete', lambda t: '/api/carts/menu-items', None),
+          ('SingleOrderView.delete', 'manager', 'delete', lambda t: f'/api/orders/{t.order.id}', None),
+          ('SingleMenuItemView.delete', 'manager', 'delete', lambda t: f'/api/menu-items/{t.other_item.id}', None),
+          ('SalesReportView.get', 'manager', 'get', lambda t: '/api/reports/sales?group_by=category', None),
+          ('StatsView.get', 'admin', 'get', lambda t: '/api/stats', None),
+     ]
+
+     @classmethod
+     def setUpTestData(cls):
+          seed_database(users=60, categories=4, items=80, carts=20, orders=100, lines=3)
+          cls.admin = User.objects.get(username='seed-admin')
+          cls.manager = User.objects.filter(groups__name='Manager').first()
+          cls.crew = User.objects.filter(groups__name='Delivery crew').first()
+          cls.order = Order.objects.order_by('id').first()
+          cls.customer = cls.order.user
+          cls.item, cls.other_item = MenuItem.objects.order_by('id')[:2]
+          cls.pending = Order.objects.filter(status=False).exclude(pk=cls.order.pk).first()
+          cls.tokens = {
+               role: Token.objects.get_or_create(user=getattr(cls, role))[0].key
+               for role in ('admin', 'manager', 'crew', 'customer')
+          }
+
+     def setUp(self):
+          reset_throttles()
+
+     def test_every_view_method_has_a_budget(self):
+          expected = {
+               f'{view.__name__}.{method}'
+               for view in vars(views).values()
+               if isinstance(view, type) and issubclass(view, APIView) and view is not APIView
+               for method in view.http_method_names
+               if method not in ('options', 'head') and hasattr(view, method)
+          }
+          self.assertEqual(expected, set(QUERY_BUDGETS))
+          self.assertEqual(expected, {scenario[0] for scenario in self.scenarios})
+
+     def test_views_stay_within_budget(self):
+          for key, role, method, path, data, *headers in self.scenarios:
+               # Budgets are for the worst case: cold token, catalog and role caches
+               cache.clear()
+               roles.clear_roles()
+               token_cache.clear()
+               reset_route_stats()
+               client = APIClient()
+               client.credentials(HTTP_AUTHORIZATION=f'Token {self.tokens[role]}')
+               response = getattr(client, method)(path(self), data(self) if data else None, format='json', headers=headers[0] if headers else None)
+               if response.streaming:
+                    # Exports query while their body is read; the budget covers that
+                    b''.join(response.streaming_content)
+               with self.subTest(key, role=role, path=path(self)):
+                    self.assertLess(response.status_code, 500)
+                    self.assertIn('Server-Timing', response)
+                    self.assertLessEqual(route_stats()[key]['max_queries'], QUERY_BUDGETS[key])
+
+class AsyncReadViewTest(TestCase):
+     @classmethod
+     def setUpTestData(cls):
+          cls.customer = User.objects.create(username="Tom")
+          cls.token = Token.objects.create(user=cls.customer)
+          category = Category.objects.create(slug="mains", title="Mains")
+          item = MenuItem.objects.create(title="Pasta", price=10, featured=False, category=category)
+          cls.order = Order.objects.create(user=cls.customer, total=20, date=datetime.date(2026, 9, 1))
+          OrderItem.objects.create(order=cls.order, menuitem=item, quantity=2, unit_price=10, price=20)
+
+     def setUp(self):
+          reset_throttles()
+          cache.clear()
+          roles.clear_roles()
+          token_cache.clear()
+
+     async def test_async_reads_match_sync_views(self):
+          headers = {'Authorization': f'Token {self.token.key}'}
+          cases = [
+               ('/api/categories', views.CategoryView, {}),
+               ('/api/menu-items?perpage=5', views.MenuItemView, {}),
+               ('/api/orders', views.OrderView, {}),
+               (f'/api/orders/{self.order.id}', views.SingleOrderView, {'pk': self.order.id}),
+          ]
+          for url, view, kwargs in cases:
+               response = await self.async_client.get(url, headers=headers)
+               self.assertEqual(response.status_code, 200, url)
+               cache.clear()
+               request = APIRequestFactory().get(url, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+               sync_response = await sync_to_async(view.as_view())(request, **kwargs)
+               self.assertEqual(response.json(), json.loads(sync_response.render().content), url)
+
+     async def test_async_reads_require_token(self):
+          response = await self.async_client.get('/api/orders')
+          self.assertEqual(response.status_code, 401)
+          self.assertEqual(response['WWW-Authenticate'], 'Token')
+          response = await self.async_client.get('/api/orders', headers={'Authorization': 'Token nope'})
+          self.assertEqual(response.status_code, 401)
+
+class SalesRollupTest(TestCase):
+     def setUp(self):
+          reset_throttles()
+          roles.clear_roles()
+          self.manager = User.objects.create(username="Benson")
+          Group.objects.create(name="Manager").user_set.add(self.manager)
+          self.customer = User.objects.create(username="Tom")
+          fill_cart(self.customer, 3)
+          self.client = APIClient()
+
+     def report(self, **params):
+          self.client.force_authenticate(User.objects.get(pk=self.manager.pk))
+          return self.client.get('/api/reports/sales', params)
+
+     def test_checkout_and_delete_update_rollup(self):
+          self.client.force_authenticate(self.customer)
+          self.client.post('/api/orders')
+          fill_cart(self.customer, 0)
+          Cart.objects.create(user=self.customer, menuitem=MenuItem.objects.first(), quantity=1, unit_price=1, price=1)
+          self.client.post('/api/orders')
+          response = self.report()
+          self.assertEqual(len(response.data), 1)
+          # Two orders, four lines between them: a day only knows its lines
+          self.assertNotIn('orders', response.data[0])
+          self.assertEqual((response.data[0]['order_lines'], response.data[0]['quantity'], response.data[0]['revenue']), (4, 7, '13.00'))
+          by_item = self.report(group_by='menuitem').data
+          self.assertEqual([(row['menuitem_title'], row['orders']) for row in by_item], [('Item 0', 2), ('Item 1', 1), ('Item 2', 1)])
+
+          first = Order.objects.order_by('id').first()
+          self.client.force_authenticate(User.objects.get(pk=self.manager.pk))
+          self.client.delete(f'/api/orders/{first.id}')
+          self.assertEqual([(row['order_lines'], row['revenue']) for row in self.report().data], [(1, '1.00')])
+          self.assertEqual(DailySales.objects.count(), 1)
+
+     def test_reversal_uses_category_at_order_time(self):
+          self.client.force_authenticate(self.customer)
+          self.client.post('/api/orders')
+          item = MenuItem.objects.order_by('id').first()
+          old_category = item.category
+          item.category = Category.objects.create(slug="specials", title="Specials")
+          item.save()
+          untouched = DailySales.objects.create(day=datetime.date(2020, 1, 1), category=old_category, menuitem=item, orders=0)
+          self.client.force_authenticate(User.objects.get(pk=self.manager.pk))
+          with CaptureQueriesContext(connection) as queries:
+               self.client.delete(f'/api/orders/{Order.objects.get().id}')
+          self.assertEqual(list(DailySales.objects.all()), [untouched])
+          delete = next(query['sql'] for query in queries if query['sql'].startswith('DELETE FROM "LittleLemonAPI_dailysales"'))
+          self.assertIn('IN (SELECT', delete)
+
+     def test_rebuild_matches_incremental(self):
+          self.client.force_authenticate(self.customer)
+          self.client.post('/api/orders')
+          expected = list(DailySales.objects.values_list('day', 'menuitem', 'orders', 'quantity', 'revenue').order_by('menuitem'))
+          DailySales.objects.all().delete()
+          call_command('rebuild_sales', chunk_size=1, stdout=StringIO())
+          self.assertEqual(list(DailySales.objects.values_list('day', 'menuitem', 'orders', 'quantity', 'revenue').order_by('menuitem')), expected)
+
+     def test_report_requires_manager(self):
+          self.client.force_authenticate(self.customer)
+          self.assertEqual(self.client.get('/api/reports/sales').status_code, 403)
@@ -0,0 +1,128 @@
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+from .versions import get_or_seed_version, reset_version
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+THROTTLE_GENERATION_KEY = 'throttle:generation'
+
+class LocalBucketStore:
+     # Token buckets in this process, least recently used first: key -> (tokens, updated_at)
+     def __init__(self, max_keys=100000):
+          self.max_keys = max_keys
+          self.buckets = OrderedDict()
+          self.lock = threading.Lock()
+
+     def take(self, key, burst, rate):
+          # Spend one token; return 0.0, or the seconds until one is available
+          now = time.monotonic()
+          with self.lock:
+               entry = self.buckets.get(key)
+               tokens = burst if entry is None else min(burst, entry[0] + (now - entry[1]) * rate)
+               wait = 0.0
+               if tokens >= 1:
+                    tokens -= 1
+               else:
+                    wait = (1 - tokens) / rate
+               self.buckets[key] = (tokens, now)
+               self.buckets.move_to_end(key)
+               # The idlest bucket goes first; it has most likely refilled anyway
+               while len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+          return wait
+
+     def clear(self):
+          with self.lock:
+               self.buckets.clear()
+
+class CacheBucketStore:
+     # Buckets in a Django cache shared by every worker (memcached, redis, ...).
+     # Read-modify-write without a lock, so concurrent requests may both get
+     # the last token: good enough for shedding retry loops.
+     def __init__(self, alias='default'):
+          self.alias = alias
+          self.cache = caches[alias]
+
+     def take(self, key, burst, rate):
+          now = time.time()
+          key = f'throttle:{get_or_seed_version(THROTTLE_GENERATION_KEY, self.alias)}:{key}'
+          tokens, updated = self.cache.get(key) or (burst, now)
+          tokens = min(burst, tokens + (now - updated) * rate)
+          wait = 0.0
+          if tokens >= 1:
+               tokens -= 1
+          else:
+               wait = (1 - tokens) / rate
+          self.cache.set(key, (tokens, now), math.ceil((burst - tokens) / rate) + 1)
+          return wait
+
+     def clear(self):
+          # Orphan every bucket at once; the rest of the cache is left alone
+          reset_version(THROTTLE_GENERATION_KEY, self.alias)
+
+_store = None
+_rejected = Counter()
+_lock = threading.Lock()
+
+def get_store():
+     global _store
+     if _store is None:
+          _store = import_string(getattr(settings, 'THROTTLE_STORE', 'LittleLemonAPI.throttling.LocalBucketStore'))()
+     return _store
+
+def throttle_stats():
+     # {scope: {'user': rejected, 'ip': rejected}}
+     with _lock:
+          stats = {}
+          for (scope, kind), count in _rejected.items():
+               stats.setdefault(scope, {})[kind] = count
+          return stats
+
+def reset_throttles():
+     global _store
+     if _store is not None:
+          _store.clear()
+     _store = None
+     with _lock:
+          _rejected.clear()
+
+def throttle_scope(method, view):
+     # Reads share the browse buckets; views opt their writes in with throttle_scope
+     if method in SAFE_METHODS:
+          return 'browse'
+     return getattr(view, 'throttle_scope', None)
+
+class TokenBucketThrottle(BaseThrottle):
+     wait_time = None
+
+     def allow_request(self, request, view):
+          self.wait_time = self.check(request, throttle_scope(request.method, view))
+          return not self.wait_time
+
+     def check(self, request, scope):
+          buckets = getattr(settings, 'THROTTLE_BUCKETS', {}).get(scope)
+          if not buckets:
+               return 0.0
+          clients = []
+          if 'user' in buckets and request.user and request.user.is_authenticated:
+               clients.append(('user', request.user.pk))
+          if 'ip' in buckets:
+               clients.append(('ip', self.get_ident(request)))
+          store = get_store()
+          wait = 0.0
+          for kind, client in clients:
+               burst, rate = buckets[kind]
+               client_wait = store.take(f'{scope}:{kind}:{client}', burst, rate)
+               if client_wait:
+                    with _lock:
+                         _rejected[scope, kind] += 1
+                    wait = max(wait, client_wait)
+          return wait
+
+     def wait(self):
+          return self.wait_time
@@ -1,15 +1,33 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
 
-urlpatterns = [
-     path('categories', views.CategoryView.as_view()),
-     path('menu-items', views.MenuItemView.as_view()),
-     path('menu-items/<int:pk>', views.SingleMenuItemView.as_view()),
-     path('groups/manager/users', views.ManagerGroupView.as_view()),
-     path('groups/manager/users/<int:pk>', views.SingleManagerGroupView.as_view()),
-     path('groups/delivery-crew/users', views.DeliveryCrewGroupView.as_view()),
-     path('groups/delivery-crew/users/<int:pk>', views.SingleDeliveryCrewGroupView.as_view()),
-     path('carts/menu-items', views.CartMenuItemView.as_view()),
-     path('orders', views.OrderView.as_view()),
-     path('orders/<int:pk>', views.SingleOrderView.as_view())
-]
\ No newline at end of file
+def build_urlpatterns(async_reads):
+     # async_reads serves GET on the read-heavy routes from async_views
+     def read_view(name):
+          if async_reads:
+               return getattr(async_views, name)
+          return getattr(views, name).as_view()
+
+     return [
+          path('categories', read_view('CategoryView')),
+          path('menu-items', read_view('MenuItemView')),
+          path('menu-items/import.<str:fmt>', views.MenuImportView.as_view()),
+          path('menu-items/export.<str:fmt>', views.MenuExportView.as_view()),
+          path('menu-items/<int:pk>', views.SingleMenuItemView.as_view()),
+          path('groups/manager/users', views.ManagerGroupView.as_view()),
+          path('groups/manager/users/bulk', views.BulkManagerGroupView.as_view()),
+          path('groups/manager/users/<int:pk>', views.SingleManagerGroupView.as_view()),
+          path('groups/delivery-crew/users', views.DeliveryCrewGroupView.as_view()),
+          path('groups/delivery-crew/users/bulk', views.BulkDeliveryCrewGroupView.as_view()),
+          path('groups/delivery-crew/users/<int:pk>', views.SingleDeliveryCrewGroupView.as_view()),
+          path('carts/menu-items', views.CartMenuItemView.as_view()),
+          path('orders', read_view('OrderView')),
+          path('orders/dispatch', views.OrderDispatchView.as_view()),
+          path('orders/export.<str:fmt>', views.OrderExportView.as_view()),
+          path('orders/<int:pk>', read_view('SingleOrderView')),
+          path('reports/sales', views.SalesReportView.as_view()),
+          path('stats', views.StatsView.as_view()),
+     ]
+
+urlpatterns = build_urlpatterns(getattr(settings, 'ASYNC_READ_VIEWS', True))
@@ -0,0 +1,33 @@
+import time
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+# Version counters kept in a Django cache: whatever was stored or cached under
+# an older version stops matching once the counter moves on. A missing counter
+# is seeded from the clock, so losing the key never revives an older version.
+
+async def acache(method, *args, alias='default'):
+     # LocMemCache never blocks, so skip the thread hop its default async API takes
+     backend = caches[alias]
+     if isinstance(backend, LocMemCache):
+          return getattr(backend, method)(*args)
+     return await getattr(backend, f'a{method}')(*args)
+
+def get_or_seed_version(key, alias='default'):
+     backend = caches[alias]
+     version = backend.get(key)
+     if version is None:
+          backend.add(key, time.time_ns(), None)
+          version = backend.get(key)
+     return version
+
+async def aget_or_seed_version(key, alias='default'):
+     version = await acache('get', key, alias=alias)
+     if version is None:
+          await acache('add', key, time.time_ns(), None, alias=alias)
+          version = await acache('get', key, alias=alias)
+     return version
+
+def reset_version(key, alias='default'):
+     # Moves the counter to a value never handed out before
+     caches[alias].set(key, time.time_ns(), None)
@@ -1,19 +1,59 @@
-from django.contrib.auth.models import User, Group
+from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
-from django.db import transaction
-from .models import MenuItem, Cart, Order, OrderItem, Category
-from .serializers import MenuItemSerializer, UserSerializer, CartSerializer, OrderSerializer, OrderItemSerializer, CategorySerializer
+from django.db import router, transaction
+from django.core.handlers.asgi import ASGIRequest
+from .models import MenuItem, Cart, Order, Category
+from .serializers import MenuItemSerializer, UserSerializer, CartSerializer, OrderSerializer, CategorySerializer, SalesReportSerializer
 from django.core.paginator import Paginator, EmptyPage
+from django.utils.dateparse import parse_date
 from django.utils.timezone import now
-
-def is_manager(user: User):
-     return user.groups.filter(name="Manager").exists()
-def is_delivery_crew(user: User):
-     return user.groups.filter(name="Delivery crew").exists()
+from datetime import timedelta
+from rest_framework.exceptions import ValidationError
+from .roles import get_roles, get_group, is_manager, is_delivery_crew, invalidate_roles, MANAGER, DELIVERY_CREW
+from .pagination import GroupMemberPagination, KeysetPagination
+from .catalog import cached_catalog_response, bump_catalog_version
+from .orders import place_order, publish_delivered
+from .carts import parse_cart_lines, add_to_cart, cart_lines, reprice_carts
+from .search import search_menu_items, search_index_available
+from .reports import REPORT_GROUPS, record_order, sales_report
+from .menu_io import FORMATS, import_menu, export_menu, aiterate
+from .order_export import export_orders
+from .fastpath import plan_for
+from .idempotency import idempotent
+from .membership import parse_members, resolve_users, add_members, remove_members
+from .dispatch import MAX_DISPATCH, parse_order_ids, dispatch_orders, auto_dispatch
+from .authentication import token_cache
+from .middleware import route_stats
+from .throttling import throttle_stats
+from .outbox import worker_name
+from django.http import StreamingHttpResponse
+import codecs
+
+def list_group_members(request, view, group_name):
+     # One query over auth_user_groups joined to auth_group, paged by id cursor
+     users = User.objects.filter(groups__name=group_name).only('id', 'username')
+     search = request.query_params.get('search')
+     if search:
+          users = users.filter(username__icontains=search)
+     paginator = GroupMemberPagination()
+     page = paginator.paginate_queryset(users, request, view=view)
+     serializer = UserSerializer(page, many=True)
+     return paginator.get_paginated_response(serializer.data)
+
+def change_group_members(request, group_name, add):
+     ids, usernames = parse_members(request.data)
+     user_ids, missing = resolve_users(ids, usernames)
+     if not user_ids:
+          return Response({'detail': 'No users found.', 'missing': missing}, status.HTTP_404_NOT_FOUND)
+     if add:
+          add_members(group_name, user_ids)
+          return Response({'detail': f'{len(user_ids)} users assigned to {group_name.lower()} group.', 'users': user_ids, 'missing': missing}, status.HTTP_201_CREATED)
+     removed = remove_members(group_name, user_ids)
+     return Response({'detail': f'{removed} users removed from {group_name.lower()} group.', 'users': user_ids, 'missing': missing}, status.HTTP_200_OK)
 
 class ManagerGroupView(APIView):
      permission_classes = [IsAuthenticated]
@@ -22,15 +62,7 @@ class ManagerGroupView(APIView):
           if not request.user.is_superuser:
                return Response('You do not have permission to get manager list.', status.HTTP_403_FORBIDDEN)
           
-          users = User.objects.all()
-          managers = []
-          
-          for user in users:
-               if is_manager(user):
-                    managers.append(user)
-                    
-          serializer = UserSerializer(managers, many=True)
-          return Response(serializer.data, status.HTTP_200_OK)
+          return list_group_members(request, self, MANAGER)
      
      def post(self, request):
           if not request.user.is_superuser:
@@ -49,8 +81,9 @@ class ManagerGroupView(APIView):
           if not user:
                return Response({'You can not assign group to user. User not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-          group = Group.objects.filter(name='Manager').first()
+          group = get_group(MANAGER)
           group.user_set.add(user)
+          invalidate_roles(user)
 
           return Response({'detail': f'User {user.username} assigned to manager group.'}, status=status.HTTP_201_CREATED)
      
@@ -66,18 +99,34 @@ class SingleManagerGroupView(APIView):
           if not user:
                return Response({'You can not remove group to user. User not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-          group = Group.objects.filter(name='Manager').first()
+          group = get_group(MANAGER)
           group.user_set.remove(user)
+          invalidate_roles(user)
 
           return Response({'detail': f'User {user.username} removed from manager group.'}, status=status.HTTP_200_OK)
 
+class BulkManagerGroupView(APIView):
+     permission_classes = [IsAuthenticated]
+
+     def post(self, request):
+          if not request.user.is_superuser:
+               return Response('You do not have permission to assign manager.', status.HTTP_403_FORBIDDEN)
+          return change_group_members(request, MANAGER, add=True)
+
+     def delete(self, request):
+          if not request.user.is_superuser:
+               return Response('You do not have permission to assign manager.', status.HTTP_403_FORBIDDEN)
+          return change_group_members(request, MANAGER, add=False)
+
 class CategoryView(APIView):
      permission_classes=[IsAuthenticated]
 
      def get(self, request):
-          categories = Category.objects.all()
-          serializer = CategorySerializer(categories, many=True)
-          return Response(serializer.data, status.HTTP_200_OK)
+          return cached_catalog_response(request, 'categories', self.list_categories)
+
+     def list_categories(self):
+          plan = plan_for(CategorySerializer)
+          return plan.data(list(plan.values(Category.objects.all())))
      
      def post(self, request):
           if not request.user.is_superuser:
@@ -85,32 +134,55 @@ class CategoryView(APIView):
           serializer = CategorySerializer(data=request.data)
           serializer.is_valid(raise_exception=True)
           serializer.save()
+          bump_catalog_version()
           return Response('Category create successfully!', status.HTTP_201_CREATED)
      
+def filter_menu_items(query_params):
+     items = MenuItem.objects.select_related('category').all()
+     category_name = query_params.get("category")
+     search = query_params.get("search")
+     if category_name:
+          items = items.filter(category__title=category_name)
+     if search:
+          items = search_menu_items(items, search)
+     return items
+
+def order_menu_items(items, query_params):
+     ordering = query_params.get("ordering")
+     if ordering:
+          ordering_fields = ordering.split(",")
+          return items.order_by(*ordering_fields)
+     if query_params.get("search") and search_index_available():
+          return items.order_by('search_rank', 'id')
+     return items
+
+def menu_item_keyset(query_params, perpage):
+     default_ordering = ['search_rank'] if query_params.get("search") and search_index_available() else None
+     return KeysetPagination(page_size=perpage, default_ordering=default_ordering)
+
 class MenuItemView(APIView):
      permission_classes=[IsAuthenticated]
      
      def get(self, request):
-          items = MenuItem.objects.select_related('category').all()
-          category_name=request.query_params.get("category")
-          ordering = request.query_params.get("ordering")
+          return cached_catalog_response(request, 'menu-items', lambda: self.list_items(request))
+
+     def list_items(self, request):
+          plan = plan_for(MenuItemSerializer, request.query_params)
+          items = filter_menu_items(request.query_params)
           perpage = request.query_params.get("perpage", default=2)
           page = request.query_params.get("page", default=1)
-          search = request.query_params.get("search")
-          if category_name:
-               items.filter(category__title=category_name)
-          if ordering:
-               ordering_fields = ordering.split(",")
-               items = items.order_by(*ordering_fields)
-          if search:
-               items = items.filter(title_contain=search)
-          paginator = Paginator(items, per_page=perpage)
+          if "cursor" in request.query_params:
+               paginator = menu_item_keyset(request.query_params, perpage)
+               items = plan.values(items, *paginator.cursor_columns(request, MenuItem))
+               page = paginator.paginate_queryset(items, request)
+               return paginator.get_paginated_data(plan.data(page))
+          items = order_menu_items(items, request.query_params)
+          paginator = Paginator(plan.values(items), per_page=perpage)
           try:
-               items = paginator.page(number=page)
+               items = list(paginator.page(number=page))
           except EmptyPage:
                items = []
-          serializer = MenuItemSerializer(items, many=True)
-          return Response(serializer.data, status.HTTP_200_OK)
+          return plan.data(items)
      
      def post(self, request):
           if not request.user.is_superuser:
@@ -118,20 +190,54 @@ class MenuItemView(APIView):
           serializer = MenuItemSerializer(data=request.data)
           serializer.is_valid(raise_exception=True)
           serializer.save()
+          bump_catalog_version()
           return Response(serializer.data, status.HTTP_201_CREATED)
 
+class MenuImportView(APIView):
+     permission_classes=[IsAuthenticated]
+
+     def post(self, request, fmt):
+          if not request.user.is_superuser:
+               return Response('You do not have permission to import menu items.', status.HTTP_403_FORBIDDEN)
+          if fmt not in FORMATS:
+               return Response(f'Format must be one of {", ".join(FORMATS)}.', status.HTTP_404_NOT_FOUND)
+          # Read the body as it arrives instead of letting a parser buffer it into request.data
+          if request.stream is None:
+               return Response('Request body is empty.', status.HTTP_400_BAD_REQUEST)
+          lines = codecs.iterdecode(request.stream, 'utf-8')
+          summary = import_menu(lines, fmt)
+          return Response(summary, status.HTTP_200_OK)
+
+def export_response(request, chunks, fmt, name):
+     # Under ASGI the body must be an async iterator to actually stream
+     if isinstance(request._request, ASGIRequest):
+          chunks = aiterate(chunks)
+     content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+     response = StreamingHttpResponse(chunks, content_type=content_type)
+     response['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+     return response
+
+class MenuExportView(APIView):
+     permission_classes=[IsAuthenticated]
+
+     def get(self, request, fmt):
+          if not is_manager(request.user) and not request.user.is_superuser:
+               return Response('You do not have permission to export menu items.', status.HTTP_403_FORBIDDEN)
+          if fmt not in FORMATS:
+               return Response(f'Format must be one of {", ".join(FORMATS)}.', status.HTTP_404_NOT_FOUND)
+          return export_response(request, export_menu(fmt, using=router.db_for_read(MenuItem)), fmt, 'menu-items')
+
 class SingleMenuItemView(APIView):
      permission_classes=[IsAuthenticated]
 
      def get (self, request, pk):
           if not is_manager(request.user):
                return Response('You do not have permission to get menu item.', status.HTTP_403_FORBIDDEN)
-          try:
-               item = MenuItem.objects.get(pk=pk)
-          except MenuItem.DoesNotExist:
+          plan = plan_for(MenuItemSerializer, request.query_params)
+          rows = list(plan.values(MenuItem.objects.filter(pk=pk)))
+          if not rows:
                return Response('Menu item not found.', status=status.HTTP_404_NOT_FOUND)
-          serializer = MenuItemSerializer(item)
-          return Response(serializer.data, status=status.HTTP_200_OK)
+          return Response(plan.data(rows)[0], status=status.HTTP_200_OK)
 
      def put(self, request, pk):
           if not is_manager(request.user):
@@ -140,9 +246,14 @@ class SingleMenuItemView(APIView):
                item = MenuItem.objects.get(pk=pk)
           except MenuItem.DoesNotExist:
                return Response('You can not update menu item because menu item not found.', status=status.HTTP_404_NOT_FOUND)
+          price = item.price
           serializer = MenuItemSerializer(item, data=request.data)
           serializer.is_valid(raise_exception=True)
-          serializer.save()
+          with transaction.atomic():
+               serializer.save()
+               if item.price != price:
+                    reprice_carts([item.id])
+          bump_catalog_version()
           return Response(serializer.data, status=status.HTTP_200_OK)
           
      def patch(self, request, pk):
@@ -152,12 +263,17 @@ class SingleMenuItemView(APIView):
                item = MenuItem.objects.get(pk=pk)
           except MenuItem.DoesNotExist:
                return Response('You can not update menu item because menu item not found.', status=status.HTTP_404_NOT_FOUND)
+          price = item.price
           serializer = MenuItemSerializer(item, data=request.data, partial=True)
           serializer.is_valid(raise_exception=True)
-          serializer.save()
+          with transaction.atomic():
+               serializer.save()
+               if item.price != price:
+                    reprice_carts([item.id])
+          bump_catalog_version()
           return Response(serializer.data, status=status.HTTP_200_OK)
           
-     def delelte(self, request, pk):
+     def delete(self, request, pk):
           if not is_manager(request.user):
                return Response('You do not have permission to delete menu item.', status.HTTP_403_FORBIDDEN)
           try:
@@ -165,6 +281,7 @@ class SingleMenuItemView(APIView):
           except MenuItem.DoesNotExist:
                return Response('You can not delete menu item because menu item not found.', status=status.HTTP_404_NOT_FOUND)
           item.delete()
+          bump_catalog_version()
           return Response(f"Menu item {item.id}: {item.title} delete successfully!",status.HTTP_204_NO_CONTENT)
      
 class DeliveryCrewGroupView(APIView):
@@ -173,13 +290,7 @@ class DeliveryCrewGroupView(APIView):
      def get(self, request):
           if not is_manager(request.user):
                return Response('You do not have permission to get delivery crew list.', status.HTTP_403_FORBIDDEN)
-          users = User.objects.all()
-          delivery_crews = []
-          for user in users:
-               if is_delivery_crew(user):
-                    delivery_crews.append(user)
-          serializer = UserSerializer(delivery_crews, many=True)
-          return Response(serializer.data, status.HTTP_200_OK)
+          return list_group_members(request, self, DELIVERY_CREW)
      
      def post(self, request):
           if not is_manager(request.user):
@@ -197,8 +308,9 @@ class DeliveryCrewGroupView(APIView):
           if not user:
                return Response({'You can not assign group to user. User not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-          group = Group.objects.filter(name='Delivery crew').first()
+          group = get_group(DELIVERY_CREW)
           group.user_set.add(user)
+          invalidate_roles(user)
 
           return Response({'detail': f'User {user.username} assigned to delivery crew group.'}, status=status.HTTP_201_CREATED)
      
@@ -214,38 +326,44 @@ class SingleDeliveryCrewGroupView(APIView):
           if not user:
                return Response({'You can not remove group to user. User not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-          group = Group.objects.filter(name='Delivery crew').first()
+          group = get_group(DELIVERY_CREW)
           group.user_set.remove(user)
+          invalidate_roles(user)
 
           return Response({'detail': f'User {user.username} removed from delivery crew group.'}, status=status.HTTP_200_OK)
      
+class BulkDeliveryCrewGroupView(APIView):
+     permission_classes = [IsAuthenticated]
+
+     def post(self, request):
+          if not is_manager(request.user):
+               return Response('You do not have permission to assign delivery crew.', status.HTTP_403_FORBIDDEN)
+          return change_group_members(request, DELIVERY_CREW, add=True)
+
+     def delete(self, request):
+          if not is_manager(request.user):
+               return Response('You do not have permission to assign delivery crew.', status.HTTP_403_FORBIDDEN)
+          return change_group_members(request, DELIVERY_CREW, add=False)
+
 class CartMenuItemView(APIView):
      permission_classes = [IsAuthenticated]
+     throttle_scope = 'cart'
 
      def get(self, request):
-          items = Cart.objects.filter(user=request.user.id)
-          serializer = CartSerializer(items, many=True)
-          return Response(serializer.data, status.HTTP_200_OK)
+          lines, subtotal = cart_lines(request.user)
+          serializer = CartSerializer(lines, many=True)
+          # The body stays a plain list for existing clients; the total rides in a header
+          return Response(serializer.data, status.HTTP_200_OK, headers={'Cart-Subtotal': subtotal})
      
+     @idempotent
      def post(self, request):
-          item_id = request.data.get("id") 
-          qty = int(request.data.get("quantity", default=1))
-          if not item_id:
-               return Response('Menu item id required', status.HTTP_400_BAD_REQUEST)
-          try:
-               item = MenuItem.objects.get(pk=item_id)
-          except User.DoesNotExist:
-               return Response('Can not find menu item', status.HTTP_404_NOT_FOUND)
-          cart_line = {
-               "user": request.user.id,
-               "menuitem": item.id,
-               "unit_price": item.price,
-               "quantity": qty,
-               "price": item.price*qty
-          }
-          serializer = CartSerializer(data=cart_line)
-          serializer.is_valid(raise_exception=True)
-          serializer.save()
+          quantities = parse_cart_lines(request.data)
+          items, missing = add_to_cart(request.user, quantities)
+          if missing:
+               return Response({'detail': 'Can not find menu item', 'missing': missing}, status.HTTP_404_NOT_FOUND)
+          if len(items) > 1:
+               return Response(f'{len(items)} items are add to cart successfully.', status.HTTP_201_CREATED)
+          item = next(iter(items.values()))
           return Response(f'{item.title} is add to cart successfully.', status.HTTP_201_CREATED)
      
      def delete(self, request):
@@ -253,72 +371,120 @@ class CartMenuItemView(APIView):
           cart.delete()
           return Response('Cart items deleted successfully', status.HTTP_200_OK)
      
+ORDER_PAGE_SIZE = 20
+BOOLEAN_PARAMS = {'1': True, 'true': True, '0': False, 'false': False}
+
+def date_param(query_params, param):
+     value = query_params.get(param)
+     if not value:
+          return None
+     try:
+          day = parse_date(value)
+     except ValueError:
+          day = None
+     if day is None:
+          raise ValidationError({param: 'Use YYYY-MM-DD.'})
+     return day
+
+def filter_orders(orders, query_params):
+     order_status = query_params.get('status')
+     if order_status:
+          if order_status.lower() not in BOOLEAN_PARAMS:
+               raise ValidationError({'status': 'Use 1/true or 0/false.'})
+          orders = orders.filter(status=BOOLEAN_PARAMS[order_status.lower()])
+
+     for param, lookup in (('date_from', 'date__gte'), ('date_to', 'date__lte')):
+          day = date_param(query_params, param)
+          if day:
+               orders = orders.filter(**{lookup: day})
+
+     delivery_crew = query_params.get('delivery_crew')
+     if delivery_crew:
+          if not delivery_crew.isdigit():
+               raise ValidationError({'delivery_crew': 'Use a user id.'})
+          orders = orders.filter(delivery_crew=delivery_crew)
+     return orders
+
+def orders_visible_to(user, roles):
+     if MANAGER in roles:
+          return Order.objects.all()
+     if DELIVERY_CREW in roles:
+          return Order.objects.filter(delivery_crew=user.id)
+     return Order.objects.filter(user=user.id)
+
 class OrderView(APIView):
      permission_classes = [IsAuthenticated]
+     throttle_scope = 'checkout'
 
      def get(self, request):
-          if is_manager(request.user):
-               orders = Order.objects.all()
-               serializer = OrderSerializer(orders, many=True)
-               return Response(serializer.data, status.HTTP_200_OK)
-          
-          if is_delivery_crew(request.user):
-               orders = Order.objects.filter(delivery_crew=request.user.id)
-               serializer = OrderSerializer(orders, many=True)
-               return Response(serializer.data, status.HTTP_200_OK)
-          
-          orders = Order.objects.filter(user=request.user.id)
-          serializer = OrderSerializer(orders, many=True)
-          return Response(serializer.data, status.HTTP_200_OK)
+          orders = orders_visible_to(request.user, get_roles(request.user))
+          orders = filter_orders(orders, request.query_params)
+          plan = plan_for(OrderSerializer, request.query_params)
+          paginator = KeysetPagination(page_size=ORDER_PAGE_SIZE)
+          orders = plan.values(orders, *paginator.cursor_columns(request, Order))
+          page = paginator.paginate_queryset(orders, request)
+          return paginator.get_paginated_response(plan.data(page))
      
+     @idempotent
      def post(self, request):
-          items = Cart.objects.filter(user=request.user.id)
-          if not items.exists():
+          order = place_order(request.user)
+          if order is None:
                return Response("Cart is empty", status=400)
-          
-          with transaction.atomic():
-               order_data = {
-                    "user": request.user.id,
-                    "total": 0,
-                    "date": now().date()
-               }
-               order_serializer = OrderSerializer(data=order_data)
-               order_serializer.is_valid(raise_exception=True)
-               new_order = order_serializer.save()
-
-               order_lines = []
-
-               total = 0
-               for item in items:
-                    line = {
-                         "order": new_order.id,
-                         "menuitem": item.menuitem.id,
-                         "unit_price": item.unit_price,
-                         "quantity": item.quantity,
-                         "price": item.price
-                    }
-                    order_lines.append(line)
-                    total += item.price
-               new_order.total = total
-               new_order.save()
-
-               order_item_serializer = OrderItemSerializer(data=order_lines, many=True)
-               order_item_serializer.is_valid(raise_exception=True)
-               order_item_serializer.save()
-
-               items.delete()
 
           return Response("Order created successfully", status=status.HTTP_201_CREATED)
 
+class OrderDispatchView(APIView):
+     permission_classes = [IsAuthenticated]
+
+     def post(self, request):
+          if not is_manager(request.user):
+               return Response('You do not have permission to dispatch orders.', status.HTTP_403_FORBIDDEN)
+
+          # JSON true/false, or the same strings the order status filter takes
+          auto = str(request.data.get('auto', False)).lower()
+          if auto not in BOOLEAN_PARAMS:
+               raise ValidationError({'auto': 'Use true or false.'})
+          if BOOLEAN_PARAMS[auto]:
+               try:
+                    limit = int(request.data.get('limit') or MAX_DISPATCH)
+               except (TypeError, ValueError):
+                    raise ValidationError({'limit': 'Use a number.'})
+               if not 1 <= limit <= MAX_DISPATCH:
+                    raise ValidationError({'limit': f'Use 1 to {MAX_DISPATCH}.'})
+               assignments = auto_dispatch(limit)
+               data = [{'delivery_crew': crew_id, 'orders': order_ids} for crew_id, order_ids in assignments.items()]
+               return Response({'assigned': sum(len(order_ids) for order_ids in assignments.values()), 'dispatch': data}, status.HTTP_200_OK)
+
+          order_ids = parse_order_ids(request.data.get('orders'))
+          crew_id = request.data.get('delivery_crew')
+          if not str(crew_id).isdigit():
+               return Response('Required delivery_crew id or auto.', status.HTTP_400_BAD_REQUEST)
+          if not User.objects.filter(id=crew_id, groups__name=DELIVERY_CREW).exists():
+               return Response('No delivery crew found with info.', status.HTTP_404_NOT_FOUND)
+          assigned = dispatch_orders(order_ids, crew_id)
+          return Response({'assigned': assigned, 'skipped': len(order_ids) - assigned}, status.HTTP_200_OK)
+
+class OrderExportView(APIView):
+     permission_classes = [IsAuthenticated]
+
+     def get(self, request, fmt):
+          if not is_manager(request.user):
+               return Response('You do not have permission to export orders.', status.HTTP_403_FORBIDDEN)
+          if fmt not in FORMATS:
+               return Response(f'Format must be one of {", ".join(FORMATS)}.', status.HTTP_404_NOT_FOUND)
+          # Rows are read while the body is sent, after the routing middleware has reset
+          orders = filter_orders(Order.objects.using(router.db_for_read(Order)), request.query_params)
+          return export_response(request, export_orders(orders, fmt), fmt, 'orders')
+
 class SingleOrderView(APIView):
      permission_classes=[IsAuthenticated]
 
      def get(self, request, pk):
-          item = get_object_or_404(Order, pk=pk)
-          if item.user != request.user.id:
+          plan = plan_for(OrderSerializer, request.query_params)
+          row = get_object_or_404(plan.values(Order.objects.all(), 'user_id'), pk=pk)
+          if row['user_id'] != request.user.id:
                return Response('You do not have permission to view this order.', status.HTTP_403_FORBIDDEN)
-          serializer = OrderSerializer(item)
-          return Response(serializer.data, status=status.HTTP_200_OK)
+          return Response(plan.data([row])[0], status=status.HTTP_200_OK)
 
      def patch(self, request, pk):
           item = get_object_or_404(Order, pk=pk)
@@ -331,23 +497,28 @@ class SingleOrderView(APIView):
                     return Response("Required at least id and status")
 
                user = User.objects.get(id=delivery_crew_id)
-               in_group = user.groups.filter(name="Delivery crew").exists()
-               if not in_group:
+               if not is_delivery_crew(user):
                     return Response("No delivery crew found with info.")
                new_item["delivery_crew"] = delivery_crew_id
 
                new_item["status"] = delivery_status
 
+               delivered = item.status
                serializer = OrderSerializer(item, data=new_item, partial=True)
                serializer.is_valid(raise_exception=True)
-               serializer.save()
+               with transaction.atomic():
+                    serializer.save()
+                    if item.status and not delivered:
+                         publish_delivered(item)
                return Response("Order successfully update delivery crew and status.", status.HTTP_200_OK)
 
           if is_delivery_crew(request.user):
                if item.status:
                     return Response("Order already delivered", status.HTTP_400_BAD_REQUEST)
                item.status = True
-               item.save()
+               with transaction.atomic():
+                    item.save()
+                    publish_delivered(item)
                return Response("Order successfully update delivery status.", status.HTTP_200_OK)
           
           return Response("You do not have permission to update.", status.HTTP_403_FORBIDDEN)
@@ -358,5 +529,38 @@ class SingleOrderView(APIView):
           if not is_manager(request.user):
                return Response("You do not have permission to delete order.", status.HTTP_403_FORBIDDEN)
           
-          item.delete()
-          return Response("Order delete successfully.", status.HTTP_200_OK)
\ No newline at end of file
+          with transaction.atomic():
+               record_order(item, sign=-1)
+               item.delete()
+          return Response("Order delete successfully.", status.HTTP_200_OK)
+
+class SalesReportView(APIView):
+     permission_classes=[IsAuthenticated]
+
+     def get(self, request):
+          if not is_manager(request.user):
+               return Response('You do not have permission to view sales reports.', status.HTTP_403_FORBIDDEN)
+          date_to = date_param(request.query_params, 'date_to') or now().date()
+          date_from = date_param(request.query_params, 'date_from') or date_to - timedelta(days=29)
+          group_by = request.query_params.get('group_by', 'day')
+          if group_by not in REPORT_GROUPS:
+               return Response(f'group_by must be one of {", ".join(REPORT_GROUPS)}.', status.HTTP_400_BAD_REQUEST)
+          if date_from > date_to:
+               return Response('date_from must not be after date_to.', status.HTTP_400_BAD_REQUEST)
+          rows = sales_report(date_from, date_to, group_by)
+          serializer = SalesReportSerializer(rows, many=True)
+          return Response(serializer.data, status.HTTP_200_OK)
+
+class StatsView(APIView):
+     permission_classes=[IsAuthenticated]
+
+     def get(self, request):
+          if not request.user.is_superuser:
+               return Response('You do not have permission to view stats.', status.HTTP_403_FORBIDDEN)
+          # Counters live in each worker process; worker says which one answered
+          return Response({
+               'worker': worker_name(),
+               'token_cache': token_cache.stats(),
+               'routes': route_stats(),
+               'throttles': throttle_stats(),
+          }, status.HTTP_200_OK)